@@ -1,11 +1,12 @@
-from fastapi import Depends, HTTPException, status, Header
+from fastapi import Depends, HTTPException, status, Header, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError
-from sqlalchemy.orm import Session
-from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, Optional
 from app.core.config import settings
-from app.core.security import verify_auth0_token, verify_id_token
-from app.db.session import get_db
+from app.core.security import verify_auth0_token_async, verify_id_token_async, peek_verified_claims
+from app.db.routing import read_your_writes
+from app.db.session import get_async_db, get_read_sessionmaker
 from app.crud import user_crud
 from app.models.user import User
 
@@ -14,7 +15,7 @@ security = HTTPBearer()
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     x_id_token: Optional[str] = Header(None, alias="X-ID-Token")
 ) -> User:
     credentials_exception = HTTPException(
@@ -26,13 +27,13 @@ async def get_current_user(
     access_token = credentials.credentials
     
     try:
-        payload = verify_auth0_token(access_token)
+        payload = await verify_auth0_token_async(access_token)
         auth0_user_id = payload.get("sub")
         
         if not auth0_user_id:
             raise credentials_exception
         
-        user = user_crud.get_user_by_auth0_id(db, auth0_user_id)
+        user = await user_crud.get_user_by_auth0_id_cached_async(db, auth0_user_id)
         
         if not user:
             if not x_id_token:
@@ -41,7 +42,7 @@ async def get_current_user(
                     detail="ID token required for new user registration. Send X-ID-Token header."
                 )
             
-            id_payload = verify_id_token(x_id_token)
+            id_payload = await verify_id_token_async(x_id_token)
             
             if id_payload.get("sub") != auth0_user_id:
                 raise HTTPException(
@@ -49,7 +50,7 @@ async def get_current_user(
                     detail="ID token sub does not match access token sub"
                 )
             
-            user = user_crud.get_or_create_user_from_auth0(
+            user = await user_crud.get_or_create_user_from_auth0_async(
                 db=db,
                 id_token_payload=id_payload
             )
@@ -83,3 +84,30 @@ async def get_current_active_user(
         )
     return current_user
 
+
+def _caller_auth0_id(request: Request) -> Optional[str]:
+    authorization = request.headers.get("Authorization")
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return None
+    claims = peek_verified_claims(authorization[7:])
+    return claims.get("sub") if claims else None
+
+
+def recently_written(request: Request) -> bool:
+    """
+    Whether the caller, or the listing in the path, was written within
+    READ_YOUR_WRITES_WINDOW, so reads must see the primary
+    """
+    listing_id = request.path_params.get("listing_id")
+    return read_your_writes.is_recent(
+        listing_id=int(listing_id) if str(listing_id).isdigit() else None,
+        auth0_user_id=_caller_auth0_id(request)
+    )
+
+
+async def get_read_db(use_primary: bool = Depends(recently_written)) -> AsyncIterator[AsyncSession]:
+    """
+    AsyncSession for read-only queries, served by a read replica unless recently_written
+    """
+    async with get_read_sessionmaker(use_primary)() as db:
+        yield db
@@ -1,5 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from datetime import datetime
+from app.api.deps import get_current_active_user
+from app.db.session import get_pool_status
+from app.models.user import User as UserModel
 
 router = APIRouter()
 
@@ -15,3 +18,10 @@ async def health_check():
     }
 
 
+@router.get("/db-pool")
+async def db_pool_status(current_user: UserModel = Depends(get_current_active_user)):
+    """
+    Connection pool metrics: checked-out connections, overflow, checkout wait times and pool timeouts
+    (authenticated users only)
+    """
+    return get_pool_status()
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Optional, Union
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response, status
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Literal, Optional, Union
+from datetime import date
 
-from app.db.session import get_db
+from app.db.session import get_async_db, get_read_sessionmaker
 from app.schemas.listing import (
     UnitListing,
     RoomListing,
@@ -10,29 +12,30 @@ from app.schemas.listing import (
     RoomListingCreate,
     UnitListingUpdate,
     RoomListingUpdate,
-    Listing
+    Listing,
+    ListingCard,
+    ListingChain,
+    ListingFacets,
+    ListingMatch
 )
-from app.crud import listing_crud
-from app.api.deps import get_current_active_user
+from app.core.config import settings
+from app.core.pagination import InvalidCursor
+from app.core.geo import InvalidGeoParameter, parse_bbox, parse_point
+from app.crud import listing_crud, match_crud
+from app.api.deps import get_current_active_user, get_read_db, recently_written
+from app.db.routing import read_your_writes
 from app.models.user import User as UserModel
 
 router = APIRouter()
 
+# GET /listings response_model, for serializing pages into the page cache
+_listing_list = TypeAdapter(List[Union[UnitListing, RoomListing]])
 
-@router.post("", response_model=Union[UnitListing, RoomListing], status_code=status.HTTP_201_CREATED)
-async def create_listing(
-    listing_data: Union[UnitListingCreate, RoomListingCreate],
-    db: Session = Depends(get_db),
-    current_user: UserModel = Depends(get_current_active_user)
-):
-    listing = listing_crud.create_listing(db, listing_data, current_user.id)
-    return listing
+ListingSortOrder = Literal["newest", "price_asc", "price_desc", "distance", "soonest"]
 
 
-@router.get("", response_model=List[Union[UnitListing, RoomListing]])
-async def get_listings(
-    skip: int = 0,
-    limit: int = 100,
+def listing_filters(
+    q: Optional[str] = None,
     listing_type: Optional[str] = None,
     user_id: Optional[int] = None,
     min_price: Optional[float] = None,
@@ -46,21 +49,16 @@ async def get_listings(
     gym_in_building: Optional[bool] = None,
     laundry_in_unit: Optional[bool] = None,
     laundry_in_building: Optional[bool] = None,
-    db: Session = Depends(get_db)
-):
+    available_from: Optional[date] = None,
+    available_to: Optional[date] = None,
+    availability_match: Literal["overlap", "contains"] = "overlap",
+    bbox: Optional[str] = None,
+    near: Optional[str] = None,
+    radius: Optional[float] = None
+) -> Dict[str, Any]:
     """
-    Get all listings with optional filters (public endpoint - no authentication required)
-    
-    Filters:
-    - listing_type: 'unit' or 'room'
-    - min_price/max_price: Price range (per room for room listings, total for unit listings)
-    - min_rooms/max_rooms: Number of available rooms
-    - min_bathrooms/max_bathrooms: Number of bathrooms
-    - max_distance: Maximum distance to university (in kilometers)
-    - furnished: Only furnished listings
-    - gym_in_building: Has gym in building
-    - laundry_in_unit: Has laundry in unit
-    - laundry_in_building: Has laundry in building
+    Search filters shared by GET /listings and GET /listings/facets, validated
+    and passed to listing_crud as keyword arguments
     """
     if listing_type and listing_type not in ["unit", "room"]:
         raise HTTPException(
@@ -68,10 +66,35 @@ async def get_listings(
             detail="listing_type must be 'unit' or 'room'"
         )
     
-    listings = listing_crud.get_listings(
-        db,
-        skip=skip,
-        limit=limit,
+    if available_from and available_to and available_from > available_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="available_from must be on or before available_to"
+        )
+    
+    if (near is None) != (radius is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="near and radius must be given together"
+        )
+    
+    if radius is not None and radius <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="radius must be greater than 0"
+        )
+    
+    try:
+        bounding_box = parse_bbox(bbox) if bbox is not None else None
+        near_point = parse_point(near) if near is not None else None
+    except InvalidGeoParameter as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return dict(
+        q=q,
         listing_type=listing_type,
         user_id=user_id,
         min_price=min_price,
@@ -84,29 +107,229 @@ async def get_listings(
         furnished=furnished,
         gym_in_building=gym_in_building,
         laundry_in_unit=laundry_in_unit,
-        laundry_in_building=laundry_in_building
+        laundry_in_building=laundry_in_building,
+        available_from=available_from,
+        available_to=available_to,
+        availability_match=availability_match,
+        bbox=bounding_box,
+        near=near_point,
+        radius=radius
     )
+
+
+async def refresh_listing_count(filters: Dict[str, Any]) -> None:
+    # Runs after the response has been sent, on its own session
+    async with get_read_sessionmaker()() as db:
+        await listing_crud.refresh_listing_count_async(db, **filters)
+
+
+def _check_pagination(cursor: Optional[str], skip: int) -> None:
+    if cursor and skip:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either cursor or skip, not both"
+        )
+
+
+async def _set_total_headers(
+    response: Response,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession,
+    filters: Dict[str, Any]
+) -> None:
+    count = await listing_crud.count_listings_async(db, settings.TOTAL_COUNT_EXACT_LIMIT, **filters)
+    if count.needs_refresh:
+        background_tasks.add_task(refresh_listing_count, filters)
+    response.headers["X-Total-Count"] = str(count.total)
+    response.headers["X-Total-Count-Exact"] = "true" if count.exact else "false"
+
+
+@router.post("", response_model=Union[UnitListing, RoomListing], status_code=status.HTTP_201_CREATED)
+async def create_listing(
+    listing_data: Union[UnitListingCreate, RoomListingCreate],
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserModel = Depends(get_current_active_user)
+):
+    listing = await listing_crud.create_listing_async(db, listing_data, current_user.id)
+    await read_your_writes.record_async(listing_id=listing.id, auth0_user_id=current_user.auth0_user_id)
+    return listing
+
+
+@router.get("", response_model=List[Union[UnitListing, RoomListing]])
+async def get_listings(
+    response: Response,
+    background_tasks: BackgroundTasks,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    sort: Optional[ListingSortOrder] = None,
+    include_total: bool = False,
+    filters: Dict[str, Any] = Depends(listing_filters),
+    db: AsyncSession = Depends(get_read_db),
+    read_own_writes: bool = Depends(recently_written)
+):
+    """
+    Get all listings with optional filters (public endpoint - no authentication required)
+    
+    Listings are returned newest first, or in the `sort` order:
+    - newest: Most recently listed first
+    - price_asc/price_desc: Cheapest / most expensive first
+    - distance: Closest to the university first
+    - soonest: Earliest start date first
+    
+    Listings with no price or distance come after the rest, newest first for
+    price_desc and oldest first for price_asc and distance.
+    
+    When more results exist, the X-Next-Cursor response header holds an opaque
+    cursor; pass it back as `cursor`, with the same sort, to fetch the next page
+    (constant-time at any depth, unlike `skip`).
+    
+    With `q` and no `sort`, results are ranked by relevance instead and paged with `skip`.
+    
+    With LISTING_CACHE_ENABLED, pages are served from the page cache for up to
+    LISTING_CACHE_TTL seconds until a listing is written; X-Cache says whether
+    this one was (hit) or not (miss). Cached pages are read from the primary,
+    and callers within their READ_YOUR_WRITES_WINDOW bypass the cache.
+    
+    With `include_total`, X-Total-Count holds the number of matching listings and
+    X-Total-Count-Exact says whether it is exact. Counts are exact up to
+    TOTAL_COUNT_EXACT_LIMIT; broader searches get a planner estimate (PostgreSQL)
+    or a recently cached count.
+    
+    Filters:
+    - q: Full-text search over address, building name and utilities
+    - listing_type: 'unit' or 'room'
+    - min_price/max_price: Price range (per room for room listings, total for unit listings)
+    - min_rooms/max_rooms: Number of available rooms
+    - min_bathrooms/max_bathrooms: Number of bathrooms
+    - max_distance: Maximum distance to university (in kilometers)
+    - furnished: Only furnished listings
+    - gym_in_building: Has gym in building
+    - laundry_in_unit: Has laundry in unit
+    - laundry_in_building: Has laundry in building
+    - available_from/available_to: Requested stay (YYYY-MM-DD); either end may be left open
+    - availability_match: 'overlap' (available for part of the stay, default) or
+      'contains' (available for the whole stay, or on its one given day if an end is open)
+    - bbox: Map viewport as west,south,east,north (min_lon,min_lat,max_lon,max_lat)
+    - near/radius: Listings within `radius` kilometres of near=lat,lon
+    
+    Location filters only match listings that have latitude/longitude set.
+    """
+    _check_pagination(cursor, skip)
+    
+    # A writer reads its own writes from the primary, not from pages cached by other workers
+    use_cache = settings.LISTING_CACHE_ENABLED and not read_own_writes
+    
+    async def load_page(session: AsyncSession):
+        return await listing_crud.get_listings_page_async(session, skip=skip, limit=limit, cursor=cursor, sort=sort, **filters)
+    
+    async def load_body():
+        # From the primary: a lagging replica's page would be cached under the generation of a write it hasn't seen
+        async with get_read_sessionmaker(use_primary=True)() as primary_db:
+            listings, next_cursor = await load_page(primary_db)
+        return _listing_list.dump_json(_listing_list.validate_python(listings), by_alias=True), next_cursor
+    
+    try:
+        if use_cache:
+            key = listing_crud.listing_page_key(skip=skip, limit=limit, cursor=cursor, sort=sort, **filters)
+            body, next_cursor, cached = await listing_crud.listing_page_cache.get_or_load(key, load_body)
+            response.headers["X-Cache"] = "hit" if cached else "miss"
+        else:
+            listings, next_cursor = await load_page(db)
+    except InvalidCursor as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid cursor: {str(e)}"
+        )
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if include_total:
+        await _set_total_headers(response, background_tasks, db, filters)
+    if use_cache:
+        # Already validated and serialized as response_model would
+        return Response(content=body, media_type="application/json", headers=dict(response.headers))
     return listings
 
 
+@router.get("/cards", response_model=List[ListingCard])
+async def get_listing_cards(
+    response: Response,
+    background_tasks: BackgroundTasks,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    sort: Optional[ListingSortOrder] = None,
+    include_total: bool = False,
+    include_user: bool = False,
+    filters: Dict[str, Any] = Depends(listing_filters),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Compact listing cards for list and map views (public endpoint)
+    
+    Same filters, sorting, pagination and totals as GET /listings, but each row
+    holds only the fields a listing card shows: a single `price`, the first image
+    as `thumbnail`, and the owner only with `include_user`. Rows are read as plain
+    columns, skipping the owner join, the full images list and ORM objects.
+    """
+    _check_pagination(cursor, skip)
+    
+    try:
+        cards, next_cursor = await listing_crud.get_listing_cards_async(
+            db,
+            skip=skip,
+            limit=limit,
+            cursor=cursor,
+            sort=sort,
+            include_user=include_user,
+            **filters
+        )
+    except InvalidCursor as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid cursor: {str(e)}"
+        )
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if include_total:
+        await _set_total_headers(response, background_tasks, db, filters)
+    return cards
+
+
+@router.get("/facets", response_model=ListingFacets)
+async def get_listing_facets(
+    filters: Dict[str, Any] = Depends(listing_filters),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Counts per filter option over the listings matching the filters (public endpoint)
+    
+    Takes the same filters as GET /listings. Price buckets come from
+    FACET_PRICE_BUCKETS; min_price is inclusive and max_price exclusive.
+    """
+    return await listing_crud.get_listing_facets_async(db, settings.FACET_PRICE_BUCKETS, **filters)
+
+
 @router.get("/my-listings", response_model=List[Union[UnitListing, RoomListing]])
 async def get_my_listings(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: UserModel = Depends(get_current_active_user)
 ):
-    listings = listing_crud.get_user_listings(db, current_user.id)
+    listings = await listing_crud.get_user_listings_async(db, current_user.id)
     return listings
 
 
 @router.get("/{listing_id}", response_model=Union[UnitListing, RoomListing])
 async def get_listing_by_id(
     listing_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get a specific listing by ID (public endpoint - no authentication required)
     """
-    listing = listing_crud.get_listing(db, listing_id)
+    listing = await listing_crud.get_listing_async(db, listing_id)
     if not listing:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -115,14 +338,98 @@ async def get_listing_by_id(
     return listing
 
 
+@router.get("/{listing_id}/matches", response_model=List[ListingMatch])
+async def get_listing_matches(
+    listing_id: int,
+    limit: int = 20,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Best swap matches for a listing (public endpoint)
+    
+    Other owners' listings of the same type that are available at overlapping
+    dates, within MATCH_ROOM_TOLERANCE rooms and MATCH_PRICE_BAND of its price,
+    best `score` first. Candidates are read through the price index outward from
+    this listing's price, MATCH_CANDIDATE_LIMIT on each side, then scored on
+    date overlap, price, rooms and amenities.
+    
+    With MATCHES_MATERIALIZED the matches are read from the last run of
+    materialize_matches.py instead, up to MATCH_TOP_K of them; they can miss
+    listings written since, but matched listings that have ended are left out.
+    """
+    max_limit = settings.MATCH_TOP_K if settings.MATCHES_MATERIALIZED else settings.MATCH_CANDIDATE_LIMIT
+    if limit <= 0 or limit > max_limit:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"limit must be between 1 and {max_limit}"
+        )
+    
+    if settings.MATCHES_MATERIALIZED:
+        matches = await match_crud.get_stored_matches_async(db, listing_id, limit)
+    else:
+        matches = await match_crud.get_matches_async(db, listing_id, limit)
+    if matches is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Listing not found"
+        )
+    return matches
+
+
+@router.get("/{listing_id}/chains", response_model=List[ListingChain])
+async def get_listing_chains(
+    listing_id: int,
+    response: Response,
+    max_length: Optional[int] = None,
+    limit: int = 10,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Multi-party swap chains through a listing (public endpoint)
+    
+    Chains of 3 to `max_length` listings (default SWAP_CHAIN_MAX_LENGTH) where
+    each owner can stay at the next listing and the last owner at the first one,
+    starting with this listing, best mean `score` first. They come from the
+    in-memory swap graph (SWAP_CHAINS_ENABLED), so writes show up within
+    SWAP_CHAIN_REFRESH_INTERVAL seconds. When the search runs out of its time
+    budget the best chains found so far are returned with X-Chains-Complete: false.
+    """
+    if not settings.SWAP_CHAINS_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Swap chains are not enabled"
+        )
+    max_length = max_length or settings.SWAP_CHAIN_MAX_LENGTH
+    if max_length < 3 or max_length > settings.SWAP_CHAIN_MAX_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"max_length must be between 3 and {settings.SWAP_CHAIN_MAX_LENGTH}"
+        )
+    if limit <= 0 or limit > 50:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="limit must be between 1 and 50"
+        )
+    
+    result = await match_crud.get_swap_chains_async(db, listing_id, max_length, limit)
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Listing not found"
+        )
+    chains, complete = result
+    response.headers["X-Chains-Complete"] = "true" if complete else "false"
+    return chains
+
+
 @router.put("/{listing_id}", response_model=Union[UnitListing, RoomListing])
 async def update_listing(
     listing_id: int,
     listing_update: Union[UnitListingUpdate, RoomListingUpdate],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: UserModel = Depends(get_current_active_user)
 ):
-    listing = listing_crud.get_listing(db, listing_id)
+    listing = await listing_crud.get_listing_async(db, listing_id)
     if not listing:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -135,23 +442,25 @@ async def update_listing(
             detail="Not authorized to update this listing"
         )
     
-    updated_listing = listing_crud.update_listing(db, listing_id, listing_update)
+    updated_listing = await listing_crud.update_listing_async(db, listing_id, listing_update)
     if not updated_listing:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Listing not found"
         )
     
+    await read_your_writes.record_async(listing_id=listing_id, auth0_user_id=current_user.auth0_user_id)
+    
     return updated_listing
 
 
 @router.delete("/{listing_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_listing(
     listing_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: UserModel = Depends(get_current_active_user)
 ):
-    listing = listing_crud.get_listing(db, listing_id)
+    listing = await listing_crud.get_listing_async(db, listing_id)
     if not listing:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -164,12 +473,14 @@ async def delete_listing(
             detail="Not authorized to delete this listing"
         )
     
-    success = listing_crud.delete_listing(db, listing_id)
+    success = await listing_crud.delete_listing_async(db, listing_id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Listing not found"
         )
     
+    await read_your_writes.record_async(listing_id=listing_id, auth0_user_id=current_user.auth0_user_id)
+    
     return None
 
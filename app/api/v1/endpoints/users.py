@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.schemas.user import User, UserUpdate
 from app.crud import user_crud
-from app.api.deps import get_current_active_user
+from app.api.deps import get_current_active_user, get_read_db
+from app.db.routing import read_your_writes
 from app.models.user import User as UserModel
 
 router = APIRouter()
@@ -15,28 +16,28 @@ router = APIRouter()
 async def get_users(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: UserModel = Depends(get_current_active_user)
 ):
     """
     Get list of all users (paginated)
     Requires authentication
     """
-    users = user_crud.get_users(db, skip=skip, limit=limit)
+    users = await user_crud.get_users_async(db, skip=skip, limit=limit)
     return users
 
 
 @router.get("/{user_id}", response_model=User)
 async def get_user_by_id(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: UserModel = Depends(get_current_active_user)
 ):
     """
     Get a specific user by ID
     Requires authentication
     """
-    user = user_crud.get_user(db, user_id=user_id)
+    user = await user_crud.get_user_async(db, user_id=user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -49,7 +50,7 @@ async def get_user_by_id(
 async def update_user(
     user_id: int,
     user_update: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: UserModel = Depends(get_current_active_user)
 ):
     """
@@ -63,20 +64,22 @@ async def update_user(
             detail="Not authorized to update this user"
         )
     
-    updated_user = user_crud.update_user(db, user_id=user_id, user_update=user_update)
+    updated_user = await user_crud.update_user_async(db, user_id=user_id, user_update=user_update)
     if not updated_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
+    await read_your_writes.record_async(auth0_user_id=current_user.auth0_user_id)
+    
     return updated_user
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: UserModel = Depends(get_current_active_user)
 ):
     """
@@ -90,11 +93,14 @@ async def delete_user(
             detail="Not authorized to delete this user"
         )
     
-    success = user_crud.delete_user(db, user_id=user_id)
+    auth0_user_id = current_user.auth0_user_id
+    success = await user_crud.delete_user_async(db, user_id=user_id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
+    await read_your_writes.record_async(auth0_user_id=auth0_user_id)
+    
     return None
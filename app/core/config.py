@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Literal, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import field_validator
 import json
@@ -15,22 +15,117 @@ class Settings(BaseSettings):
     AUTH0_API_AUDIENCE: str = "http://localhost:8000"
     AUTH0_ALGORITHMS: List[str] = ["RS256"]
     
+    # Overrides the JWKS endpoint derived from AUTH0_DOMAIN (e.g. a local stub)
+    AUTH0_JWKS_URL: Optional[str] = None
+    
+    # JWKS cache settings (seconds)
+    JWKS_CACHE_TTL: int = 600
+    JWKS_MIN_REFRESH_INTERVAL: int = 30
+    JWKS_STALE_IF_ERROR: int = 3600
+    JWKS_FETCH_TIMEOUT: float = 5.0
+    
+    # Verified-token cache: entries expire at the token's exp or after TOKEN_CACHE_MAX_AGE seconds
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+    TOKEN_CACHE_MAX_AGE: int = 300
+    
+    # Async auth path: pooled JWKS HTTP client and signature verification workers
+    AUTH_HTTP_MAX_CONNECTIONS: int = 10
+    AUTH_HTTP_KEEPALIVE_EXPIRY: float = 60.0
+    TOKEN_VERIFY_WORKERS: int = 4
+    
+    # Identity cache: auth0_user_id -> User, invalidated on user writes
+    IDENTITY_CACHE_MAX_SIZE: int = 10000
+    IDENTITY_CACHE_TTL: int = 60
+    
     DATABASE_URL: str = "sqlite:///./flat_swap.db"
+    # Defaults to DATABASE_URL with its async driver (aiosqlite / psycopg)
+    ASYNC_DATABASE_URL: Optional[str] = None
+    
+    # Read replicas for read-only queries; empty means everything uses the primary
+    DATABASE_REPLICA_URLS: List[str] = []
+    # Seconds after a write during which the writer and the written listing read from the primary.
+    # Writes are remembered per worker process unless READ_YOUR_WRITES_URL (redis://host:port/db,
+    # e.g. the LISTING_CACHE_URL server) shares them; with several workers and replicas, set it,
+    # or a writer's next read can land on another worker and a stale replica
+    READ_YOUR_WRITES_WINDOW: int = 10
+    READ_YOUR_WRITES_URL: str = ""
+    
+    # Connection pool, per engine and per worker process
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    
+    # Opt-in SQLite tuning (WAL, pragmas) for small deployments and CI perf runs
+    SQLITE_PERFORMANCE_PROFILE: bool = False
+    SQLITE_SYNCHRONOUS: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 268435456
+    SQLITE_CACHE_SIZE: int = -64000
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    
+    # Listing facets: price bucket boundaries; the first and last buckets are open-ended
+    FACET_PRICE_BUCKETS: List[float] = [500.0, 750.0, 1000.0, 1500.0, 2000.0]
+    
+    # Search totals: exact up to TOTAL_COUNT_EXACT_LIMIT, then estimated or cached (seconds)
+    TOTAL_COUNT_EXACT_LIMIT: int = 1000
+    TOTAL_COUNT_CACHE_TTL: int = 60
+    TOTAL_COUNT_CACHE_MAX_SIZE: int = 1000
+    
+    # Page cache for GET /listings, dropped on every listing write. LISTING_CACHE_URL shares it between
+    # workers (redis://host:port/db: Redis, or cache_server.py locally); empty keeps MAX_SIZE pages per
+    # process, which a write in another worker doesn't drop, so use it only with a single worker.
+    # Pages are checked against a random generation key that has no TTL. The server may evict it
+    # (allkeys-lru, or --max-keys on cache_server.py); that drops every page but never revives a
+    # stale one. Redis's volatile-lru never evicts it
+    LISTING_CACHE_ENABLED: bool = False
+    LISTING_CACHE_URL: str = ""
+    LISTING_CACHE_TTL: int = 30
+    LISTING_CACHE_MAX_SIZE: int = 1000
+    LISTING_CACHE_MAX_ENTRY_BYTES: int = 1_000_000
+    
+    # Swap matching: price band as a ratio either way (0.25 = 800..1250 around 1000), room
+    # count difference, and candidates read on each side of a listing's price per lookup
+    MATCH_PRICE_BAND: float = 0.25
+    MATCH_ROOM_TOLERANCE: int = 1
+    MATCH_CANDIDATE_LIMIT: int = 200
+    
+    # Materialized matches: GET /listings/{id}/matches reads the top MATCH_TOP_K written by the
+    # match job (materialize_matches.py), and listing writes queue the listings to recompute
+    MATCHES_MATERIALIZED: bool = False
+    MATCH_TOP_K: int = 20
+    MATCH_JOB_WORKERS: int = 0  # 0 = one per CPU
+    MATCH_JOB_CHUNK_SIZE: int = 2000
+    
+    # Swap chains: a's owner can stay at b when b is available for SWAP_CHAIN_COVERAGE of a's dates
+    # (plus the MATCH_* room and price criteria). Listing writes are applied every REFRESH_INTERVAL
+    # seconds and the graph is rebuilt every REBUILD_INTERVAL seconds (0 = never)
+    SWAP_CHAINS_ENABLED: bool = False
+    SWAP_CHAIN_COVERAGE: float = 0.8
+    SWAP_CHAIN_MAX_DEGREE: int = 20
+    SWAP_CHAIN_MAX_LENGTH: int = 4
+    SWAP_CHAIN_TIME_BUDGET_MS: int = 100
+    SWAP_CHAIN_REFRESH_INTERVAL: int = 30
+    SWAP_CHAIN_REBUILD_INTERVAL: int = 3600
+    
+    # In-memory listing search index, rebuilt at startup and every REFRESH_INTERVAL seconds (0 = never)
+    SEARCH_INDEX_ENABLED: bool = False
+    SEARCH_INDEX_REFRESH_INTERVAL: int = 300
     
     BACKEND_CORS_ORIGINS: List[str] = [
         "http://localhost:3000",
         "http://localhost:8000",
     ]
     
-    @field_validator('BACKEND_CORS_ORIGINS', mode='before')
+    @field_validator('BACKEND_CORS_ORIGINS', 'DATABASE_REPLICA_URLS', mode='before')
     @classmethod
-    def parse_cors_origins(cls, v):
+    def parse_string_list(cls, v):
         if isinstance(v, str):
             try:
                 return json.loads(v)
             except json.JSONDecodeError:
                 # If it's not valid JSON, try splitting by comma
-                return [origin.strip() for origin in v.split(',')]
+                return [item.strip() for item in v.split(',') if item.strip()]
         return v
     
     model_config = SettingsConfigDict(
@@ -0,0 +1,74 @@
+from typing import NamedTuple, Tuple
+import math
+
+# Mean length of one degree of latitude
+KM_PER_DEGREE = 111.32
+
+
+class InvalidGeoParameter(ValueError):
+    pass
+
+
+class BoundingBox(NamedTuple):
+    west: float
+    south: float
+    east: float
+    north: float
+
+
+def _floats(value: str, count: int, name: str) -> Tuple[float, ...]:
+    try:
+        numbers = tuple(float(part) for part in value.split(","))
+    except ValueError:
+        raise InvalidGeoParameter(f"{name} must be {count} comma-separated numbers")
+    if len(numbers) != count or not all(math.isfinite(number) for number in numbers):
+        raise InvalidGeoParameter(f"{name} must be {count} comma-separated numbers")
+    return numbers
+
+
+def _check_point(lat: float, lon: float, name: str) -> None:
+    if not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        raise InvalidGeoParameter(f"{name} is outside latitude -90..90 / longitude -180..180")
+
+
+def parse_bbox(value: str) -> BoundingBox:
+    """
+    Parse "west,south,east,north" (min_lon,min_lat,max_lon,max_lat), the GeoJSON order
+    """
+    box = BoundingBox(*_floats(value, 4, "bbox"))
+    _check_point(box.south, box.west, "bbox")
+    _check_point(box.north, box.east, "bbox")
+    if box.south > box.north or box.west > box.east:
+        raise InvalidGeoParameter("bbox must be west,south,east,north with west <= east and south <= north")
+    return box
+
+
+def parse_point(value: str) -> Tuple[float, float]:
+    """
+    Parse "lat,lon"
+    """
+    lat, lon = _floats(value, 2, "near")
+    _check_point(lat, lon, "near")
+    return lat, lon
+
+
+def longitude_scale(lat: float) -> float:
+    """
+    Kilometres per degree of longitude relative to latitude at `lat`; floored so
+    boxes near the poles stay finite
+    """
+    return max(math.cos(math.radians(lat)), 0.01)
+
+
+def radius_bbox(lat: float, lon: float, radius_km: float) -> BoundingBox:
+    """
+    Smallest lat/lon box containing the circle, used to narrow radius search to an index range
+    """
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = dlat / longitude_scale(lat)
+    return BoundingBox(
+        west=max(lon - dlon, -180.0),
+        south=max(lat - dlat, -90.0),
+        east=min(lon + dlon, 180.0),
+        north=min(lat + dlat, 90.0)
+    )
@@ -0,0 +1,352 @@
+"""
+Swap compatibility between two listings.
+
+A swap works when each owner could live in the other's place: the listings are
+the same type, available at overlapping times, within MATCH_ROOM_TOLERANCE rooms
+and MATCH_PRICE_BAND of each other's price (or both unpriced). Every criterion
+is symmetric, so a match for one side is always a match for the other.
+Compatible pairs are scored from 0 to 1 on how well dates, price, rooms and
+amenities line up.
+"""
+from datetime import date
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import numpy as np
+
+AMENITIES = ("furnished", "gym_in_building", "laundry_in_unit", "laundry_in_building")
+
+# Weights of the score components; they sum to 1
+DATE_WEIGHT = 0.4
+PRICE_WEIGHT = 0.3
+ROOM_WEIGHT = 0.15
+AMENITY_WEIGHT = 0.15
+
+
+class MatchRow(NamedTuple):
+    """
+    The listing attributes matching reads (match_crud.MATCH_COLUMNS). Scoring
+    reads each one several times, and tuple attributes are much cheaper than
+    SQLAlchemy Row attributes.
+    """
+    id: int
+    user_id: int
+    listing_type: str
+    price: Optional[float]
+    num_rooms_available: int
+    start_date: date
+    end_date: date
+    furnished: bool
+    gym_in_building: Optional[bool]
+    laundry_in_unit: Optional[bool]
+    laundry_in_building: Optional[bool]
+
+
+class SwapMatch(NamedTuple):
+    score: float
+    overlap_start: date
+    overlap_end: date
+
+
+def price_range(price: float, band: float) -> Tuple[float, float]:
+    """
+    Prices within `band` of `price`, as a ratio either way: 0.25 allows 800 to 1250 around 1000
+    """
+    return price / (1 + band), price * (1 + band)
+
+
+def overlap(a: Any, b: Any) -> Optional[Tuple[date, date]]:
+    start, end = max(a.start_date, b.start_date), min(a.end_date, b.end_date)
+    return (start, end) if start <= end else None
+
+
+def _days(start: date, end: date) -> int:
+    return (end - start).days + 1
+
+
+def _price_score(a: Optional[float], b: Optional[float], band: float) -> float:
+    if not a or not b:
+        return 0.5
+    # 1 at equal prices, 0 at the edge of the band
+    ratio = max(a, b) / min(a, b)
+    return max(0.0, 1 - (ratio - 1) / band) if band > 0 else float(ratio == 1)
+
+
+def _amenity_score(a: Any, b: Any) -> float:
+    known = [
+        getattr(a, name) == getattr(b, name)
+        for name in AMENITIES
+        if getattr(a, name) is not None and getattr(b, name) is not None
+    ]
+    return sum(known) / len(known) if known else 0.5
+
+
+def compatible(a: Any, b: Any, price_band: float, room_tolerance: int) -> bool:
+    """
+    Hard criteria; candidate queries apply the same ones in SQL
+    """
+    if a.id == b.id or a.user_id == b.user_id or a.listing_type != b.listing_type:
+        return False
+    if abs(a.num_rooms_available - b.num_rooms_available) > room_tolerance:
+        return False
+    if (a.price is None) != (b.price is None):
+        return False
+    if a.price is not None and max(a.price, b.price) > min(a.price, b.price) * (1 + price_band):
+        return False
+    return overlap(a, b) is not None
+
+
+def score_match(a: Any, b: Any, price_band: float, room_tolerance: int) -> Optional[SwapMatch]:
+    """
+    Score listings a and b as a swap, or None when they aren't compatible. Both
+    need id, user_id, listing_type, price, num_rooms_available, start_date,
+    end_date and the AMENITIES attributes.
+    """
+    if not compatible(a, b, price_band, room_tolerance):
+        return None
+    
+    start, end = overlap(a, b)
+    # Share of the longer stay both owners can swap for
+    date_score = _days(start, end) / max(_days(a.start_date, a.end_date), _days(b.start_date, b.end_date))
+    room_score = 1 - abs(a.num_rooms_available - b.num_rooms_available) / (room_tolerance + 1)
+    
+    score = (
+        DATE_WEIGHT * date_score
+        + PRICE_WEIGHT * _price_score(a.price, b.price, price_band)
+        + ROOM_WEIGHT * room_score
+        + AMENITY_WEIGHT * _amenity_score(a, b)
+    )
+    return SwapMatch(score=round(score, 4), overlap_start=start, overlap_end=end)
+
+
+# Set bits in each 4-bit amenity mask
+_BIT_COUNTS = np.array([bin(mask).count("1") for mask in range(1 << len(AMENITIES))], dtype=np.float64)
+
+
+def _amenity_bits(row: Any, known: bool) -> int:
+    bits = 0
+    for bit, name in enumerate(AMENITIES):
+        value = getattr(row, name)
+        if value is not None and (known or value):
+            bits |= 1 << bit
+    return bits
+
+
+class MatchBuckets:
+    """
+    Active listings in memory for the batch match job: one bucket per listing
+    type and priced/unpriced, with columns sorted by (price, id). Candidates and
+    scores are the same as match_crud.get_matches computes in SQL and Python,
+    vectorized over the bucket.
+    """
+    
+    def __init__(self, rows: Iterable[Any]):
+        groups: Dict[Tuple[str, bool], List[Any]] = {}
+        for row in rows:
+            groups.setdefault((row.listing_type, row.price is not None), []).append(row)
+        
+        self.buckets: Dict[Tuple[str, bool], Dict[str, np.ndarray]] = {}
+        for key, members in groups.items():
+            members.sort(key=lambda row: (row.price or 0.0, row.id))
+            self.buckets[key] = self._columns(members)
+            self.buckets[key]["by_id"] = np.argsort(self.buckets[key]["id"])
+    
+    @staticmethod
+    def _columns(members: List[Any]) -> Dict[str, np.ndarray]:
+        return {
+            "id": np.array([row.id for row in members], dtype=np.int64),
+            "user_id": np.array([row.user_id for row in members], dtype=np.int64),
+            "price": np.array([row.price or 0.0 for row in members], dtype=np.float64),
+            "rooms": np.array([row.num_rooms_available for row in members], dtype=np.int32),
+            "start": np.array([row.start_date.toordinal() for row in members], dtype=np.int32),
+            "end": np.array([row.end_date.toordinal() for row in members], dtype=np.int32),
+            # Amenity bitmasks, bit i for AMENITIES[i]: whether it's known, and its value
+            "known": np.array([_amenity_bits(row, known=True) for row in members], dtype=np.uint8),
+            "values": np.array([_amenity_bits(row, known=False) for row in members], dtype=np.uint8),
+        }
+    
+    def updated(self, rows: Dict[int, Optional[Any]]) -> "MatchBuckets":
+        """
+        A copy with the listings in rows upserted, and the ids mapped to None
+        removed. Buckets without a changed listing are shared with this one; the
+        others are spliced at the changed rows' positions, so the work grows with
+        the number of changes rather than of listings.
+        """
+        changed = np.fromiter(rows, dtype=np.int64, count=len(rows))
+        groups: Dict[Tuple[str, bool], List[Any]] = {}
+        for row in rows.values():
+            if row is not None:
+                groups.setdefault((row.listing_type, row.price is not None), []).append(row)
+        
+        result = MatchBuckets([])
+        for key in self.buckets.keys() | groups.keys():
+            bucket = self.buckets.get(key)
+            if bucket is not None and len(bucket["id"]):
+                # Positions of the changed listings in this bucket, through the id order
+                index = np.minimum(np.searchsorted(bucket["id"], changed, sorter=bucket["by_id"]), len(bucket["id"]) - 1)
+                positions = bucket["by_id"][index]
+                stale = positions[bucket["id"][positions] == changed]
+            else:
+                stale = np.empty(0, dtype=np.int64)
+            if key not in groups and len(stale) == 0:
+                result.buckets[key] = bucket
+                continue
+            
+            members = sorted(groups.get(key, ()), key=lambda row: (row.price or 0.0, row.id))
+            if bucket is None or len(stale) == len(bucket["id"]):
+                columns = self._columns(members)
+            else:
+                columns = {name: np.delete(values, stale) for name, values in bucket.items() if name != "by_id"}
+                if members:
+                    # Keep the (price, id) order: find each new row's place within its price
+                    prices, ids = columns["price"], columns["id"]
+                    at = []
+                    for row in members:
+                        price = row.price or 0.0
+                        lower = int(np.searchsorted(prices, price, side="left"))
+                        upper = int(np.searchsorted(prices, price, side="right"))
+                        at.append(lower + int(np.searchsorted(ids[lower:upper], row.id)))
+                    added = self._columns(members)
+                    columns = {name: np.insert(values, at, added[name]) for name, values in columns.items()}
+            if len(columns["id"]):
+                columns["by_id"] = np.argsort(columns["id"])
+                result.buckets[key] = columns
+        return result
+    
+    def __len__(self) -> int:
+        return sum(len(bucket["id"]) for bucket in self.buckets.values())
+    
+    def ids(self) -> List[int]:
+        return sorted(int(listing_id) for bucket in self.buckets.values() for listing_id in bucket["id"])
+    
+    def row(self, listing_id: int) -> Optional[MatchRow]:
+        """
+        The listing as a MatchRow, or None when it isn't in any bucket
+        """
+        for (listing_type, priced), bucket in self.buckets.items():
+            index = int(np.searchsorted(bucket["id"], listing_id, sorter=bucket["by_id"]))
+            if index == len(bucket["id"]) or bucket["id"][bucket["by_id"][index]] != listing_id:
+                continue
+            position = bucket["by_id"][index]
+            known, values = int(bucket["known"][position]), int(bucket["values"][position])
+            amenities = [bool(values >> bit & 1) if known >> bit & 1 else None for bit in range(len(AMENITIES))]
+            return MatchRow(
+                int(listing_id),
+                int(bucket["user_id"][position]),
+                listing_type,
+                float(bucket["price"][position]) if priced else None,
+                int(bucket["rooms"][position]),
+                date.fromordinal(int(bucket["start"][position])),
+                date.fromordinal(int(bucket["end"][position])),
+                *amenities
+            )
+        return None
+    
+    def _passes(self, bucket: Dict[str, np.ndarray], positions: np.ndarray, target: Any, room_tolerance: int) -> np.ndarray:
+        # Hard criteria other than type and price, as in match_crud._candidate_statements
+        return (
+            (bucket["user_id"][positions] != target.user_id)
+            & (np.abs(bucket["rooms"][positions] - target.num_rooms_available) <= room_tolerance)
+            & (bucket["start"][positions] <= target.end_date.toordinal())
+            & (bucket["end"][positions] >= target.start_date.toordinal())
+        )
+    
+    def _walk(self, bucket, start: int, stop: int, step: int, target: Any, room_tolerance: int, limit: int) -> np.ndarray:
+        """
+        Positions of the first `limit` passing rows from start towards stop, in chunks
+        """
+        found: List[np.ndarray] = []
+        count = 0
+        chunk = max(4 * limit, 256)
+        while count < limit and start != stop:
+            end = min(start + chunk, stop) if step > 0 else max(start - chunk, stop)
+            positions = np.arange(start, end, step)
+            passing = positions[self._passes(bucket, positions, target, room_tolerance)]
+            found.append(passing[:limit - count])
+            count += len(found[-1])
+            start = end
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+    
+    def candidates(self, target: Any, price_band: float, room_tolerance: int, limit: int) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """
+        The bucket and candidate positions for target: up to `limit` passing
+        listings at or above its price and `limit` below, nearest first
+        """
+        bucket = self.buckets.get((target.listing_type, target.price is not None))
+        if bucket is None:
+            return {}, np.empty(0, dtype=np.int64)
+        
+        if target.price is None:
+            # Highest ids first, as in SQL; the bucket is in id order
+            return bucket, self._walk(bucket, len(bucket["id"]) - 1, -1, -1, target, room_tolerance, 2 * limit)
+        
+        low, high = price_range(target.price, price_band)
+        prices = bucket["price"]
+        middle = int(np.searchsorted(prices, target.price, side="left"))
+        upper = int(np.searchsorted(prices, high, side="right"))
+        lower = int(np.searchsorted(prices, low, side="left"))
+        return bucket, np.concatenate([
+            self._walk(bucket, middle, upper, 1, target, room_tolerance, limit),
+            self._walk(bucket, middle - 1, lower - 1, -1, target, room_tolerance, limit),
+        ])
+    
+    def scores(self, bucket: Dict[str, np.ndarray], positions: np.ndarray, target: Any, price_band: float, room_tolerance: int) -> np.ndarray:
+        """
+        score_match for target against every candidate position
+        """
+        start = np.maximum(bucket["start"][positions], target.start_date.toordinal())
+        end = np.minimum(bucket["end"][positions], target.end_date.toordinal())
+        target_days = (target.end_date - target.start_date).days + 1
+        date_score = (end - start + 1) / np.maximum(bucket["end"][positions] - bucket["start"][positions] + 1, target_days)
+        
+        if target.price:
+            prices = bucket["price"][positions]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ratio = np.maximum(prices, target.price) / np.minimum(prices, target.price)
+                price_score = np.maximum(0.0, 1 - (ratio - 1) / price_band) if price_band > 0 else (ratio == 1).astype(np.float64)
+            price_score = np.where(prices > 0, price_score, 0.5)
+        else:
+            price_score = np.full(len(positions), 0.5)
+        
+        room_score = 1 - np.abs(bucket["rooms"][positions] - target.num_rooms_available) / (room_tolerance + 1)
+        
+        known = bucket["known"][positions] & _amenity_bits(target, known=True)
+        agree = ~(bucket["values"][positions] ^ _amenity_bits(target, known=False)) & known
+        known_count = _BIT_COUNTS[known]
+        amenity_score = np.where(known_count > 0, _BIT_COUNTS[agree] / np.maximum(known_count, 1), 0.5)
+        
+        return (
+            DATE_WEIGHT * date_score
+            + PRICE_WEIGHT * price_score
+            + ROOM_WEIGHT * room_score
+            + AMENITY_WEIGHT * amenity_score
+        )
+    
+    def top_matches(self, target: Any, price_band: float, room_tolerance: int, candidate_limit: int, limit: int) -> List[Tuple[int, SwapMatch]]:
+        """
+        (listing id, match) for the best `limit` matches of target, best first,
+        newest first among equal scores
+        """
+        bucket, positions = self.candidates(target, price_band, room_tolerance, candidate_limit)
+        if len(positions) == 0:
+            return []
+        raw = self.scores(bucket, positions, target, price_band, room_tolerance)
+        if len(raw) > limit:
+            # np.round differs from round() in score_match in the last digit now and
+            # then, so only use it to find the candidates that can make the cut
+            cutoff = np.partition(np.round(raw, 4), -limit)[-limit] - 2e-4
+            positions, raw = positions[raw >= cutoff], raw[raw >= cutoff]
+        scores = np.array([round(score, 4) for score in raw.tolist()])
+        ids = bucket["id"][positions]
+        best = np.lexsort((ids, scores))[::-1][:limit]
+        
+        target_start, target_end = target.start_date.toordinal(), target.end_date.toordinal()
+        return [
+            (
+                int(ids[index]),
+                SwapMatch(
+                    score=float(scores[index]),
+                    overlap_start=date.fromordinal(max(int(bucket["start"][positions[index]]), target_start)),
+                    overlap_end=date.fromordinal(min(int(bucket["end"][positions[index]]), target_end))
+                )
+            )
+            for index in best
+        ]
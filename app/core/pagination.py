@@ -0,0 +1,30 @@
+from typing import Any, List
+import base64
+import binascii
+import json
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort: str, key: List[Any]) -> str:
+    """
+    Opaque keyset cursor: the sort it belongs to and the sort key of the last row returned
+    """
+    payload = json.dumps({"s": sort, "k": key}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise InvalidCursor("Malformed cursor")
+    
+    if not isinstance(payload, dict) or not isinstance(payload.get("k"), list):
+        raise InvalidCursor("Malformed cursor")
+    if payload.get("s") != sort:
+        raise InvalidCursor("Cursor belongs to a different sort order")
+    return payload["k"]
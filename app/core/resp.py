@@ -0,0 +1,105 @@
+"""
+Minimal client for the Redis protocol (RESP2): enough for the shared listing
+result cache and read-your-writes record, against Redis, Valkey or the local
+stand-in in cache_server.py.
+"""
+from typing import Any
+from urllib.parse import urlparse
+import socket
+import threading
+
+
+class RespError(Exception):
+    """
+    Error reply from the server
+    """
+
+
+def encode_command(*args: Any) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        value = arg if isinstance(arg, bytes) else str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(value), value))
+    return b"".join(parts)
+
+
+def read_reply(stream) -> Any:
+    """
+    One reply from a binary file-like stream: bytes, int, str, list or None
+    """
+    line = stream.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("Connection closed by the server")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode()
+    if kind == b"-":
+        raise RespError(body.decode())
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)
+        if len(data) != length + 2:
+            raise ConnectionError("Connection closed by the server")
+        return data[:-2]
+    if kind == b"*":
+        length = int(body)
+        return None if length < 0 else [read_reply(stream) for _ in range(length)]
+    raise ConnectionError(f"Unexpected reply {line!r}")
+
+
+class RespClient:
+    """
+    Blocking client with one connection per thread, reconnecting once when a
+    connection has dropped
+    """
+    
+    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0, timeout: float = 0.5):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.timeout = timeout
+        self._local = threading.local()
+    
+    @classmethod
+    def from_url(cls, url: str, timeout: float = 0.5) -> "RespClient":
+        # redis://host:port/db
+        parsed = urlparse(url)
+        if parsed.scheme != "redis":
+            raise ValueError(f"Unsupported cache URL scheme: {parsed.scheme!r}")
+        db = int(parsed.path.lstrip("/") or 0)
+        return cls(parsed.hostname or "localhost", parsed.port or 6379, db, timeout)
+    
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = (sock, sock.makefile("rb"))
+            self._local.connection = connection
+            if self.db:
+                self._send(connection, ("SELECT", self.db))
+        return connection
+    
+    def _send(self, connection, args) -> Any:
+        sock, stream = connection
+        sock.sendall(encode_command(*args))
+        return read_reply(stream)
+    
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        self._local.connection = None
+        if connection is not None:
+            connection[1].close()
+            connection[0].close()
+    
+    def execute(self, *args: Any) -> Any:
+        try:
+            return self._send(self._connection(), args)
+        except OSError:
+            # A pooled connection the server has closed; retry once on a new one
+            self.close()
+            return self._send(self._connection(), args)
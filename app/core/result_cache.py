@@ -0,0 +1,217 @@
+"""
+Cache of serialized query results, invalidated wholesale on writes.
+
+Entries are tagged with the generation current when their query started, and a
+write replaces the generation with a new random token, so a result computed while
+a write lands is never served afterwards. Tokens are never reused: when the
+generation is missing - evicted by the server like any other key, or lost in a
+restart - the next miss starts a new one, and nothing tagged with an earlier
+generation can become valid again. Concurrent misses for the same key in a
+process wait for a single load instead of each running the query.
+
+The backend is pluggable: LocalBackend keeps entries in the process, and
+RespBackend shares them, and the generation, between workers through a
+Redis-compatible server (Redis, Valkey, or the stand-in in cache_server.py).
+LocalBackend's generation is per process too, so a write only invalidates the
+worker that made it; deployments with more than one worker need RespBackend.
+Backend failures are logged and treated as misses.
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import secrets
+import threading
+from app.core.cache import TTLCache
+from app.core.resp import RespClient, RespError
+
+logger = logging.getLogger(__name__)
+
+
+class LocalBackend:
+    """
+    Per-process backend: a size-bounded LRU of entries and an in-memory
+    generation, which writes in other worker processes don't replace
+    """
+    blocking = False
+    
+    def __init__(self, max_size: int, ttl: float):
+        self._entries = TTLCache(max_size=max_size, ttl=ttl)
+        # Kept apart from the LRU, so never evicted
+        self._generations: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+    
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return [self._generations[key] if key in self._generations else self._entries.get(key) for key in keys]
+    
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._entries.set(key, value, ttl)
+    
+    def put(self, key: str, value: bytes, only_new: bool = False) -> bool:
+        """
+        Store a generation without expiry; with only_new, only when there is none
+        """
+        with self._lock:
+            if only_new and key in self._generations:
+                return False
+            self._generations[key] = value
+            return True
+    
+    def stats(self) -> Dict[str, Any]:
+        return self._entries.stats()
+
+
+class RespBackend:
+    """
+    Shared backend on a Redis-compatible server; entry bounds are the server's
+    (maxmemory with an LRU policy on Redis, --max-keys on cache_server.py)
+    """
+    blocking = True
+    
+    def __init__(self, url: str, timeout: float = 0.5):
+        self._client = RespClient.from_url(url, timeout)
+    
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return self._client.execute("MGET", *keys)
+    
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._client.execute("SET", key, value, "PX", int(ttl * 1000))
+    
+    def put(self, key: str, value: bytes, only_new: bool = False) -> bool:
+        return self._client.execute("SET", key, value, *(["NX"] if only_new else [])) is not None
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"url": f"redis://{self._client.host}:{self._client.port}/{self._client.db}"}
+
+
+def make_backend(url: str, max_size: int, ttl: float):
+    return RespBackend(url) if url else LocalBackend(max_size, ttl)
+
+
+class ResultCache:
+    """
+    Serialized results by key, with write invalidation and coalesced misses;
+    see the module docstring
+    """
+    
+    def __init__(self, backend, namespace: str, ttl: float, max_entry_bytes: int):
+        self.backend = backend
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+        self._generation_key = f"{namespace}:generation"
+        self._loading: Dict[str, "asyncio.Future[Tuple[bytes, Optional[str]]]"] = {}
+    
+    def key(self, **params: Any) -> str:
+        """
+        Key for a query; parameters that are None don't count
+        """
+        normalized = json.dumps(
+            sorted((name, value) for name, value in params.items() if value is not None),
+            default=str,
+            separators=(",", ":")
+        )
+        return f"{self.namespace}:{hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()}"
+    
+    async def _call(self, method: Callable, *args: Any) -> Any:
+        try:
+            if self.backend.blocking:
+                return await asyncio.to_thread(method, *args)
+            return method(*args)
+        except (OSError, RespError) as e:
+            self.errors += 1
+            logger.warning("Result cache backend unavailable: %s", e)
+            return None
+    
+    @staticmethod
+    def _unpack(value: bytes) -> Tuple[bytes, Optional[str], bytes]:
+        # generation \n cursor \n body
+        generation, cursor, body = value.split(b"\n", 2)
+        return generation, cursor.decode() or None, body
+    
+    async def get_or_load(
+        self,
+        key: str,
+        load: Callable[[], Awaitable[Tuple[bytes, Optional[str]]]]
+    ) -> Tuple[bytes, Optional[str], bool]:
+        """
+        (body, next cursor, whether it came from the cache) for key, calling
+        load() on a miss; load's exceptions reach every caller waiting on it
+        """
+        generation = None
+        if key not in self._loading:
+            values = await self._call(self.backend.get_many, [self._generation_key, key]) or [None, None]
+            generation = values[0]
+            if generation is not None and values[1] is not None:
+                stored_generation, cursor, body = self._unpack(values[1])
+                if stored_generation == generation:
+                    self.hits += 1
+                    return body, cursor, True
+        
+        # Already loading, possibly since the backend read above
+        if key in self._loading:
+            self.coalesced += 1
+            body, cursor = await asyncio.shield(self._loading[key])
+            return body, cursor, False
+        
+        self.misses += 1
+        loading = self._loading[key] = asyncio.get_running_loop().create_future()
+        try:
+            if generation is None:
+                generation = await self._start_generation()
+            body, cursor = await load()
+        except BaseException as e:
+            loading.set_exception(e)
+            # Nobody else may be waiting
+            loading.exception()
+            raise
+        else:
+            loading.set_result((body, cursor))
+        finally:
+            del self._loading[key]
+        
+        if generation is not None and len(body) <= self.max_entry_bytes:
+            # Tagged with the generation read before loading: a write made meanwhile invalidates it
+            await self._call(self.backend.set, key, b"\n".join([generation, (cursor or "").encode(), body]), self.ttl)
+        return body, cursor, False
+    
+    async def _start_generation(self) -> Optional[bytes]:
+        """
+        A new generation when there is none, or None when another one got there
+        first (or the backend failed); results loaded meanwhile aren't stored
+        """
+        generation = secrets.token_hex(8).encode()
+        return generation if await self._call(self.backend.put, self._generation_key, generation, True) else None
+    
+    def invalidate(self) -> None:
+        """
+        Drop every entry; called after writes commit
+        """
+        try:
+            self.backend.put(self._generation_key, secrets.token_hex(8).encode())
+        except (OSError, RespError) as e:
+            self.errors += 1
+            logger.warning("Result cache invalidation failed: %s", e)
+    
+    async def invalidate_async(self) -> None:
+        """
+        invalidate() for the event loop; blocking backends are called from a thread
+        """
+        if self.backend.blocking:
+            await asyncio.to_thread(self.invalidate)
+        else:
+            self.invalidate()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.backend.stats(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+        }
@@ -0,0 +1,394 @@
+"""
+In-process columnar index over the searchable listing attributes.
+
+Every structured filter of GET /listings becomes a vectorized mask over NumPy
+columns, and the page is picked with a partial sort, so a search never touches
+the database until the page's rows are loaded by primary key. Text search (q)
+isn't covered; FTS5 / tsvector handle relevance ranking in SQL.
+
+The index is per process. Writes through listing_crud update it in place; writes
+from other workers or outside the app are picked up by the periodic rebuild
+(SEARCH_INDEX_REFRESH_INTERVAL).
+"""
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import threading
+import numpy as np
+from app.core.geo import KM_PER_DEGREE, longitude_scale, radius_bbox
+
+# Attribute names read from Listing objects or rows selected with the same names
+SOURCE_ATTRIBUTES = (
+    "id",
+    "user_id",
+    "listing_type",
+    "effective_price",
+    "num_rooms_available",
+    "num_bathrooms",
+    "distance_to_university",
+    "furnished",
+    "gym_in_building",
+    "laundry_in_unit",
+    "laundry_in_building",
+    "start_date",
+    "end_date",
+    "latitude",
+    "longitude"
+)
+
+# Nullable numbers are NaN and nullable booleans -1, so comparisons exclude NULLs as SQL does
+COLUMN_TYPES = {
+    "id": np.int64,
+    "user_id": np.int64,
+    "is_unit": np.bool_,
+    "price": np.float64,
+    "rooms": np.int32,
+    "bathrooms": np.int32,
+    "distance": np.float64,
+    "furnished": np.int8,
+    "gym_in_building": np.int8,
+    "laundry_in_unit": np.int8,
+    "laundry_in_building": np.int8,
+    "start_day": np.int32,
+    "end_day": np.int32,
+    "latitude": np.float64,
+    "longitude": np.float64,
+}
+
+SUPPORTED_FILTERS = {
+    "listing_type",
+    "user_id",
+    "min_price",
+    "max_price",
+    "min_rooms",
+    "max_rooms",
+    "min_bathrooms",
+    "max_bathrooms",
+    "max_distance",
+    "furnished",
+    "gym_in_building",
+    "laundry_in_unit",
+    "laundry_in_building",
+    "available_from",
+    "available_to",
+    "availability_match",
+    "bbox",
+    "near",
+    "radius",
+}
+
+# Column and direction behind each listing_crud sort order; None sorts by id alone
+SORT_KEYS = {
+    "newest": (None, True),
+    "price_asc": ("price", False),
+    "price_desc": ("price", True),
+    "distance": ("distance", False),
+    "soonest": ("start_day", False),
+}
+
+
+def _number(value: Any) -> float:
+    return np.nan if value is None else float(value)
+
+
+def _flag(value: Optional[bool]) -> int:
+    return -1 if value is None else int(bool(value))
+
+
+def _values(source: Any) -> Dict[str, Any]:
+    return {
+        "id": source.id,
+        "user_id": source.user_id,
+        "is_unit": source.listing_type == "unit",
+        "price": _number(source.effective_price),
+        "rooms": source.num_rooms_available,
+        "bathrooms": source.num_bathrooms,
+        "distance": _number(source.distance_to_university),
+        "furnished": _flag(source.furnished),
+        "gym_in_building": _flag(source.gym_in_building),
+        "laundry_in_unit": _flag(source.laundry_in_unit),
+        "laundry_in_building": _flag(source.laundry_in_building),
+        "start_day": source.start_date.toordinal(),
+        "end_day": source.end_date.toordinal(),
+        "latitude": _number(source.latitude),
+        "longitude": _number(source.longitude),
+    }
+
+
+class _Columns:
+    """
+    Growable column arrays. Deleted rows stay in place with live=False until the
+    next compaction. Rows are kept in id order while new listings arrive with
+    increasing ids, which lets search read the newest matches off the end.
+    """
+    
+    def __init__(self, capacity: int = 1024):
+        capacity = max(capacity, 1024)
+        self.arrays = {name: np.zeros(capacity, dtype=dtype) for name, dtype in COLUMN_TYPES.items()}
+        self.live = np.zeros(capacity, dtype=np.bool_)
+        self.size = 0
+        self.positions: Dict[int, int] = {}
+        self.ordered = True
+    
+    @classmethod
+    def build(cls, sources: Iterable[Any]) -> "_Columns":
+        rows = sorted((_values(source) for source in sources), key=lambda row: row["id"])
+        columns = cls(capacity=len(rows) + len(rows) // 4)
+        for name in COLUMN_TYPES:
+            columns.arrays[name][:len(rows)] = [row[name] for row in rows]
+        columns.live[:len(rows)] = True
+        columns.size = len(rows)
+        columns.positions = {row["id"]: position for position, row in enumerate(rows)}
+        return columns
+    
+    def upsert(self, values: Dict[str, Any]) -> None:
+        position = self.positions.get(values["id"])
+        if position is None:
+            if self.size and values["id"] < self.arrays["id"][self.size - 1]:
+                self.ordered = False
+            if self.size == len(self.live):
+                self._grow()
+            position = self.size
+            self.size += 1
+            self.positions[values["id"]] = position
+        for name, value in values.items():
+            self.arrays[name][position] = value
+        self.live[position] = True
+    
+    def remove(self, listing_id: int) -> None:
+        position = self.positions.pop(listing_id, None)
+        if position is not None:
+            self.live[position] = False
+        if self.size > 1024 and len(self.positions) < self.size // 2:
+            self._compact()
+    
+    def _grow(self) -> None:
+        capacity = len(self.live) * 2
+        for name, array in self.arrays.items():
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[:self.size] = array[:self.size]
+            self.arrays[name] = grown
+        live = np.zeros(capacity, dtype=np.bool_)
+        live[:self.size] = self.live[:self.size]
+        self.live = live
+    
+    def _compact(self) -> None:
+        keep = np.flatnonzero(self.live[:self.size])
+        for name, array in self.arrays.items():
+            array[:len(keep)] = array[keep]
+        self.live[:len(keep)] = True
+        self.live[len(keep):] = False
+        self.size = len(keep)
+        self.positions = {int(listing_id): position for position, listing_id in enumerate(self.arrays["id"][:self.size])}
+    
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self.arrays.values()) + self.live.nbytes
+
+
+class ListingSearchIndex:
+    """
+    Listing filters and ordering answered from memory; see the module docstring
+    """
+    
+    def __init__(self):
+        self._columns = _Columns()
+        self._lock = threading.RLock()
+        self._ready = False
+        # Writes made while a rebuild is reading the database, replayed onto its result
+        self._pending: Optional[List[Tuple[str, Any]]] = None
+    
+    @property
+    def ready(self) -> bool:
+        return self._ready
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ready": self._ready,
+                "listings": len(self._columns.positions),
+                "memory_bytes": self._columns.nbytes(),
+            }
+    
+    def rebuild(self, load: Callable[[], Iterable[Any]]) -> None:
+        """
+        Replace the contents with the listings returned by load(). Writes made while
+        load() runs are replayed onto the result, so none are lost.
+        """
+        with self._lock:
+            self._pending = []
+        try:
+            columns = _Columns.build(load())
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        
+        with self._lock:
+            for operation, argument in self._pending or []:
+                if operation == "upsert":
+                    columns.upsert(argument)
+                else:
+                    columns.remove(argument)
+            self._columns = columns
+            self._pending = None
+            self._ready = True
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._columns = _Columns()
+            self._pending = None
+            self._ready = False
+    
+    def upsert(self, listing: Any) -> None:
+        values = _values(listing)
+        with self._lock:
+            self._columns.upsert(values)
+            if self._pending is not None:
+                self._pending.append(("upsert", values))
+    
+    def remove(self, listing_id: int) -> None:
+        with self._lock:
+            self._columns.remove(listing_id)
+            if self._pending is not None:
+                self._pending.append(("remove", listing_id))
+    
+    def supports(self, filters: Dict[str, Any]) -> bool:
+        return self._ready and all(
+            name in SUPPORTED_FILTERS or value is None
+            for name, value in filters.items()
+        )
+    
+    def _mask(self, columns: _Columns, filters: Dict[str, Any]) -> np.ndarray:
+        n = columns.size
+        a = {name: array[:n] for name, array in columns.arrays.items()}
+        mask = columns.live[:n].copy()
+        
+        listing_type = filters.get("listing_type")
+        if listing_type:
+            mask &= a["is_unit"] == (listing_type == "unit")
+        if filters.get("user_id"):
+            mask &= a["user_id"] == filters["user_id"]
+        
+        for name, column, above in (
+            ("min_price", "price", True),
+            ("max_price", "price", False),
+            ("min_rooms", "rooms", True),
+            ("max_rooms", "rooms", False),
+            ("min_bathrooms", "bathrooms", True),
+            ("max_bathrooms", "bathrooms", False),
+            ("max_distance", "distance", False),
+        ):
+            value = filters.get(name)
+            if value is not None:
+                mask &= (a[column] >= value) if above else (a[column] <= value)
+        
+        for name in ("furnished", "gym_in_building", "laundry_in_unit", "laundry_in_building"):
+            value = filters.get(name)
+            if value is not None:
+                mask &= a[name] == int(value)
+        
+        available_from: Optional[date] = filters.get("available_from")
+        available_to: Optional[date] = filters.get("available_to")
+        if filters.get("availability_match", "overlap") == "contains":
+            # With one side open, the listing must cover the given day (see app.db.expressions)
+            first, last = available_from or available_to, available_to or available_from
+            if first is not None:
+                mask &= (a["start_day"] <= first.toordinal()) & (a["end_day"] >= last.toordinal())
+        else:
+            if available_to is not None:
+                mask &= a["start_day"] <= available_to.toordinal()
+            if available_from is not None:
+                mask &= a["end_day"] >= available_from.toordinal()
+        
+        boxes = []
+        if filters.get("bbox") is not None:
+            boxes.append(filters["bbox"])
+        near, radius = filters.get("near"), filters.get("radius")
+        if near is not None and radius is not None:
+            boxes.append(radius_bbox(near[0], near[1], radius))
+        for box in boxes:
+            mask &= (a["latitude"] >= box.south) & (a["latitude"] <= box.north)
+            mask &= (a["longitude"] >= box.west) & (a["longitude"] <= box.east)
+        if near is not None and radius is not None:
+            # Same equirectangular check as app.db.spatial.apply_radius
+            dy = a["latitude"] - near[0]
+            dx = (a["longitude"] - near[1]) * longitude_scale(near[0])
+            mask &= dx * dx + dy * dy <= (radius / KM_PER_DEGREE) ** 2
+        
+        return mask
+    
+    def search(
+        self,
+        limit: int,
+        skip: int = 0,
+        after: Optional[Tuple[Any, int]] = None,
+        sort: str = "newest",
+        **filters
+    ) -> List[int]:
+        """
+        Ids of matching listings in the given sort order (see listing_crud.LISTING_SORTS),
+        starting after the (sort value, id) key of a previous page
+        """
+        name, descending = SORT_KEYS[sort]
+        with self._lock:
+            columns = self._columns
+            mask = self._mask(columns, filters)
+            ids = columns.arrays["id"][:columns.size][mask]
+            values = columns.arrays[name][:columns.size][mask] if name else None
+            ordered = columns.ordered
+        
+        wanted = skip + limit
+        if values is None:
+            return self._newest(ids, ordered, skip, wanted, after[1] if after else None)
+        if wanted <= 0 or len(ids) == 0:
+            return []
+        
+        # Sort ascending on (value, id), negated for descending orders; NaN (no
+        # value) ranks last
+        values = values.astype(np.float64)
+        if descending:
+            values, ids = -values, -ids
+        if after is not None:
+            after_value, after_id = after
+            if isinstance(after_value, date):
+                after_value = after_value.toordinal()
+            after_id = -after_id if descending else after_id
+            missing = np.isnan(values)
+            if after_value is None:
+                keep = missing & (ids > after_id)
+            else:
+                after_value = -after_value if descending else after_value
+                keep = missing | (values > after_value) | ((values == after_value) & (ids > after_id))
+            values, ids = values[keep], ids[keep]
+        values = np.where(np.isnan(values), np.inf, values)
+        
+        if wanted < len(ids):
+            # Partial sort: keep the rows up to the wanted-th smallest value, ties included
+            kth = np.partition(values, wanted - 1)[wanted - 1]
+            keep = values <= kth
+            values, ids = values[keep], ids[keep]
+        page = ids[np.lexsort((ids, values))[skip:wanted]]
+        return (-page if descending else page).tolist()
+    
+    @staticmethod
+    def _newest(ids: np.ndarray, ordered: bool, skip: int, wanted: int, after_id: Optional[int]) -> List[int]:
+        if ordered:
+            if after_id is not None:
+                ids = ids[:np.searchsorted(ids, after_id)]
+            return ids[::-1][skip:wanted].tolist()
+        
+        if after_id is not None:
+            ids = ids[ids < after_id]
+        if wanted <= 0 or len(ids) == 0:
+            return []
+        if wanted < len(ids):
+            # Partial sort: only the top `wanted` ids get ordered
+            ids = ids[np.argpartition(-ids, wanted - 1)[:wanted]]
+        ids = np.sort(ids)[::-1]
+        return ids[skip:wanted].tolist()
+    
+    def count(self, **filters) -> int:
+        with self._lock:
+            return int(np.count_nonzero(self._mask(self._columns, filters)))
+
+
+listing_index = ListingSearchIndex()
@@ -1,107 +1,438 @@
-from typing import Dict, Any, Optional
-from jose import jwt, JWTError
-from cryptography.hazmat.primitives.asymmetric import rsa
-from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.backends import default_backend
-import base64
+from typing import Dict, Any, Optional, Callable, Awaitable
+from concurrent.futures import ThreadPoolExecutor
+from jose import jwt, jwk, JWTError
+from jose.backends.base import Key
+import asyncio
+import hashlib
+import threading
+import time
+import httpx
 import requests
+from app.core.cache import TTLCache
 from app.core.config import settings
 
 
+def get_jwks_url() -> str:
+    return settings.AUTH0_JWKS_URL or f"https://{settings.AUTH0_DOMAIN}/.well-known/jwks.json"
+
+
 def get_jwks() -> Dict[str, Any]:
-    jwks_url = f"https://{settings.AUTH0_DOMAIN}/.well-known/jwks.json"
-    response = requests.get(jwks_url)
+    response = requests.get(get_jwks_url(), timeout=settings.JWKS_FETCH_TIMEOUT)
     response.raise_for_status()
     return response.json()
 
 
-def get_rsa_key(token: str, jwks: Dict[str, Any]):
-    unverified_header = jwt.get_unverified_header(token)
-    jwk = None
+# Pooled keep-alive client for async JWKS fetches, created on first use
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=settings.JWKS_FETCH_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.AUTH_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.AUTH_HTTP_MAX_CONNECTIONS,
+                keepalive_expiry=settings.AUTH_HTTP_KEEPALIVE_EXPIRY
+            )
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def get_jwks_async() -> Dict[str, Any]:
+    response = await get_http_client().get(get_jwks_url())
+    response.raise_for_status()
+    return response.json()
+
+
+class JWKSCache:
+    """
+    Process-wide JWKS cache and key registry.
+    
+    Each refresh builds ready-to-verify key objects keyed by `kid`, so per-request
+    verification only does the signature check.
+    
+    - Keys are served from memory for `ttl` seconds.
+    - An unknown `kid` forces one refresh, at most once per `min_refresh_interval`,
+      so Auth0 key rotation is picked up without letting bad tokens hammer Auth0.
+    - Concurrent misses share a single fetch (single-flight), across threads using the
+      sync methods and coroutines using the `a`-prefixed ones.
+    - If a refresh fails, the last good JWKS is served for up to `stale_if_error`
+      seconds past its expiry. With nothing to serve, the failure is returned to
+      callers without another fetch until `min_refresh_interval` has passed.
+    """
+    
+    def __init__(
+        self,
+        fetch: Callable[[], Dict[str, Any]],
+        async_fetch: Optional[Callable[[], Awaitable[Dict[str, Any]]]],
+        ttl: float,
+        min_refresh_interval: float,
+        stale_if_error: float
+    ):
+        self._fetch = fetch
+        self._async_fetch = async_fetch
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.stale_if_error = stale_if_error
+        self._jwks: Optional[Dict[str, Any]] = None
+        self._keys: Dict[str, Key] = {}
+        self._fetched_at = 0.0
+        self._last_attempt = 0.0
+        self._last_error: Optional[Exception] = None
+        self._generation = 0
+        # Reentrant: a blocking call made on the event loop while a coroutine on the same
+        # thread holds it (see _arefresh) fetches again rather than deadlocking
+        self._lock = threading.RLock()
+        self._async_lock: Optional[asyncio.Lock] = None
+        self._async_lock_loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def get(self) -> Dict[str, Any]:
+        jwks = self._jwks
+        if jwks is not None and time.monotonic() - self._fetched_at < self.ttl:
+            return jwks
+        return self._refresh(force=False)
+    
+    def get_key(self, kid: Optional[str]) -> Key:
+        """
+        Return the verification key for `kid`, refreshing once if the cached set doesn't have it.
+        """
+        self.get()
+        key = self._keys.get(kid)
+        if key is None:
+            self._refresh(force=True)
+            key = self._keys.get(kid)
+        if key is None:
+            raise JWTError("Unable to find appropriate key")
+        return key
+    
+    async def aget(self) -> Dict[str, Any]:
+        jwks = self._jwks
+        if jwks is not None and time.monotonic() - self._fetched_at < self.ttl:
+            return jwks
+        return await self._arefresh(force=False)
+    
+    async def aget_key(self, kid: Optional[str]) -> Key:
+        await self.aget()
+        key = self._keys.get(kid)
+        if key is None:
+            await self._arefresh(force=True)
+            key = self._keys.get(kid)
+        if key is None:
+            raise JWTError("Unable to find appropriate key")
+        return key
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._jwks = None
+            self._keys = {}
+            self._fetched_at = 0.0
+            self._last_attempt = 0.0
+            self._last_error = None
+            self._generation += 1
+    
+    def _refresh(self, force: bool) -> Dict[str, Any]:
+        seen_generation = self._generation
+        
+        with self._lock:
+            cached = self._usable_without_fetch(force, seen_generation)
+            if cached is not None:
+                return cached
+            
+            self._check_backoff()
+            attempted_at = self._last_attempt = time.monotonic()
+            try:
+                jwks = self._fetch()
+            except Exception as e:
+                self._last_error = e
+                stale = self._stale_jwks(attempted_at)
+                if stale is None:
+                    raise
+                return stale
+            
+            return self._install(jwks)
     
-    for key in jwks["keys"]:
-        if key["kid"] == unverified_header["kid"]:
-            jwk = key
-            break
+    async def _arefresh(self, force: bool) -> Dict[str, Any]:
+        if self._async_fetch is None:
+            return self._refresh(force)
+        
+        seen_generation = self._generation
+        
+        async with self._get_async_lock():
+            cached = self._usable_without_fetch(force, seen_generation)
+            if cached is not None:
+                return cached
+            
+            # Also hold the sync path's lock, so a thread and a coroutine don't both fetch.
+            # While a thread has it, wait for it in a worker thread rather than on the loop.
+            while not self._lock.acquire(blocking=False):
+                await asyncio.to_thread(self._wait_for_sync_refresh)
+            try:
+                cached = self._usable_without_fetch(force, seen_generation)
+                if cached is not None:
+                    return cached
+                
+                self._check_backoff()
+                attempted_at = self._last_attempt = time.monotonic()
+                try:
+                    jwks = await self._async_fetch()
+                except Exception as e:
+                    self._last_error = e
+                    stale = self._stale_jwks(attempted_at)
+                    if stale is None:
+                        raise
+                    return stale
+                
+                return self._install(jwks)
+            finally:
+                self._lock.release()
     
-    if not jwk:
-        raise JWTError("Unable to find appropriate key")
+    def _wait_for_sync_refresh(self) -> None:
+        with self._lock:
+            pass
     
-    def base64url_decode(value: str) -> bytes:
-        padding = 4 - len(value) % 4
-        if padding != 4:
-            value += "=" * padding
-        return base64.urlsafe_b64decode(value)
+    def _get_async_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._async_lock is None or self._async_lock_loop is not loop:
+            self._async_lock = asyncio.Lock()
+            self._async_lock_loop = loop
+        return self._async_lock
     
-    n_bytes = base64url_decode(jwk["n"])
-    e_bytes = base64url_decode(jwk["e"])
+    def _usable_without_fetch(self, force: bool, seen_generation: int) -> Optional[Dict[str, Any]]:
+        if self._jwks is None:
+            return None
+        
+        # Another caller refreshed while we were waiting for the lock
+        if self._generation != seen_generation:
+            return self._jwks
+        
+        now = time.monotonic()
+        if not force and now - self._fetched_at < self.ttl:
+            return self._jwks
+        
+        recently_attempted = now - self._last_attempt < self.min_refresh_interval
+        if recently_attempted and now - self._fetched_at < self.ttl + self.stale_if_error:
+            return self._jwks
+        
+        return None
     
-    n_int = int.from_bytes(n_bytes, byteorder="big")
-    e_int = int.from_bytes(e_bytes, byteorder="big")
+    def _check_backoff(self) -> None:
+        # Nothing servable and the last fetch failed recently: fail without fetching,
+        # so an outage doesn't turn every request into a JWKS fetch
+        if self._last_error is not None and time.monotonic() - self._last_attempt < self.min_refresh_interval:
+            raise JWTError(f"JWKS unavailable, last fetch failed: {self._last_error}")
     
-    public_key = rsa.RSAPublicNumbers(e_int, n_int).public_key(default_backend())
+    def _stale_jwks(self, now: float) -> Optional[Dict[str, Any]]:
+        if self._jwks is not None and now - self._fetched_at < self.ttl + self.stale_if_error:
+            return self._jwks
+        return None
     
-    pem = public_key.public_bytes(
-        encoding=serialization.Encoding.PEM,
-        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    def _install(self, jwks: Dict[str, Any]) -> Dict[str, Any]:
+        self._keys = build_key_registry(jwks)
+        self._jwks = jwks
+        self._fetched_at = time.monotonic()
+        self._last_error = None
+        self._generation += 1
+        return jwks
+
+
+def build_key_registry(jwks: Dict[str, Any]) -> Dict[str, Key]:
+    """
+    Parse every signing key in a JWKS once, keyed by kid
+    """
+    keys = {}
+    for key_data in jwks.get("keys", []):
+        kid = key_data.get("kid")
+        if not kid or key_data.get("use", "sig") != "sig":
+            continue
+        algorithm = key_data.get("alg") or settings.AUTH0_ALGORITHMS[0]
+        try:
+            keys[kid] = jwk.construct(key_data, algorithm)
+        except Exception:
+            # Skip keys we can't use rather than failing the whole set
+            continue
+    return keys
+
+
+jwks_cache = JWKSCache(
+    fetch=lambda: get_jwks(),
+    async_fetch=lambda: get_jwks_async(),
+    ttl=settings.JWKS_CACHE_TTL,
+    min_refresh_interval=settings.JWKS_MIN_REFRESH_INTERVAL,
+    stale_if_error=settings.JWKS_STALE_IF_ERROR
+)
+
+
+# Verified claims keyed by SHA-256 of the raw token; entries never outlive the token's exp
+access_token_cache = TTLCache(max_size=settings.TOKEN_CACHE_MAX_SIZE, ttl=settings.TOKEN_CACHE_MAX_AGE)
+id_token_cache = TTLCache(max_size=settings.TOKEN_CACHE_MAX_SIZE, ttl=settings.TOKEN_CACHE_MAX_AGE)
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _get_cached_claims(cache: TTLCache, digest: str) -> Optional[Dict[str, Any]]:
+    payload = cache.get(digest)
+    if payload is None:
+        return None
+    return dict(payload)
+
+
+def peek_verified_claims(token: str) -> Optional[Dict[str, Any]]:
+    """
+    Claims for a token that was already verified and is still cached, without verifying it.
+    Only for decisions that don't grant access, such as routing reads.
+    """
+    return _get_cached_claims(access_token_cache, token_digest(token))
+
+
+def _cache_claims(cache: TTLCache, digest: str, payload: Dict[str, Any]) -> None:
+    exp = payload.get("exp")
+    if exp is None:
+        return
+    cache.set(digest, dict(payload), ttl=float(exp) - time.time())
+
+
+# Bounded pool for CPU-bound signature checks so they never run on the event loop
+_verify_executor = ThreadPoolExecutor(
+    max_workers=settings.TOKEN_VERIFY_WORKERS,
+    thread_name_prefix="token-verify"
+)
+
+
+def get_signing_key(token: str) -> Key:
+    unverified_header = jwt.get_unverified_header(token)
+    return jwks_cache.get_key(unverified_header.get("kid"))
+
+
+async def get_signing_key_async(token: str) -> Key:
+    unverified_header = jwt.get_unverified_header(token)
+    return await jwks_cache.aget_key(unverified_header.get("kid"))
+
+
+def _decode_access_token(token: str, rsa_key: Key) -> Dict[str, Any]:
+    return jwt.decode(
+        token,
+        rsa_key,
+        algorithms=settings.AUTH0_ALGORITHMS,
+        audience=settings.AUTH0_API_AUDIENCE,
+        issuer=f"https://{settings.AUTH0_DOMAIN}/",
+        options={"verify_signature": True, "verify_aud": True, "verify_exp": True}
+    )
+
+
+def _decode_id_token(id_token: str, rsa_key: Key) -> Dict[str, Any]:
+    payload = jwt.decode(
+        id_token,
+        rsa_key,
+        algorithms=settings.AUTH0_ALGORITHMS,
+        issuer=f"https://{settings.AUTH0_DOMAIN}/",
+        options={"verify_signature": True, "verify_aud": False, "verify_exp": True}
     )
     
-    return pem
+    if not payload.get("sub"):
+        available_claims = list(payload.keys())
+        raise JWTError(f"ID token missing required claim: sub. Available claims: {available_claims}")
+    
+    return payload
+
+
+def _access_token_error(e: JWTError) -> JWTError:
+    error_msg = str(e)
+    if "expired" in error_msg.lower():
+        return JWTError(f"Token has expired: {error_msg}")
+    elif "audience" in error_msg.lower() or "aud" in error_msg.lower():
+        return JWTError(f"Token audience mismatch. Expected: {settings.AUTH0_API_AUDIENCE}. Error: {error_msg}")
+    elif "issuer" in error_msg.lower() or "iss" in error_msg.lower():
+        return JWTError(f"Token issuer mismatch. Expected: https://{settings.AUTH0_DOMAIN}/. Error: {error_msg}")
+    elif "signature" in error_msg.lower():
+        return JWTError(f"Token signature verification failed: {error_msg}")
+    else:
+        return JWTError(f"Token verification failed: {error_msg}")
 
 
 def verify_auth0_token(token: str) -> Dict[str, Any]:
+    digest = token_digest(token)
+    cached_payload = _get_cached_claims(access_token_cache, digest)
+    if cached_payload is not None:
+        return cached_payload
+    
     try:
-        jwks = get_jwks()
-        rsa_key = get_rsa_key(token, jwks)
-        
-        payload = jwt.decode(
-            token,
-            rsa_key,
-            algorithms=settings.AUTH0_ALGORITHMS,
-            audience=settings.AUTH0_API_AUDIENCE,
-            issuer=f"https://{settings.AUTH0_DOMAIN}/",
-            options={"verify_signature": True, "verify_aud": True, "verify_exp": True}
-        )
-        
+        rsa_key = get_signing_key(token)
+        payload = _decode_access_token(token, rsa_key)
+        _cache_claims(access_token_cache, digest, payload)
         return payload
-        
+    
     except JWTError as e:
-        error_msg = str(e)
-        if "expired" in error_msg.lower():
-            raise JWTError(f"Token has expired: {error_msg}")
-        elif "audience" in error_msg.lower() or "aud" in error_msg.lower():
-            raise JWTError(f"Token audience mismatch. Expected: {settings.AUTH0_API_AUDIENCE}. Error: {error_msg}")
-        elif "issuer" in error_msg.lower() or "iss" in error_msg.lower():
-            raise JWTError(f"Token issuer mismatch. Expected: https://{settings.AUTH0_DOMAIN}/. Error: {error_msg}")
-        elif "signature" in error_msg.lower():
-            raise JWTError(f"Token signature verification failed: {error_msg}")
-        else:
-            raise JWTError(f"Token verification failed: {error_msg}")
+        raise _access_token_error(e)
+    except Exception as e:
+        raise Exception(f"Error verifying token: {str(e)}")
+
+
+async def verify_auth0_token_async(token: str) -> Dict[str, Any]:
+    """
+    Non-blocking verify_auth0_token: JWKS is fetched with the async client and
+    the signature check runs on the bounded verification executor.
+    """
+    digest = token_digest(token)
+    cached_payload = _get_cached_claims(access_token_cache, digest)
+    if cached_payload is not None:
+        return cached_payload
+    
+    try:
+        rsa_key = await get_signing_key_async(token)
+        loop = asyncio.get_running_loop()
+        payload = await loop.run_in_executor(_verify_executor, _decode_access_token, token, rsa_key)
+        _cache_claims(access_token_cache, digest, payload)
+        return payload
+    
+    except JWTError as e:
+        raise _access_token_error(e)
     except Exception as e:
         raise Exception(f"Error verifying token: {str(e)}")
 
 
 def verify_id_token(id_token: str) -> Dict[str, Any]:
+    digest = token_digest(id_token)
+    cached_payload = _get_cached_claims(id_token_cache, digest)
+    if cached_payload is not None:
+        return cached_payload
+    
     try:
-        jwks = get_jwks()
-        rsa_key = get_rsa_key(id_token, jwks)
-        
-        payload = jwt.decode(
-            id_token,
-            rsa_key,
-            algorithms=settings.AUTH0_ALGORITHMS,
-            issuer=f"https://{settings.AUTH0_DOMAIN}/",
-            options={"verify_signature": True, "verify_aud": False, "verify_exp": True}
-        )
-        
-        if not payload.get("sub"):
-            available_claims = list(payload.keys())
-            raise JWTError(f"ID token missing required claim: sub. Available claims: {available_claims}")
-        
+        rsa_key = get_signing_key(id_token)
+        payload = _decode_id_token(id_token, rsa_key)
+        _cache_claims(id_token_cache, digest, payload)
         return payload
-        
+    
     except JWTError as e:
         raise JWTError(f"ID token verification failed: {str(e)}")
     except Exception as e:
         raise Exception(f"Error verifying ID token: {str(e)}")
 
+
+async def verify_id_token_async(id_token: str) -> Dict[str, Any]:
+    digest = token_digest(id_token)
+    cached_payload = _get_cached_claims(id_token_cache, digest)
+    if cached_payload is not None:
+        return cached_payload
+    
+    try:
+        rsa_key = await get_signing_key_async(id_token)
+        loop = asyncio.get_running_loop()
+        payload = await loop.run_in_executor(_verify_executor, _decode_id_token, id_token, rsa_key)
+        _cache_claims(id_token_cache, digest, payload)
+        return payload
+    
+    except JWTError as e:
+        raise JWTError(f"ID token verification failed: {str(e)}")
+    except Exception as e:
+        raise Exception(f"Error verifying ID token: {str(e)}")
@@ -0,0 +1,368 @@
+"""
+Multi-party swap chains over a directed compatibility graph.
+
+An edge a -> b means a's owner could stay at b: the listings are the same type
+with different owners, within MATCH_ROOM_TOLERANCE rooms and MATCH_PRICE_BAND
+of each other's price (or both unpriced), and b is available for at least
+SWAP_CHAIN_COVERAGE of a's dates. Coverage is what makes edges one-way: a long
+listing covers a short one's stay but not the other way round. Each listing
+keeps only its SWAP_CHAIN_MAX_DEGREE best out-edges by match score.
+
+A chain is a cycle a -> b -> c -> a: every owner stays at the next listing and
+the last at the first. Searches walk out-edges from a listing, best first, up to
+a maximum length, and stop at a time budget.
+
+The graph is per process, like the search index. Writes through listing_crud are
+queued and applied incrementally by the periodic refresh, recomputing only the
+out-edges they can change; the periodic rebuild picks up writes from elsewhere
+and listings that have ended. Both build a new graph next to the one being
+searched and swap it in, so searches never wait for them.
+"""
+from datetime import date
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+import heapq
+import threading
+import time
+import numpy as np
+from app.core.matching import AMENITIES, MatchBuckets, MatchRow, price_range
+
+
+class SwapChain(NamedTuple):
+    # Mean edge score; listing_ids[i]'s owner stays at listing_ids[i + 1], the last at the first
+    score: float
+    listing_ids: Tuple[int, ...]
+
+
+def match_row(listing: Any) -> MatchRow:
+    """
+    MatchRow from a Listing object
+    """
+    return MatchRow(
+        listing.id,
+        listing.user_id,
+        listing.listing_type,
+        listing.effective_price,
+        listing.num_rooms_available,
+        listing.start_date,
+        listing.end_date,
+        *(getattr(listing, name) for name in AMENITIES)
+    )
+
+
+class _Graph:
+    """
+    Nodes, best-first out-edges and the reverse adjacency. A graph is updated in
+    place until it is published; after that, changes go to a copy().
+    """
+    
+    def __init__(self, price_band: float, room_tolerance: int, coverage: float, max_degree: int):
+        self.price_band = price_band
+        self.room_tolerance = room_tolerance
+        self.coverage = coverage
+        self.max_degree = max_degree
+        self.nodes: Dict[int, MatchRow] = {}
+        self.out: Dict[int, Dict[int, float]] = {}
+        self.incoming: Dict[int, Set[int]] = {}
+        self.buckets = MatchBuckets([])
+        # Incoming sets that belong to this graph rather than the one it was copied from
+        self._owned: Optional[Set[int]] = None
+    
+    def copy(self) -> "_Graph":
+        """
+        A graph to apply() changes to without touching this one. Out-edge dicts and
+        incoming sets are shared until changed, which replaces or copies them.
+        """
+        graph = _Graph(self.price_band, self.room_tolerance, self.coverage, self.max_degree)
+        graph.nodes = dict(self.nodes)
+        graph.out = dict(self.out)
+        graph.incoming = dict(self.incoming)
+        graph.buckets = self.buckets
+        graph._owned = set()
+        return graph
+    
+    def _incoming(self, listing_id: int) -> Set[int]:
+        # The incoming set of listing_id, copied first when it is shared
+        if self._owned is not None and listing_id not in self._owned:
+            self._owned.add(listing_id)
+            self.incoming[listing_id] = set(self.incoming.get(listing_id, ()))
+        return self.incoming.setdefault(listing_id, set())
+    
+    def edges(self, target: MatchRow, reverse: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (ids, scores) of the listings target has an edge to, or with reverse=True
+        the listings that have an edge to target
+        """
+        bucket = self.buckets.buckets.get((target.listing_type, target.price is not None))
+        if bucket is None:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        
+        if target.price is None:
+            lower, upper = 0, len(bucket["id"])
+        else:
+            low, high = price_range(target.price, self.price_band)
+            lower = int(np.searchsorted(bucket["price"], low, side="left"))
+            upper = int(np.searchsorted(bucket["price"], high, side="right"))
+        
+        start, end = bucket["start"][lower:upper], bucket["end"][lower:upper]
+        target_start, target_end = target.start_date.toordinal(), target.end_date.toordinal()
+        covered = np.minimum(end, target_end) - np.maximum(start, target_start) + 1
+        needed = self.coverage * ((end - start + 1) if reverse else (target_end - target_start + 1))
+        mask = (
+            (bucket["user_id"][lower:upper] != target.user_id)
+            & (np.abs(bucket["rooms"][lower:upper] - target.num_rooms_available) <= self.room_tolerance)
+            & (covered >= np.maximum(needed, 1))
+        )
+        positions = np.flatnonzero(mask) + lower
+        if len(positions) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        scores = self.buckets.scores(bucket, positions, target, self.price_band, self.room_tolerance)
+        return bucket["id"][positions], np.round(scores, 4)
+    
+    def _set_out(self, listing_id: int, edges: Dict[int, float]) -> None:
+        for match_id in self.out.pop(listing_id, {}):
+            self._incoming(match_id).discard(listing_id)
+        self.out[listing_id] = edges
+        for match_id in edges:
+            self._incoming(match_id).add(listing_id)
+    
+    def _recompute(self, listing_id: int) -> None:
+        ids, scores = self.edges(self.nodes[listing_id])
+        if len(scores) > self.max_degree:
+            keep = scores >= np.partition(scores, -self.max_degree)[-self.max_degree]
+            ids, scores = ids[keep], scores[keep]
+        best = np.lexsort((ids, scores))[::-1][:self.max_degree]
+        self._set_out(listing_id, dict(zip(ids[best].tolist(), scores[best].tolist())))
+    
+    def _offer(self, listing_id: int, match_id: int, score: float) -> None:
+        # Add or raise the edge if it makes listing_id's best max_degree
+        edges = self.out[listing_id]
+        if match_id not in edges and len(edges) >= self.max_degree:
+            # Edges are kept best first
+            weakest = next(reversed(edges))
+            if (score, match_id) <= (edges[weakest], weakest):
+                return
+            edges = {other: other_score for other, other_score in edges.items() if other != weakest}
+            self._incoming(weakest).discard(listing_id)
+        edges = {**edges, match_id: score}
+        self.out[listing_id] = dict(sorted(edges.items(), key=lambda edge: (edge[1], edge[0]), reverse=True))
+        self._incoming(match_id).add(listing_id)
+    
+    def apply(self, rows: Dict[int, Optional[MatchRow]], today: date) -> int:
+        """
+        Upsert the rows and remove the ids mapped to None; returns how many
+        listings had their out-edges recomputed
+        """
+        changed = set(rows)
+        # Listings with an edge to a changed one, which may lose it or see its score change
+        pointing = {listing_id: set(self.incoming.get(listing_id, ())) for listing_id in changed}
+        
+        for listing_id, row in rows.items():
+            if row is None or row.end_date < today:
+                self.nodes.pop(listing_id, None)
+                self._set_out(listing_id, {})
+                del self.out[listing_id]
+            else:
+                self.nodes[listing_id] = row
+        # Only the changed rows move; the buckets of the graph this was copied from stay as they are
+        self.buckets = self.buckets.updated({listing_id: self.nodes.get(listing_id) for listing_id in changed})
+        
+        present = changed & self.nodes.keys()
+        recompute = set(present)
+        for listing_id in changed - present:
+            recompute.update(pointing[listing_id])
+        
+        # Edges to changed listings; nothing left to offer when every listing is recomputed
+        offers: Dict[int, Dict[int, float]] = {}
+        if len(recompute) < len(self.nodes):
+            for listing_id in present:
+                ids, scores = self.edges(self.nodes[listing_id], reverse=True)
+                offers[listing_id] = dict(zip(ids.tolist(), scores.tolist()))
+                for other in (pointing[listing_id] & self.nodes.keys()) - recompute:
+                    # A lost or weaker edge may have to be replaced by one outside the best max_degree
+                    if offers[listing_id].get(other, -1.0) < self.out[other].get(listing_id, 0.0):
+                        recompute.add(other)
+        
+        recompute &= self.nodes.keys()
+        for listing_id in recompute:
+            self._recompute(listing_id)
+        
+        # Changed listings entering other listings' best edges, or scoring higher in them
+        for listing_id, edges in offers.items():
+            for other, score in edges.items():
+                if other not in recompute:
+                    self._offer(other, listing_id, score)
+        for listing_id in changed - present:
+            if not self.incoming.get(listing_id):
+                self.incoming.pop(listing_id, None)
+        return len(recompute)
+    
+    def _distances_to(self, start: int, max_length: int, deadline: float) -> Optional[Dict[int, int]]:
+        # Fewest edges from each listing back to start, up to max_length - 1; None past deadline
+        distances = {start: 0}
+        frontier = [start]
+        for distance in range(1, max_length):
+            reached = []
+            for expanded, target in enumerate(frontier, 1):
+                if expanded % 256 == 0 and time.perf_counter() > deadline:
+                    return None
+                for listing_id in self.incoming.get(target, ()):
+                    if listing_id not in distances:
+                        distances[listing_id] = distance
+                        reached.append(listing_id)
+            frontier = reached
+        return distances
+    
+    def chains(self, start: int, max_length: int, limit: int, deadline: float) -> Tuple[List[SwapChain], bool]:
+        """
+        The best `limit` chains of 3 to max_length listings through start, and
+        whether the search finished before deadline (time.perf_counter())
+        """
+        if start not in self.nodes:
+            return [], True
+        # The budget covers this search too; without the distances no chain can be pruned safely
+        distances = self._distances_to(start, max_length, deadline)
+        if distances is None:
+            return [], False
+        best: List[Tuple[float, Tuple[int, ...]]] = []
+        path, users, scores = [start], {self.nodes[start].user_id}, [0.0]
+        stack = [iter(self.out[start].items())]
+        expanded = 0
+        
+        while stack:
+            expanded += 1
+            if expanded % 256 == 0 and time.perf_counter() > deadline:
+                return self._ranked(best), False
+            
+            edge = next(stack[-1], None)
+            if edge is None:
+                stack.pop()
+                users.discard(self.nodes[path.pop()].user_id)
+                scores.pop()
+                continue
+            
+            match_id, score = edge
+            total = scores[-1] + score
+            if match_id == start:
+                if len(path) >= 3:
+                    chain = (round(total / len(path), 4), tuple(path))
+                    if len(best) < limit:
+                        heapq.heappush(best, chain)
+                    else:
+                        heapq.heappushpop(best, chain)
+                continue
+            
+            length = len(path) + distances.get(match_id, max_length)
+            if length > max_length or match_id in path or self.nodes[match_id].user_id in users:
+                continue
+            # Edge scores are at most 1, so no chain through this path can average more
+            if len(best) == limit and (total + max_length - len(path)) / max_length < best[0][0]:
+                continue
+            
+            path.append(match_id)
+            users.add(self.nodes[match_id].user_id)
+            scores.append(total)
+            stack.append(iter(self.out[match_id].items()))
+        return self._ranked(best), True
+    
+    @staticmethod
+    def _ranked(best: List[Tuple[float, Tuple[int, ...]]]) -> List[SwapChain]:
+        return [SwapChain(score, listing_ids) for score, listing_ids in sorted(best, reverse=True)]
+
+
+class SwapChainGraph:
+    """
+    The compatibility graph and chain search; see the module docstring
+    """
+    
+    def __init__(self):
+        # Published graph, never changed once searches can see it
+        self._graph: Optional[_Graph] = None
+        # Guards the published graph and the queue, and is only held briefly
+        self._lock = threading.RLock()
+        # Serializes rebuilds and refreshes, which take seconds
+        self._update_lock = threading.Lock()
+        # Listing writes not applied yet: id -> row, or None when deleted
+        self._queued: Dict[int, Optional[MatchRow]] = {}
+    
+    @property
+    def ready(self) -> bool:
+        return self._graph is not None
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            graph, queued = self._graph, len(self._queued)
+        return {
+            "ready": graph is not None,
+            "listings": len(graph.nodes) if graph else 0,
+            "edges": sum(len(edges) for edges in graph.out.values()) if graph else 0,
+            "queued": queued,
+        }
+    
+    def rebuild(
+        self,
+        rows: Iterable[MatchRow],
+        price_band: float,
+        room_tolerance: int,
+        coverage: float,
+        max_degree: int
+    ) -> None:
+        """
+        Build a new graph from the active listings in rows. Queued writes stay
+        queued for the next refresh(), so none made during the build are lost.
+        """
+        with self._update_lock:
+            graph = _Graph(price_band, room_tolerance, coverage, max_degree)
+            graph.apply({row.id: row for row in rows}, date.today())
+            with self._lock:
+                self._graph = graph
+    
+    def clear(self) -> None:
+        with self._update_lock, self._lock:
+            self._graph = None
+            self._queued = {}
+    
+    def upsert(self, listing: Any) -> None:
+        row = match_row(listing)
+        with self._lock:
+            self._queued[row.id] = row
+    
+    def remove(self, listing_id: int) -> None:
+        with self._lock:
+            self._queued[listing_id] = None
+    
+    def refresh(self) -> int:
+        """
+        Apply the queued writes; returns how many listings had their out-edges recomputed
+        """
+        with self._update_lock:
+            with self._lock:
+                if self._graph is None or not self._queued:
+                    return 0
+                queued, self._queued = self._queued, {}
+                published = self._graph
+            # Searches keep using the published graph meanwhile
+            graph = published.copy()
+            try:
+                recomputed = graph.apply(queued, date.today())
+            except BaseException:
+                # Writes queued since take precedence
+                with self._lock:
+                    self._queued = {**queued, **self._queued}
+                raise
+            with self._lock:
+                self._graph = graph
+            return recomputed
+    
+    def chains(self, listing_id: int, max_length: int, limit: int, budget_seconds: float) -> Tuple[List[SwapChain], bool]:
+        """
+        The best chains through a listing, and False when the time budget cut the search short
+        """
+        deadline = time.perf_counter() + budget_seconds
+        with self._lock:
+            graph = self._graph
+        if graph is None:
+            return [], True
+        return graph.chains(listing_id, max_length, limit, deadline)
+
+
+swap_graph = SwapChainGraph()
@@ -1,5 +1,6 @@
 from app.crud import user as user_crud
 from app.crud import listing as listing_crud
+from app.crud import match as match_crud
 
-__all__ = ["user_crud", "listing_crud"]
+__all__ = ["user_crud", "listing_crud", "match_crud"]
 
@@ -1,6 +1,22 @@
+from sqlalchemy import select, Select, case, func, literal_column, null, tuple_
+from sqlalchemy.sql.elements import ColumnElement
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
-from typing import Optional, List
+from typing import Any, Dict, Hashable, NamedTuple, Optional, List, Literal, Tuple
+import json
+from datetime import date
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.pagination import encode_cursor, decode_cursor, InvalidCursor
+from app.core.result_cache import ResultCache, make_backend
+from app.core.search_index import listing_index, SOURCE_ATTRIBUTES
+from app.core.swap_chains import swap_graph
+from app.db.expressions import period_overlaps, period_contains
+from app.db.search import apply_search, search_terms
+from app.db.spatial import apply_bbox, apply_radius
+from app.core.geo import BoundingBox
 from app.models.listing import Listing
+from app.models.user import User
 from app.schemas.listing import (
     UnitListingCreate,
     RoomListingCreate,
@@ -10,14 +26,164 @@ from app.schemas.listing import (
 )
 
 
-def get_listing(db: Session, listing_id: int) -> Optional[Listing]:
-    return db.query(Listing).options(joinedload(Listing.user)).filter(Listing.id == listing_id).first()
+def _listing_select() -> Select:
+    return select(Listing).options(joinedload(Listing.user))
 
 
-def get_listings(
-    db: Session,
-    skip: int = 0,
-    limit: int = 100,
+# Compact listing card: plain columns instead of ORM objects, the first image
+# only, and the owner only when asked for
+CARD_COLUMNS = (
+    Listing.id,
+    Listing.listing_type,
+    Listing.address,
+    Listing.building_name,
+    Listing.effective_price.label("price"),
+    Listing.num_rooms_available,
+    Listing.num_bathrooms,
+    Listing.furnished,
+    Listing.start_date,
+    Listing.end_date,
+    Listing.distance_to_university,
+    Listing.latitude,
+    Listing.longitude,
+    Listing.images[0].as_string().label("thumbnail"),
+    Listing.user_id
+)
+
+CARD_USER_COLUMNS = (
+    User.first_name.label("user_first_name"),
+    User.last_name.label("user_last_name"),
+    User.email.label("user_email")
+)
+
+
+def _card_select(include_user: bool = False) -> Select:
+    if not include_user:
+        return select(*CARD_COLUMNS)
+    return select(*CARD_COLUMNS, *CARD_USER_COLUMNS).join(User, Listing.user_id == User.id)
+
+
+def _card(row, include_user: bool) -> Dict[str, Any]:
+    card = {column.key: getattr(row, column.key) for column in CARD_COLUMNS}
+    if include_user:
+        card["user"] = {
+            "id": row.user_id,
+            "first_name": row.user_first_name,
+            "last_name": row.user_last_name,
+            "email": row.user_email
+        }
+    return card
+
+
+# Sort orders. Each walks an index on (sort column, id) - the primary key for
+# newest - so a sorted, filtered, limited query reads rows in order and stops once
+# the page is full instead of sorting every match. The id breaks ties, and the
+# (value, id) pair of the last row is the keyset cursor. Listings with no value
+# for the sort column come last, in id order in the sort's direction: newest
+# first for descending sorts, oldest first for ascending ones.
+
+class ListingSort(NamedTuple):
+    attribute: Optional[str]
+    descending: bool
+
+
+LISTING_SORTS: Dict[str, ListingSort] = {
+    "newest": ListingSort(None, True),
+    "price_asc": ListingSort("effective_price", False),
+    "price_desc": ListingSort("effective_price", True),
+    "distance": ListingSort("distance_to_university", False),
+    "soonest": ListingSort("start_date", False),
+}
+
+# Ids increase with insertion order, so newest is simply id descending
+DEFAULT_SORT = "newest"
+
+# Sort attributes that card rows carry under a different name
+CARD_LABELS = {"effective_price": "price"}
+
+
+def listing_cursor(row: Any, sort: str = DEFAULT_SORT, labels: Optional[Dict[str, str]] = None) -> str:
+    attribute = LISTING_SORTS[sort].attribute
+    if attribute is None:
+        return encode_cursor(sort, [row.id])
+    value = getattr(row, (labels or {}).get(attribute, attribute))
+    if isinstance(value, date):
+        value = value.isoformat()
+    return encode_cursor(sort, [value, row.id])
+
+
+def _cursor_key(cursor: str, sort: str) -> Tuple[Any, int]:
+    """
+    Decode a cursor into the (sort value, id) of the last row returned; the value
+    is None for newest and for listings without one
+    """
+    attribute = LISTING_SORTS[sort].attribute
+    key = decode_cursor(cursor, sort)
+    if len(key) != (1 if attribute is None else 2) or not isinstance(key[-1], int):
+        raise InvalidCursor("Malformed cursor")
+    
+    value = None if attribute is None else key[0]
+    if value is not None:
+        try:
+            value = date.fromisoformat(value) if attribute == "start_date" else float(value)
+        except (TypeError, ValueError):
+            raise InvalidCursor("Malformed cursor")
+    return value, key[-1]
+
+
+def _sorted_segments(query: Select, sort: str, key: Optional[Tuple[Any, int]]) -> List[Select]:
+    """
+    Statements whose rows, concatenated, are the query's rows in sort order after
+    key. Rows with a NULL sort value get their own statement, so each one is a
+    single range scan of the sort index.
+    """
+    spec = LISTING_SORTS[sort]
+    id_order = Listing.id.desc() if spec.descending else Listing.id.asc()
+    
+    def after_id(listing_id: int) -> ColumnElement:
+        return Listing.id < listing_id if spec.descending else Listing.id > listing_id
+    
+    if spec.attribute is None:
+        if key is not None:
+            query = query.filter(after_id(key[1]))
+        return [query.order_by(id_order)]
+    
+    column = getattr(Listing, spec.attribute)
+    nullable = Listing.__table__.c[spec.attribute].nullable
+    segments = []
+    
+    if key is None or key[0] is not None:
+        segment = query.order_by(column.desc() if spec.descending else column.asc(), id_order)
+        if nullable:
+            segment = segment.filter(column.is_not(None))
+        if key is not None:
+            row_key, last_key = tuple_(column, Listing.id), tuple_(*key)
+            segment = segment.filter(row_key < last_key if spec.descending else row_key > last_key)
+        segments.append(segment)
+    
+    if nullable:
+        segment = query.filter(column.is_(None)).order_by(id_order)
+        if key is not None and key[0] is None:
+            segment = segment.filter(after_id(key[1]))
+        segments.append(segment)
+    
+    return segments
+
+
+def _sort_order(sort: str) -> List[ColumnElement]:
+    # The whole order as one ORDER BY, for offset pagination
+    spec = LISTING_SORTS[sort]
+    id_order = Listing.id.desc() if spec.descending else Listing.id.asc()
+    if spec.attribute is None:
+        return [id_order]
+    column = getattr(Listing, spec.attribute)
+    return [(column.desc() if spec.descending else column.asc()).nulls_last(), id_order]
+
+
+def _filter_listings(
+    query: Select,
+    dialect_name: str,
+    q: Optional[str] = None,
     listing_type: Optional[str] = None,
     user_id: Optional[int] = None,
     min_price: Optional[float] = None,
@@ -30,10 +196,18 @@ def get_listings(
     furnished: Optional[bool] = None,
     gym_in_building: Optional[bool] = None,
     laundry_in_unit: Optional[bool] = None,
-    laundry_in_building: Optional[bool] = None
-) -> List[Listing]:
-    query = db.query(Listing).options(joinedload(Listing.user))
-    
+    laundry_in_building: Optional[bool] = None,
+    available_from: Optional[date] = None,
+    available_to: Optional[date] = None,
+    availability_match: Literal["overlap", "contains"] = "overlap",
+    bbox: Optional[BoundingBox] = None,
+    near: Optional[Tuple[float, float]] = None,
+    radius: Optional[float] = None
+) -> Tuple[Select, Optional[ColumnElement]]:
+    """
+    Apply the search filters to a SELECT over listings. Also returns the relevance
+    ORDER BY expression when q is given.
+    """
     # Basic filters
     if listing_type:
         query = query.filter(Listing.listing_type == listing_type)
@@ -41,16 +215,12 @@ def get_listings(
     if user_id:
         query = query.filter(Listing.user_id == user_id)
     
-    # Price filters - check both unit_price and price_per_room
+    # Price filters - unit_price for units, price_per_room for rooms
     if min_price is not None:
-        query = query.filter(
-            (Listing.unit_price >= min_price) | (Listing.price_per_room >= min_price)
-        )
+        query = query.filter(Listing.effective_price >= min_price)
     
     if max_price is not None:
-        query = query.filter(
-            (Listing.unit_price <= max_price) | (Listing.price_per_room <= max_price)
-        )
+        query = query.filter(Listing.effective_price <= max_price)
     
     # Room filters
     if min_rooms is not None:
@@ -83,18 +253,165 @@ def get_listings(
     if laundry_in_building is not None:
         query = query.filter(Listing.laundry_in_building == laundry_in_building)
     
-    return query.offset(skip).limit(limit).all()
+    # Availability filters - "overlap" matches listings free for any day of the
+    # requested range, "contains" only those free for all of it
+    if available_from is not None or available_to is not None:
+        period = period_contains if availability_match == "contains" else period_overlaps
+        query = query.filter(period(Listing.start_date, Listing.end_date, available_from, available_to))
+    
+    # Location filters - map viewport and distance from a point (km)
+    if bbox is not None:
+        query = apply_bbox(query, dialect_name, Listing.__table__, bbox)
+    
+    if near is not None and radius is not None:
+        query = apply_radius(query, dialect_name, Listing.__table__, near[0], near[1], radius)
+    
+    # Text search
+    terms = search_terms(q)
+    if terms:
+        return apply_search(query, dialect_name, Listing.__table__, terms)
+    return query, None
 
 
-def get_user_listings(db: Session, user_id: int) -> List[Listing]:
-    return db.query(Listing).options(joinedload(Listing.user)).filter(Listing.user_id == user_id).all()
+def _listings_statements(
+    dialect_name: str,
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
+    query: Optional[Select] = None,
+    **filters
+) -> List[Select]:
+    """
+    Filtered and ordered SELECTs, to be read in turn up to the page size (see
+    _sorted_segments); `query` defaults to full listings with their owner.
+    Without a sort, text searches are ordered by relevance and others newest first.
+    """
+    query, relevance = _filter_listings(query if query is not None else _listing_select(), dialect_name, **filters)
+    
+    # Best text matches first, newest first among equal ranks. Relevance isn't a
+    # stable key, so these pages use skip.
+    if sort is None and relevance is not None:
+        if cursor is not None:
+            raise InvalidCursor("Cursors can't be combined with q unless a sort is given; use skip")
+        return [query.order_by(relevance, Listing.id.desc()).offset(skip or None)]
+    
+    sort = sort or DEFAULT_SORT
+    if cursor is None and skip:
+        return [query.order_by(*_sort_order(sort)).offset(skip)]
+    return _sorted_segments(query, sort, _cursor_key(cursor, sort) if cursor is not None else None)
 
 
-def create_listing(db: Session, listing_data: ListingCreate, user_id: int) -> Listing:
+def _page(
+    rows: list,
+    limit: int,
+    sort: Optional[str] = DEFAULT_SORT,
+    labels: Optional[Dict[str, str]] = None
+) -> Tuple[list, Optional[str]]:
+    """
+    Trim a limit + 1 fetch to the page and build the cursor for the next one;
+    relevance order (sort None) has no cursor
+    """
+    if limit <= 0 or len(rows) <= limit:
+        return rows[:max(limit, 0)], None
+    page = rows[:limit]
+    return page, listing_cursor(page[-1], sort, labels) if sort is not None else None
+
+
+def _page_sort(sort: Optional[str], filters: Dict[str, Any]) -> Optional[str]:
+    # The order a page is in: the requested sort, relevance (None) for text search, or newest
+    if sort is None and search_terms(filters.get("q")):
+        return None
+    return sort or DEFAULT_SORT
+
+
+def _fetch(db: Session, statements: List[Select], limit: int, orm: bool = True) -> list:
+    """
+    Read the statements in turn until limit rows have been collected
+    """
+    rows: list = []
+    for stmt in statements:
+        stmt = stmt.limit(limit - len(rows))
+        rows.extend(db.scalars(stmt).unique().all() if orm else db.execute(stmt).all())
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+async def _fetch_async(db: AsyncSession, statements: List[Select], limit: int, orm: bool = True) -> list:
+    rows: list = []
+    for stmt in statements:
+        stmt = stmt.limit(limit - len(rows))
+        rows.extend((await db.scalars(stmt)).unique().all() if orm else (await db.execute(stmt)).all())
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+# In-memory search index (SEARCH_INDEX_ENABLED): searches it can answer take
+# their page of ids from listing_index and load just those rows by primary key.
+
+def _index_page_ids(
+    limit: int,
+    skip: int,
+    cursor: Optional[str],
+    sort: Optional[str],
+    filters: Dict[str, Any]
+) -> Optional[List[int]]:
+    """
+    Ids for a page from the in-memory index, or None when SQL has to answer
+    """
+    if not settings.SEARCH_INDEX_ENABLED or not listing_index.supports(filters):
+        return None
+    sort = sort or DEFAULT_SORT
+    if cursor is not None:
+        return listing_index.search(limit, after=_cursor_key(cursor, sort), sort=sort, **filters)
+    return listing_index.search(limit, skip=skip, sort=sort, **filters)
+
+
+def _in_id_order(rows, ids: List[int]) -> list:
+    # Rows deleted since the index saw them are skipped
+    by_id = {row.id: row for row in rows}
+    return [by_id[listing_id] for listing_id in ids if listing_id in by_id]
+
+
+def _index_upsert(listing: Listing) -> None:
+    if settings.SEARCH_INDEX_ENABLED:
+        listing_index.upsert(listing)
+    if settings.SWAP_CHAINS_ENABLED:
+        swap_graph.upsert(listing)
+
+
+def _index_remove(listing_id: int) -> None:
+    if settings.SEARCH_INDEX_ENABLED:
+        listing_index.remove(listing_id)
+    if settings.SWAP_CHAINS_ENABLED:
+        swap_graph.remove(listing_id)
+
+
+def _invalidate_pages() -> None:
+    if settings.LISTING_CACHE_ENABLED:
+        listing_page_cache.invalidate()
+
+
+async def _invalidate_pages_async() -> None:
+    # A shared cache backend is a network round trip, kept off the event loop
+    if settings.LISTING_CACHE_ENABLED:
+        await listing_page_cache.invalidate_async()
+
+
+def rebuild_search_index(db: Session) -> None:
+    """
+    Reload listing_index from the database
+    """
+    columns = [getattr(Listing, name) for name in SOURCE_ATTRIBUTES]
+    listing_index.rebuild(lambda: db.execute(select(*columns)).yield_per(10000))
+
+
+def _build_listing(listing_data: ListingCreate, user_id: int) -> Listing:
     base_data = listing_data.model_dump(exclude={"listing_type", "unit_price", "total_ensuite", "total_shared_bathrooms", "price_per_room", "how_many_ensuite_rooms", "how_many_shared_bathrooms_in_apartment"})
     
     if isinstance(listing_data, UnitListingCreate):
-        db_listing = Listing(
+        return Listing(
             user_id=user_id,
             listing_type="unit",
             unit_price=listing_data.unit_price,
@@ -106,7 +423,7 @@ def create_listing(db: Session, listing_data: ListingCreate, user_id: int) -> Li
             **base_data
         )
     elif isinstance(listing_data, RoomListingCreate):
-        db_listing = Listing(
+        return Listing(
             user_id=user_id,
             listing_type="room",
             price_per_room=listing_data.price_per_room,
@@ -119,10 +436,267 @@ def create_listing(db: Session, listing_data: ListingCreate, user_id: int) -> Li
         )
     else:
         raise ValueError(f"Unknown listing type: {type(listing_data)}")
+
+
+def _apply_listing_update(db_listing: Listing, listing_update: UnitListingUpdate | RoomListingUpdate) -> None:
+    update_data = listing_update.model_dump(exclude_unset=True)
+    
+    for field, value in update_data.items():
+        if hasattr(db_listing, field):
+            setattr(db_listing, field, value)
+
+
+def get_listing(db: Session, listing_id: int) -> Optional[Listing]:
+    return db.scalars(_listing_select().filter(Listing.id == listing_id)).first()
+
+
+def get_listings(db: Session, limit: int = 100, **filters) -> List[Listing]:
+    """
+    Get listings matching the filters accepted by _listings_statements
+    """
+    return _fetch(db, _listings_statements(db.get_bind().dialect.name, **filters), limit)
+
+
+def get_listings_page(
+    db: Session,
+    limit: int = 100,
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
+    **filters
+) -> Tuple[List[Listing], Optional[str]]:
+    """
+    Get one page of listings and the cursor for the next page (None on the last page)
+    """
+    ids = _index_page_ids(limit + 1, skip, cursor, sort, filters)
+    if ids is not None:
+        listings = _in_id_order(db.scalars(_listing_select().filter(Listing.id.in_(ids))).unique(), ids)
+    else:
+        statements = _listings_statements(db.get_bind().dialect.name, skip=skip, cursor=cursor, sort=sort, **filters)
+        listings = _fetch(db, statements, limit + 1)
+    return _page(listings, limit, _page_sort(sort, filters))
+
+
+# Page cache for GET /listings (LISTING_CACHE_ENABLED): serialized pages keyed by
+# the normalized query, all dropped by any listing write through this module.
+
+listing_page_cache = ResultCache(
+    make_backend(settings.LISTING_CACHE_URL, settings.LISTING_CACHE_MAX_SIZE, settings.LISTING_CACHE_TTL),
+    namespace="listings",
+    ttl=settings.LISTING_CACHE_TTL,
+    max_entry_bytes=settings.LISTING_CACHE_MAX_ENTRY_BYTES
+)
+
+
+def listing_page_key(limit: int, skip: int = 0, cursor: Optional[str] = None, sort: Optional[str] = None, **filters) -> str:
+    """
+    Cache key for get_listings_page arguments; queries that give the same page share it
+    """
+    if filters.get("available_from") is None and filters.get("available_to") is None:
+        # Only applies to a requested stay
+        filters["availability_match"] = None
+    return listing_page_cache.key(limit=limit, skip=skip or None, cursor=cursor, sort=_page_sort(sort, filters), **filters)
+
+
+# Facets: one GROUP BY over every facet dimension, rolled up per facet in Python.
+# The grouped rows are bounded by the product of the facet cardinalities, not by
+# the number of listings.
+FACET_COLUMNS = ("listing_type", "furnished", "gym_in_building", "laundry_in_unit", "laundry_in_building", "num_rooms_available")
+BOOLEAN_FACETS = ("furnished", "gym_in_building", "laundry_in_unit", "laundry_in_building")
+
+
+def _price_bucket(bounds: List[float]) -> ColumnElement:
+    """
+    Index of the price bucket: 0 below bounds[0], len(bounds) at or above the last bound.
+    Constants are inlined so SELECT and GROUP BY render the identical expression.
+    """
+    return case(
+        (Listing.effective_price.is_(None), null()),
+        *[
+            (Listing.effective_price < literal_column(repr(float(bound))), literal_column(str(index)))
+            for index, bound in enumerate(bounds)
+        ],
+        else_=literal_column(str(len(bounds)))
+    )
+
+
+def _facets_statement(dialect_name: str, price_buckets: List[float], **filters) -> Select:
+    columns = [getattr(Listing, name) for name in FACET_COLUMNS]
+    bucket = _price_bucket(price_buckets).label("price_bucket")
+    query = select(*columns, bucket, func.count().label("count")).group_by(*columns, bucket)
+    query, _ = _filter_listings(query, dialect_name, **filters)
+    return query
+
+
+def _rollup_facets(rows, price_buckets: List[float]) -> Dict[str, Any]:
+    total = 0
+    listing_types: Dict[str, int] = {}
+    rooms: Dict[int, int] = {}
+    booleans = {name: {"true": 0, "false": 0} for name in BOOLEAN_FACETS}
+    prices = [0] * (len(price_buckets) + 1)
+    
+    for row in rows:
+        total += row.count
+        listing_types[row.listing_type] = listing_types.get(row.listing_type, 0) + row.count
+        rooms[row.num_rooms_available] = rooms.get(row.num_rooms_available, 0) + row.count
+        for name in BOOLEAN_FACETS:
+            value = getattr(row, name)
+            if value is not None:
+                booleans[name]["true" if value else "false"] += row.count
+        if row.price_bucket is not None:
+            prices[row.price_bucket] += row.count
+    
+    bounds = [None, *price_buckets, None]
+    return {
+        "total": total,
+        "listing_type": [{"value": value, "count": count} for value, count in sorted(listing_types.items())],
+        "num_rooms_available": [{"value": value, "count": count} for value, count in sorted(rooms.items())],
+        **booleans,
+        "price": [
+            {"min_price": bounds[index], "max_price": bounds[index + 1], "count": count}
+            for index, count in enumerate(prices)
+        ]
+    }
+
+
+# Result counts. A COUNT capped at exact_limit + 1 rows stays cheap however broad
+# the search; past the cap the total is the PostgreSQL planner's estimate, or an
+# exact count cached per filter set and refreshed off the request path.
+
+class ListingCount(NamedTuple):
+    total: int
+    exact: bool
+    # The total is only a lower bound until refresh_listing_count has run
+    needs_refresh: bool = False
+
+
+listing_count_cache = TTLCache(max_size=settings.TOTAL_COUNT_CACHE_MAX_SIZE, ttl=settings.TOTAL_COUNT_CACHE_TTL)
+# Filter sets with a refresh scheduled; markers expire in case the refresh never runs
+# (failed response, disconnect, restart), so a later search schedules another
+_pending_counts = TTLCache(max_size=settings.TOTAL_COUNT_CACHE_MAX_SIZE, ttl=settings.TOTAL_COUNT_CACHE_TTL)
+
+
+def _count_key(filters: Dict[str, Any]) -> Hashable:
+    return tuple(sorted((name, value) for name, value in filters.items() if value is not None))
+
+
+def _count_statement(dialect_name: str, cap: Optional[int] = None, **filters) -> Select:
+    query, _ = _filter_listings(select(Listing.id), dialect_name, **filters)
+    if cap is not None:
+        query = query.limit(cap + 1)
+    return select(func.count()).select_from(query.subquery())
+
+
+def _explain_statement(dialect_name: str, **filters) -> Select:
+    query, _ = _filter_listings(select(Listing.id), dialect_name, **filters)
+    return query
+
+
+def _plan_rows(explain_output: Any) -> int:
+    plan = json.loads(explain_output) if isinstance(explain_output, str) else explain_output
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _broad_count(dialect_name: str, exact_limit: int, filters: Dict[str, Any]) -> Optional[ListingCount]:
+    """
+    Count for a search past the exact limit, from the cache; None when PostgreSQL
+    should estimate it instead
+    """
+    if dialect_name == "postgresql":
+        return None
+    key = _count_key(filters)
+    cached = listing_count_cache.get(key)
+    if cached is not None:
+        return ListingCount(total=cached, exact=False)
+    if _pending_counts.get(key):
+        return ListingCount(total=exact_limit + 1, exact=False)
+    _pending_counts.set(key, True)
+    return ListingCount(total=exact_limit + 1, exact=False, needs_refresh=True)
+
+
+def count_listings(db: Session, exact_limit: int, **filters) -> ListingCount:
+    """
+    Number of listings matching the filters; exact up to exact_limit, or always
+    when the in-memory index can answer
+    """
+    if settings.SEARCH_INDEX_ENABLED and listing_index.supports(filters):
+        return ListingCount(total=listing_index.count(**filters), exact=True)
+    
+    dialect_name = db.get_bind().dialect.name
+    capped = db.scalar(_count_statement(dialect_name, exact_limit, **filters))
+    if capped <= exact_limit:
+        return ListingCount(total=capped, exact=True)
+    
+    count = _broad_count(dialect_name, exact_limit, filters)
+    if count is not None:
+        return count
+    
+    compiled = _explain_statement(dialect_name, **filters).compile(dialect=db.get_bind().dialect)
+    explain = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    return ListingCount(total=max(_plan_rows(explain), capped), exact=False)
+
+
+def refresh_listing_count(db: Session, **filters) -> None:
+    """
+    Run the full COUNT for a broad search and cache it; meant for a background task
+    """
+    key = _count_key(filters)
+    try:
+        total = db.scalar(_count_statement(db.get_bind().dialect.name, **filters))
+        listing_count_cache.set(key, total)
+    finally:
+        _pending_counts.delete(key)
+
+
+def get_listing_facets(db: Session, price_buckets: List[float], **filters) -> Dict[str, Any]:
+    """
+    Counts per facet value over the listings matching the filters
+    """
+    stmt = _facets_statement(db.get_bind().dialect.name, price_buckets, **filters)
+    return _rollup_facets(db.execute(stmt).all(), price_buckets)
+
+
+def get_listing_cards(
+    db: Session,
+    limit: int = 100,
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
+    include_user: bool = False,
+    **filters
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Like get_listings_page, returning compact card dicts (see CARD_COLUMNS)
+    """
+    ids = _index_page_ids(limit + 1, skip, cursor, sort, filters)
+    if ids is not None:
+        rows = _in_id_order(db.execute(_card_select(include_user).filter(Listing.id.in_(ids))).all(), ids)
+    else:
+        statements = _listings_statements(
+            db.get_bind().dialect.name,
+            skip=skip,
+            cursor=cursor,
+            sort=sort,
+            query=_card_select(include_user),
+            **filters
+        )
+        rows = _fetch(db, statements, limit + 1, orm=False)
+    rows, next_cursor = _page(rows, limit, _page_sort(sort, filters), CARD_LABELS)
+    return [_card(row, include_user) for row in rows], next_cursor
+
+
+def get_user_listings(db: Session, user_id: int) -> List[Listing]:
+    return list(db.scalars(_listing_select().filter(Listing.user_id == user_id)).unique())
+
+
+def create_listing(db: Session, listing_data: ListingCreate, user_id: int) -> Listing:
+    db_listing = _build_listing(listing_data, user_id)
     
     db.add(db_listing)
     db.commit()
     db.refresh(db_listing)
+    _index_upsert(db_listing)
+    _invalidate_pages()
     return db_listing
 
 
@@ -135,14 +709,12 @@ def update_listing(
     if not db_listing:
         return None
     
-    update_data = listing_update.model_dump(exclude_unset=True)
-    
-    for field, value in update_data.items():
-        if hasattr(db_listing, field):
-            setattr(db_listing, field, value)
+    _apply_listing_update(db_listing, listing_update)
     
     db.commit()
     db.refresh(db_listing)
+    _index_upsert(db_listing)
+    _invalidate_pages()
     return db_listing
 
 
@@ -153,5 +725,141 @@ def delete_listing(db: Session, listing_id: int) -> bool:
     
     db.delete(db_listing)
     db.commit()
+    _index_remove(listing_id)
+    _invalidate_pages()
     return True
 
+
+# Async versions for AsyncSession. Relationships can't lazy load here, so writes
+# reload the row with its user instead of calling refresh().
+
+async def get_listing_async(db: AsyncSession, listing_id: int, reload: bool = False) -> Optional[Listing]:
+    stmt = _listing_select().filter(Listing.id == listing_id)
+    if reload:
+        stmt = stmt.execution_options(populate_existing=True)
+    return (await db.scalars(stmt)).first()
+
+
+async def get_listings_async(db: AsyncSession, limit: int = 100, **filters) -> List[Listing]:
+    return await _fetch_async(db, _listings_statements(db.get_bind().dialect.name, **filters), limit)
+
+
+async def get_listings_page_async(
+    db: AsyncSession,
+    limit: int = 100,
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
+    **filters
+) -> Tuple[List[Listing], Optional[str]]:
+    ids = _index_page_ids(limit + 1, skip, cursor, sort, filters)
+    if ids is not None:
+        listings = _in_id_order((await db.scalars(_listing_select().filter(Listing.id.in_(ids)))).unique(), ids)
+    else:
+        statements = _listings_statements(db.get_bind().dialect.name, skip=skip, cursor=cursor, sort=sort, **filters)
+        listings = await _fetch_async(db, statements, limit + 1)
+    return _page(listings, limit, _page_sort(sort, filters))
+
+
+async def get_listing_cards_async(
+    db: AsyncSession,
+    limit: int = 100,
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
+    include_user: bool = False,
+    **filters
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    ids = _index_page_ids(limit + 1, skip, cursor, sort, filters)
+    if ids is not None:
+        rows = _in_id_order((await db.execute(_card_select(include_user).filter(Listing.id.in_(ids)))).all(), ids)
+    else:
+        statements = _listings_statements(
+            db.get_bind().dialect.name,
+            skip=skip,
+            cursor=cursor,
+            sort=sort,
+            query=_card_select(include_user),
+            **filters
+        )
+        rows = await _fetch_async(db, statements, limit + 1, orm=False)
+    rows, next_cursor = _page(rows, limit, _page_sort(sort, filters), CARD_LABELS)
+    return [_card(row, include_user) for row in rows], next_cursor
+
+
+async def count_listings_async(db: AsyncSession, exact_limit: int, **filters) -> ListingCount:
+    if settings.SEARCH_INDEX_ENABLED and listing_index.supports(filters):
+        return ListingCount(total=listing_index.count(**filters), exact=True)
+    
+    dialect_name = db.get_bind().dialect.name
+    capped = await db.scalar(_count_statement(dialect_name, exact_limit, **filters))
+    if capped <= exact_limit:
+        return ListingCount(total=capped, exact=True)
+    
+    count = _broad_count(dialect_name, exact_limit, filters)
+    if count is not None:
+        return count
+    
+    compiled = _explain_statement(dialect_name, **filters).compile(dialect=db.get_bind().dialect)
+    connection = await db.connection()
+    explain = (await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params)).scalar()
+    return ListingCount(total=max(_plan_rows(explain), capped), exact=False)
+
+
+async def refresh_listing_count_async(db: AsyncSession, **filters) -> None:
+    key = _count_key(filters)
+    try:
+        total = await db.scalar(_count_statement(db.get_bind().dialect.name, **filters))
+        listing_count_cache.set(key, total)
+    finally:
+        _pending_counts.delete(key)
+
+
+async def get_listing_facets_async(db: AsyncSession, price_buckets: List[float], **filters) -> Dict[str, Any]:
+    stmt = _facets_statement(db.get_bind().dialect.name, price_buckets, **filters)
+    return _rollup_facets((await db.execute(stmt)).all(), price_buckets)
+
+
+async def get_user_listings_async(db: AsyncSession, user_id: int) -> List[Listing]:
+    return list((await db.scalars(_listing_select().filter(Listing.user_id == user_id))).unique())
+
+
+async def create_listing_async(db: AsyncSession, listing_data: ListingCreate, user_id: int) -> Listing:
+    db_listing = _build_listing(listing_data, user_id)
+    
+    db.add(db_listing)
+    await db.commit()
+    db_listing = await get_listing_async(db, db_listing.id, reload=True)
+    _index_upsert(db_listing)
+    await _invalidate_pages_async()
+    return db_listing
+
+
+async def update_listing_async(
+    db: AsyncSession,
+    listing_id: int,
+    listing_update: UnitListingUpdate | RoomListingUpdate
+) -> Optional[Listing]:
+    db_listing = await get_listing_async(db, listing_id)
+    if not db_listing:
+        return None
+    
+    _apply_listing_update(db_listing, listing_update)
+    
+    await db.commit()
+    db_listing = await get_listing_async(db, listing_id, reload=True)
+    _index_upsert(db_listing)
+    await _invalidate_pages_async()
+    return db_listing
+
+
+async def delete_listing_async(db: AsyncSession, listing_id: int) -> bool:
+    db_listing = await get_listing_async(db, listing_id)
+    if not db_listing:
+        return False
+    
+    await db.delete(db_listing)
+    await db.commit()
+    _index_remove(listing_id)
+    await _invalidate_pages_async()
+    return True
@@ -0,0 +1,424 @@
+from sqlalchemy import delete, func, insert, select, Select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+import asyncio
+import heapq
+import os
+import time
+from app.core.config import settings
+from app.core.matching import AMENITIES, MatchBuckets, MatchRow, SwapMatch, price_range, score_match
+from app.core.swap_chains import SwapChain, swap_graph
+from app.crud.listing import CARD_COLUMNS
+from app.db.expressions import period_overlaps
+from app.models.listing import Listing
+from app.models.match import ListingMatch, ListingMatchQueue
+
+# MatchRow fields; cards are only loaded for the top matches
+MATCH_COLUMNS = (
+    Listing.id,
+    Listing.user_id,
+    Listing.listing_type,
+    Listing.effective_price.label("price"),
+    Listing.num_rooms_available,
+    Listing.start_date,
+    Listing.end_date,
+    *(getattr(Listing, name) for name in AMENITIES)
+)
+
+
+def _target_statement(listing_id: int) -> Select:
+    return select(*MATCH_COLUMNS).where(Listing.id == listing_id)
+
+
+def _cards_statement(ids: List[int]) -> Select:
+    return select(*CARD_COLUMNS).where(Listing.id.in_(ids))
+
+
+def _candidate_statements(target: Any, today: date, price_band: float, room_tolerance: int, limit: int) -> List[Select]:
+    """
+    SELECTs for swap candidates of `target`: active listings meeting the hard
+    criteria of app.core.matching, at most `limit` on each side of its price.
+    Each walks ix_listings_type_price_id outward from the target's price and
+    stops once it has `limit` rows, so the work is bounded however many
+    listings share the price band.
+    """
+    if target.end_date < today:
+        return []
+    
+    query = select(*MATCH_COLUMNS).where(
+        Listing.listing_type == target.listing_type,
+        Listing.user_id != target.user_id,
+        Listing.num_rooms_available.between(
+            target.num_rooms_available - room_tolerance,
+            target.num_rooms_available + room_tolerance
+        ),
+        Listing.end_date >= today,
+        period_overlaps(Listing.start_date, Listing.end_date, target.start_date, target.end_date)
+    )
+    
+    # Unpriced listings only match each other
+    if target.price is None:
+        return [query.where(Listing.effective_price.is_(None)).order_by(Listing.id.desc()).limit(2 * limit)]
+    
+    low, high = price_range(target.price, price_band)
+    return [
+        query.where(Listing.effective_price >= target.price, Listing.effective_price <= high)
+        .order_by(Listing.effective_price.asc(), Listing.id.asc())
+        .limit(limit),
+        query.where(Listing.effective_price < target.price, Listing.effective_price >= low)
+        .order_by(Listing.effective_price.desc(), Listing.id.desc())
+        .limit(limit),
+    ]
+
+
+def _top_matches(target: Any, candidates: list, limit: int) -> List[Tuple[SwapMatch, int]]:
+    scored = []
+    for row in candidates:
+        match = score_match(target, row, settings.MATCH_PRICE_BAND, settings.MATCH_ROOM_TOLERANCE)
+        if match is not None:
+            scored.append((match, row.id))
+    
+    # Best score first, newest first among equal scores
+    return heapq.nlargest(limit, scored, key=lambda item: (item[0].score, item[1]))
+
+
+def _with_cards(top: List[Tuple[SwapMatch, int]], card_rows) -> List[Dict[str, Any]]:
+    cards = {row.id: {column.key: getattr(row, column.key) for column in CARD_COLUMNS} for row in card_rows}
+    return [
+        {
+            "score": match.score,
+            "overlap_start": match.overlap_start,
+            "overlap_end": match.overlap_end,
+            "listing": cards[listing_id]
+        }
+        for match, listing_id in top
+        if listing_id in cards
+    ]
+
+
+def get_matches(db: Session, listing_id: int, limit: int = 20) -> Optional[List[Dict[str, Any]]]:
+    """
+    Top swap matches for a listing as {score, overlap_start, overlap_end, listing card}
+    dicts, best first; None when the listing doesn't exist
+    """
+    row = db.execute(_target_statement(listing_id)).first()
+    if row is None:
+        return None
+    target = MatchRow._make(row)
+    
+    candidates = []
+    for stmt in _candidate_statements(
+        target,
+        date.today(),
+        settings.MATCH_PRICE_BAND,
+        settings.MATCH_ROOM_TOLERANCE,
+        settings.MATCH_CANDIDATE_LIMIT
+    ):
+        candidates.extend(map(MatchRow._make, db.execute(stmt)))
+    
+    top = _top_matches(target, candidates, limit)
+    if not top:
+        return []
+    return _with_cards(top, db.execute(_cards_statement([listing_id for _, listing_id in top])).all())
+
+
+# Async version for AsyncSession
+
+async def get_matches_async(db: AsyncSession, listing_id: int, limit: int = 20) -> Optional[List[Dict[str, Any]]]:
+    row = (await db.execute(_target_statement(listing_id))).first()
+    if row is None:
+        return None
+    target = MatchRow._make(row)
+    
+    candidates = []
+    for stmt in _candidate_statements(
+        target,
+        date.today(),
+        settings.MATCH_PRICE_BAND,
+        settings.MATCH_ROOM_TOLERANCE,
+        settings.MATCH_CANDIDATE_LIMIT
+    ):
+        candidates.extend(map(MatchRow._make, await db.execute(stmt)))
+    
+    top = _top_matches(target, candidates, limit)
+    if not top:
+        return []
+    return _with_cards(top, (await db.execute(_cards_statement([listing_id for _, listing_id in top]))).all())
+
+
+# Materialized matches (MATCHES_MATERIALIZED). run_match_job computes the top
+# MATCH_TOP_K matches of active listings over in-memory MatchBuckets, split across
+# a process pool, and replaces their listing_matches rows; a lookup is then one
+# read of the (listing_id, rank) primary key. Incremental runs only recompute
+# the listings affected by the writes queued in listing_match_queue.
+
+class MatchJobReport(NamedTuple):
+    active_listings: int
+    recomputed: int
+    matches_written: int
+    load_seconds: float
+    seconds: float
+    
+    @property
+    def seconds_per_100k(self) -> float:
+        return self.seconds / self.recomputed * 100_000 if self.recomputed else 0.0
+
+
+class _MatchParams(NamedTuple):
+    price_band: float
+    room_tolerance: int
+    candidate_limit: int
+    top_k: int
+
+
+# Per worker process, set by _init_match_worker
+_worker_buckets: Optional[MatchBuckets] = None
+_worker_params: Optional[_MatchParams] = None
+
+
+def _init_match_worker(buckets: MatchBuckets, params: _MatchParams) -> None:
+    global _worker_buckets, _worker_params
+    _worker_buckets, _worker_params = buckets, params
+
+
+def _match_chunk(listing_ids: List[int]) -> Tuple[List[int], List[Tuple[int, int, int, float, date, date]]]:
+    """
+    (listing_id, rank, match_id, score, overlap_start, overlap_end) rows for a chunk of listings
+    """
+    rows = []
+    for listing_id in listing_ids:
+        target = _worker_buckets.row(listing_id)
+        if target is None:
+            continue
+        top = _worker_buckets.top_matches(
+            target,
+            _worker_params.price_band,
+            _worker_params.room_tolerance,
+            _worker_params.candidate_limit,
+            _worker_params.top_k
+        )
+        rows.extend(
+            (listing_id, rank, match_id, match.score, match.overlap_start, match.overlap_end)
+            for rank, (match_id, match) in enumerate(top)
+        )
+    return listing_ids, rows
+
+
+def load_match_buckets(db: Session, today: date) -> MatchBuckets:
+    rows = db.execute(select(*MATCH_COLUMNS).where(Listing.end_date >= today).execution_options(yield_per=10000))
+    return MatchBuckets(map(MatchRow._make, rows))
+
+
+def _batches(values: List[int], size: int) -> Iterator[List[int]]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _affected_listings(db: Session, buckets: MatchBuckets, changed: List[int], params: _MatchParams) -> List[int]:
+    """
+    Listings whose top matches a change to `changed` can alter: the changed
+    listings, those currently matched with one, and those a changed listing now
+    scores above their weakest stored match (or that have room for more)
+    """
+    affected = set(changed)
+    for batch in _batches(changed, 500):
+        affected.update(db.scalars(select(ListingMatch.listing_id).where(ListingMatch.match_id.in_(batch))))
+    
+    best_new: Dict[int, float] = {}
+    for listing_id in changed:
+        target = buckets.row(listing_id)
+        if target is None:
+            continue
+        bucket, positions = buckets.candidates(target, params.price_band, params.room_tolerance, params.candidate_limit)
+        if len(positions) == 0:
+            continue
+        scores = buckets.scores(bucket, positions, target, params.price_band, params.room_tolerance)
+        for candidate_id, score in zip(bucket["id"][positions].tolist(), scores.tolist()):
+            best_new[candidate_id] = max(score, best_new.get(candidate_id, 0.0))
+    
+    stored: Dict[int, Tuple[int, float]] = {}
+    for batch in _batches(list(best_new), 500):
+        stmt = (
+            select(ListingMatch.listing_id, func.count(), func.min(ListingMatch.score))
+            .where(ListingMatch.listing_id.in_(batch))
+            .group_by(ListingMatch.listing_id)
+        )
+        stored.update((listing_id, (count, weakest)) for listing_id, count, weakest in db.execute(stmt))
+    
+    for candidate_id, score in best_new.items():
+        count, weakest = stored.get(candidate_id, (0, 0.0))
+        if count < params.top_k or score > weakest:
+            affected.add(candidate_id)
+    return sorted(affected)
+
+
+def _computed_chunks(buckets: MatchBuckets, chunks: List[List[int]], params: _MatchParams, workers: int):
+    if workers <= 1:
+        _init_match_worker(buckets, params)
+        yield from map(_match_chunk, chunks)
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_match_worker, initargs=(buckets, params)) as pool:
+        yield from pool.map(_match_chunk, chunks)
+
+
+def run_match_job(db: Session, full: bool = False, workers: Optional[int] = None) -> MatchJobReport:
+    """
+    Recompute and store the top matches of the listings affected by queued
+    writes, or of every active listing with full=True. Incremental runs can
+    miss a listing whose candidate walk a new listing merely displaces at the
+    MATCH_CANDIDATE_LIMIT edge; full runs are exact.
+    """
+    started = time.perf_counter()
+    params = _MatchParams(
+        settings.MATCH_PRICE_BAND,
+        settings.MATCH_ROOM_TOLERANCE,
+        settings.MATCH_CANDIDATE_LIMIT,
+        settings.MATCH_TOP_K
+    )
+    workers = workers or settings.MATCH_JOB_WORKERS or os.cpu_count() or 1
+    today = date.today()
+    
+    # Writes queued after this point are left for the next run
+    last_queued = db.scalar(select(func.max(ListingMatchQueue.id)))
+    buckets = load_match_buckets(db, today)
+    loaded = time.perf_counter()
+    
+    if full:
+        targets = buckets.ids()
+    elif last_queued is None:
+        targets = []
+    else:
+        changed = list(db.scalars(select(ListingMatchQueue.listing_id).where(ListingMatchQueue.id <= last_queued).distinct()))
+        targets = _affected_listings(db, buckets, changed, params)
+    
+    written = 0
+    chunks = list(_batches(targets, settings.MATCH_JOB_CHUNK_SIZE))
+    for listing_ids, rows in _computed_chunks(buckets, chunks, params, workers):
+        db.execute(delete(ListingMatch).where(ListingMatch.listing_id.in_(listing_ids)))
+        if rows:
+            # Core insert: the ORM bulk path costs more than computing the matches
+            db.execute(insert(ListingMatch.__table__), [
+                {
+                    "listing_id": listing_id,
+                    "rank": rank,
+                    "match_id": match_id,
+                    "score": score,
+                    "overlap_start": overlap_start,
+                    "overlap_end": overlap_end
+                }
+                for listing_id, rank, match_id, score, overlap_start, overlap_end in rows
+            ])
+        db.commit()
+        written += len(rows)
+    
+    if full:
+        # Listings that are gone or no longer active
+        active = select(Listing.id).where(Listing.end_date >= today)
+        db.execute(delete(ListingMatch).where(ListingMatch.listing_id.not_in(active)))
+    if last_queued is not None:
+        db.execute(delete(ListingMatchQueue).where(ListingMatchQueue.id <= last_queued))
+    db.commit()
+    
+    return MatchJobReport(
+        active_listings=len(buckets),
+        recomputed=len(targets),
+        matches_written=written,
+        load_seconds=loaded - started,
+        seconds=time.perf_counter() - started
+    )
+
+
+def _stored_matches_statement(listing_id: int, today: date, limit: int) -> Select:
+    return (
+        select(ListingMatch.score, ListingMatch.overlap_start, ListingMatch.overlap_end, *CARD_COLUMNS)
+        .join(Listing, Listing.id == ListingMatch.match_id)
+        .where(ListingMatch.listing_id == listing_id, Listing.end_date >= today)
+        .order_by(ListingMatch.rank)
+        .limit(limit)
+    )
+
+
+def _stored_match(row) -> Dict[str, Any]:
+    return {
+        "score": row.score,
+        "overlap_start": row.overlap_start,
+        "overlap_end": row.overlap_end,
+        "listing": {column.key: getattr(row, column.key) for column in CARD_COLUMNS}
+    }
+
+
+def get_stored_matches(db: Session, listing_id: int, limit: int = 20) -> Optional[List[Dict[str, Any]]]:
+    """
+    Like get_matches, read from listing_matches as of the last match job run
+    """
+    rows = db.execute(_stored_matches_statement(listing_id, date.today(), limit)).all()
+    if not rows and db.scalar(select(Listing.id).where(Listing.id == listing_id)) is None:
+        return None
+    return [_stored_match(row) for row in rows]
+
+
+async def get_stored_matches_async(db: AsyncSession, listing_id: int, limit: int = 20) -> Optional[List[Dict[str, Any]]]:
+    rows = (await db.execute(_stored_matches_statement(listing_id, date.today(), limit))).all()
+    if not rows and await db.scalar(select(Listing.id).where(Listing.id == listing_id)) is None:
+        return None
+    return [_stored_match(row) for row in rows]
+
+
+# Swap chains (SWAP_CHAINS_ENABLED): cycles of three or more listings found in
+# the in-memory swap_graph; only the listings' cards come from the database.
+
+def rebuild_swap_graph(db: Session) -> None:
+    """
+    Rebuild swap_graph from the active listings
+    """
+    rows = db.execute(select(*MATCH_COLUMNS).where(Listing.end_date >= date.today()).execution_options(yield_per=10000))
+    swap_graph.rebuild(
+        map(MatchRow._make, rows),
+        settings.MATCH_PRICE_BAND,
+        settings.MATCH_ROOM_TOLERANCE,
+        settings.SWAP_CHAIN_COVERAGE,
+        settings.SWAP_CHAIN_MAX_DEGREE
+    )
+
+
+def _with_chain_cards(chains: List[SwapChain], card_rows) -> List[Dict[str, Any]]:
+    # Chains through listings deleted since the graph saw them are dropped
+    cards = {row.id: {column.key: getattr(row, column.key) for column in CARD_COLUMNS} for row in card_rows}
+    return [
+        {"score": chain.score, "listings": [cards[listing_id] for listing_id in chain.listing_ids]}
+        for chain in chains
+        if all(listing_id in cards for listing_id in chain.listing_ids)
+    ]
+
+
+def _chain_ids(chains: List[SwapChain]) -> List[int]:
+    return list({listing_id for chain in chains for listing_id in chain.listing_ids})
+
+
+def get_swap_chains(db: Session, listing_id: int, max_length: int, limit: int = 10) -> Optional[Tuple[List[Dict[str, Any]], bool]]:
+    """
+    The best swap chains through a listing, best first, and whether the search
+    finished within SWAP_CHAIN_TIME_BUDGET_MS; None when the listing doesn't exist
+    """
+    if db.scalar(select(Listing.id).where(Listing.id == listing_id)) is None:
+        return None
+    chains, complete = swap_graph.chains(listing_id, max_length, limit, settings.SWAP_CHAIN_TIME_BUDGET_MS / 1000)
+    if not chains:
+        return [], complete
+    return _with_chain_cards(chains, db.execute(_cards_statement(_chain_ids(chains))).all()), complete
+
+
+async def get_swap_chains_async(db: AsyncSession, listing_id: int, max_length: int, limit: int = 10) -> Optional[Tuple[List[Dict[str, Any]], bool]]:
+    if await db.scalar(select(Listing.id).where(Listing.id == listing_id)) is None:
+        return None
+    # The search holds the CPU for up to the time budget
+    chains, complete = await asyncio.to_thread(
+        swap_graph.chains, listing_id, max_length, limit, settings.SWAP_CHAIN_TIME_BUDGET_MS / 1000
+    )
+    if not chains:
+        return [], complete
+    return _with_chain_cards(chains, (await db.execute(_cards_statement(_chain_ids(chains)))).all()), complete
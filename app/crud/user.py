@@ -1,9 +1,31 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import exists, inspect, func, or_, select, union_all
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
 from typing import Optional, List, Dict, Any
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
 
 
+# Detached User snapshots keyed by auth0_user_id, used to resolve the caller on every request.
+# Entries are dropped whenever the user is written through this module.
+identity_cache = TTLCache(max_size=settings.IDENTITY_CACHE_MAX_SIZE, ttl=settings.IDENTITY_CACHE_TTL)
+
+
+def _snapshot_user(user: User) -> User:
+    snapshot = User(**{attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs})
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+
+def invalidate_identity(auth0_user_id: Optional[str]) -> None:
+    if auth0_user_id:
+        identity_cache.delete(auth0_user_id)
+
+
 def get_user(db: Session, user_id: int) -> Optional[User]:
     """
     Get a user by ID
@@ -27,6 +49,21 @@ def get_user_by_auth0_id(db: Session, auth0_user_id: str) -> Optional[User]:
     return db.query(User).filter(User.auth0_user_id == auth0_user_id).first()
 
 
+def get_user_by_auth0_id_cached(db: Session, auth0_user_id: str) -> Optional[User]:
+    """
+    Get a user by Auth0 user ID, served from the identity cache when possible.
+    Cache hits are merged into `db` without a query.
+    """
+    snapshot = identity_cache.get(auth0_user_id)
+    if snapshot is not None:
+        return db.merge(snapshot, load=False)
+    
+    user = get_user_by_auth0_id(db, auth0_user_id)
+    if user is not None:
+        identity_cache.set(auth0_user_id, _snapshot_user(user))
+    return user
+
+
 def get_user_by_username(db: Session, username: str) -> Optional[User]:
     """
     Get a user by username
@@ -65,11 +102,7 @@ def create_user(db: Session, user_data: UserCreate) -> User:
     return db_user
 
 
-def update_user(db: Session, user_id: int, user_update: UserUpdate) -> Optional[User]:
-    db_user = get_user(db, user_id)
-    if not db_user:
-        return None
-    
+def _apply_user_update(db_user: User, user_update: UserUpdate) -> None:
     update_data = user_update.model_dump(exclude_unset=True)
     
     if "password" in update_data:
@@ -84,9 +117,33 @@ def update_user(db: Session, user_id: int, user_update: UserUpdate) -> Optional[
     
     for field, value in update_data.items():
         setattr(db_user, field, value)
+
+
+def update_user(db: Session, user_id: int, user_update: UserUpdate) -> Optional[User]:
+    db_user = get_user(db, user_id)
+    if not db_user:
+        return None
+    
+    _apply_user_update(db_user, user_update)
+    
+    db.commit()
+    db.refresh(db_user)
+    invalidate_identity(db_user.auth0_user_id)
+    return db_user
+
+
+def set_user_active(db: Session, user_id: int, is_active: bool) -> Optional[User]:
+    """
+    Activate or deactivate a user; a deactivated user is refused from their next request
+    """
+    db_user = get_user(db, user_id)
+    if not db_user:
+        return None
     
+    db_user.is_active = is_active
     db.commit()
     db.refresh(db_user)
+    invalidate_identity(db_user.auth0_user_id)
     return db_user
 
 
@@ -98,15 +155,21 @@ def delete_user(db: Session, user_id: int) -> bool:
     if not db_user:
         return False
     
+    auth0_user_id = db_user.auth0_user_id
     db.delete(db_user)
     db.commit()
+    invalidate_identity(auth0_user_id)
     return True
 
 
-def get_or_create_user_from_auth0(
-    db: Session,
-    id_token_payload: Dict[str, Any]
-) -> User:
+def _provisioning_statement(dialect_name: str, id_token_payload: Dict[str, Any]):
+    """
+    Build INSERT ... ON CONFLICT (auth0_user_id) DO UPDATE ... RETURNING for an ID token.
+    
+    Claims present in the token overwrite the stored profile, and the update only
+    fires when one of them actually changed, so repeat logins don't write. On
+    PostgreSQL the upsert is wrapped in a CTE that falls back to the existing row.
+    """
     auth0_user_id = id_token_payload.get("sub")
     
     if not auth0_user_id:
@@ -116,41 +179,6 @@ def get_or_create_user_from_auth0(
     name = id_token_payload.get("name") or id_token_payload.get("nickname")
     picture = id_token_payload.get("picture")
     
-    user = get_user_by_auth0_id(db, auth0_user_id)
-    
-    if user:
-        update_data = {}
-        
-        if email and email != user.email:
-            update_data["email"] = email
-        
-        if name and name.strip():
-            name_parts = name.split(" ", 1)
-            if len(name_parts) == 2:
-                new_first = name_parts[0]
-                new_last = name_parts[1]
-            else:
-                new_first = name_parts[0]
-                new_last = None
-            
-            if new_first != user.first_name or new_last != user.last_name:
-                update_data["first_name"] = new_first
-                update_data["last_name"] = new_last
-        
-        if picture and picture != user.profile_picture_url:
-            update_data["profile_picture_url"] = picture
-        
-        if email and name:
-            update_data["profile_complete"] = True
-        
-        if update_data:
-            for field, value in update_data.items():
-                setattr(user, field, value)
-            db.commit()
-            db.refresh(user)
-        
-        return user
-    
     first_name = None
     last_name = None
     
@@ -161,7 +189,19 @@ def get_or_create_user_from_auth0(
     
     profile_complete = bool(email and name)
     
-    new_user = User(
+    # Only fields backed by a claim in this token may overwrite an existing row
+    update_fields = []
+    if email:
+        update_fields.append("email")
+    if name and name.strip():
+        update_fields.extend(["first_name", "last_name"])
+    if picture:
+        update_fields.append("profile_picture_url")
+    if profile_complete:
+        update_fields.append("profile_complete")
+    
+    insert = postgresql_insert if dialect_name == "postgresql" else sqlite_insert
+    stmt = insert(User).values(
         auth0_user_id=auth0_user_id,
         email=email,
         first_name=first_name,
@@ -172,8 +212,141 @@ def get_or_create_user_from_auth0(
         profile_complete=profile_complete
     )
     
-    db.add(new_user)
+    if update_fields:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[User.auth0_user_id],
+            set_={
+                **{field: stmt.excluded[field] for field in update_fields},
+                "updated_at": func.now()
+            },
+            where=or_(*(getattr(User, field).is_distinct_from(stmt.excluded[field]) for field in update_fields))
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[User.auth0_user_id])
+    
+    if dialect_name == "postgresql":
+        # An unchanged profile updates nothing, so RETURNING is empty: read the existing
+        # row in the same statement instead of a second round trip
+        upserted = stmt.returning(*User.__table__.c).cte("upserted")
+        existing = select(*User.__table__.c).where(
+            User.auth0_user_id == auth0_user_id,
+            ~exists(select(upserted.c.id))
+        )
+        stmt = select(User).from_statement(union_all(select(*upserted.c), existing))
+    else:
+        stmt = stmt.returning(User)
+    
+    return auth0_user_id, stmt.execution_options(populate_existing=True)
+
+
+def get_or_create_user_from_auth0(
+    db: Session,
+    id_token_payload: Dict[str, Any]
+) -> User:
+    """
+    Provision the user for an ID token with a single upsert.
+    Concurrent first logins for the same user can't hit the unique constraint.
+    
+    On PostgreSQL the statement also returns the row when the profile is unchanged,
+    so every login is one round trip. SQLite can't run the upsert inside a CTE, so an
+    unchanged login there takes a second, in-process SELECT.
+    """
+    auth0_user_id, stmt = _provisioning_statement(db.get_bind().dialect.name, id_token_payload)
+    
+    user = db.scalars(stmt).first()
+    snapshot = _snapshot_user(user) if user is not None else None
     db.commit()
-    db.refresh(new_user)
-    return new_user
+    invalidate_identity(auth0_user_id)
+    
+    if snapshot is None:
+        # SQLite, row already existed and nothing changed (or, on PostgreSQL, a racing
+        # first login committed it after this statement's snapshot)
+        return get_user_by_auth0_id(db, auth0_user_id)
+    
+    # Restore the committed row without a refresh round trip
+    return db.merge(snapshot, load=False)
+
+
+# Async versions for AsyncSession
+
+async def get_user_async(db: AsyncSession, user_id: int) -> Optional[User]:
+    return (await db.scalars(select(User).filter(User.id == user_id))).first()
+
+
+async def get_user_by_email_async(db: AsyncSession, email: str) -> Optional[User]:
+    if not email:
+        return None
+    return (await db.scalars(select(User).filter(User.email == email))).first()
+
+
+async def get_user_by_auth0_id_async(db: AsyncSession, auth0_user_id: str) -> Optional[User]:
+    return (await db.scalars(select(User).filter(User.auth0_user_id == auth0_user_id))).first()
+
+
+async def get_user_by_auth0_id_cached_async(db: AsyncSession, auth0_user_id: str) -> Optional[User]:
+    snapshot = identity_cache.get(auth0_user_id)
+    if snapshot is not None:
+        return await db.merge(snapshot, load=False)
+    
+    user = await get_user_by_auth0_id_async(db, auth0_user_id)
+    if user is not None:
+        identity_cache.set(auth0_user_id, _snapshot_user(user))
+    return user
+
+
+async def get_users_async(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[User]:
+    return list(await db.scalars(select(User).offset(skip).limit(limit)))
 
+
+async def update_user_async(db: AsyncSession, user_id: int, user_update: UserUpdate) -> Optional[User]:
+    db_user = await get_user_async(db, user_id)
+    if not db_user:
+        return None
+    
+    _apply_user_update(db_user, user_update)
+    
+    await db.commit()
+    await db.refresh(db_user)
+    invalidate_identity(db_user.auth0_user_id)
+    return db_user
+
+
+async def set_user_active_async(db: AsyncSession, user_id: int, is_active: bool) -> Optional[User]:
+    db_user = await get_user_async(db, user_id)
+    if not db_user:
+        return None
+    
+    db_user.is_active = is_active
+    await db.commit()
+    await db.refresh(db_user)
+    invalidate_identity(db_user.auth0_user_id)
+    return db_user
+
+
+async def delete_user_async(db: AsyncSession, user_id: int) -> bool:
+    db_user = await get_user_async(db, user_id)
+    if not db_user:
+        return False
+    
+    auth0_user_id = db_user.auth0_user_id
+    await db.delete(db_user)
+    await db.commit()
+    invalidate_identity(auth0_user_id)
+    return True
+
+
+async def get_or_create_user_from_auth0_async(
+    db: AsyncSession,
+    id_token_payload: Dict[str, Any]
+) -> User:
+    auth0_user_id, stmt = _provisioning_statement(db.get_bind().dialect.name, id_token_payload)
+    
+    user = (await db.scalars(stmt)).first()
+    await db.commit()
+    invalidate_identity(auth0_user_id)
+    
+    if user is None:
+        # See get_or_create_user_from_auth0
+        return await get_user_by_auth0_id_async(db, auth0_user_id)
+    
+    return user
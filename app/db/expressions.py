@@ -0,0 +1,92 @@
+"""
+Dialect-specific SQL constructs.
+
+Availability periods compile to range operators over daterange(start, end, '[]')
+on PostgreSQL, matching the GiST expression index on listings, and to plain
+comparisons elsewhere. A None bound means the range is open on that side; a
+period contains a half-open range when it covers the range's one given day.
+"""
+from datetime import date
+from typing import Optional
+from sqlalchemy import Boolean, Date, literal, null
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.elements import Null
+from sqlalchemy.sql.functions import FunctionElement
+
+
+def _bound(value: Optional[date]):
+    return literal(value, Date()) if value is not None else null()
+
+
+class period_overlaps(FunctionElement):
+    """
+    True when [start_column, end_column] shares at least one day with [lower, upper]
+    """
+    type = Boolean()
+    inherit_cache = True
+    _is_implicitly_boolean = True
+    name = "period_overlaps"
+    
+    def __init__(self, start_column, end_column, lower: Optional[date], upper: Optional[date]):
+        super().__init__(start_column, end_column, _bound(lower), _bound(upper))
+
+
+class period_contains(FunctionElement):
+    """
+    True when [start_column, end_column] covers all of [lower, upper], or the one
+    given day when a bound is None
+    """
+    type = Boolean()
+    inherit_cache = True
+    _is_implicitly_boolean = True
+    name = "period_contains"
+    
+    def __init__(self, start_column, end_column, lower: Optional[date], upper: Optional[date]):
+        super().__init__(start_column, end_column, _bound(lower), _bound(upper))
+
+
+def _comparisons(compiler, element, contains: bool, **kw) -> str:
+    start, end, lower, upper = [compiler.process(clause, **kw) for clause in element.clauses]
+    lower_open, upper_open = [isinstance(clause, Null) for clause in list(element.clauses)[2:]]
+    conditions = []
+    
+    if contains:
+        if not (lower_open and upper_open):
+            conditions.append(f"{start} <= {upper if lower_open else lower}")
+            conditions.append(f"{end} >= {lower if upper_open else upper}")
+    else:
+        if not upper_open:
+            conditions.append(f"{start} <= {upper}")
+        if not lower_open:
+            conditions.append(f"{end} >= {lower}")
+    
+    return "(" + " AND ".join(conditions) + ")" if conditions else "1 = 1"
+
+
+def _pg_range(compiler, element, operator: str, **kw) -> str:
+    start, end, lower, upper = [compiler.process(clause, **kw) for clause in element.clauses]
+    lower_open, upper_open = [isinstance(clause, Null) for clause in list(element.clauses)[2:]]
+    if operator == "@>" and lower_open != upper_open:
+        # A half-infinite range is never contained: test the given day instead
+        return f"(daterange({start}, {end}, '[]') @> CAST({upper if lower_open else lower} AS DATE))"
+    return f"(daterange({start}, {end}, '[]') {operator} daterange({lower}, {upper}, '[]'))"
+
+
+@compiles(period_overlaps)
+def _compile_overlaps(element, compiler, **kw):
+    return _comparisons(compiler, element, contains=False, **kw)
+
+
+@compiles(period_contains)
+def _compile_contains(element, compiler, **kw):
+    return _comparisons(compiler, element, contains=True, **kw)
+
+
+@compiles(period_overlaps, "postgresql")
+def _compile_overlaps_pg(element, compiler, **kw):
+    return _pg_range(compiler, element, "&&", **kw)
+
+
+@compiles(period_contains, "postgresql")
+def _compile_contains_pg(element, compiler, **kw):
+    return _pg_range(compiler, element, "@>", **kw)
@@ -0,0 +1,76 @@
+from typing import List, Optional, Tuple
+import asyncio
+import logging
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.resp import RespClient, RespError
+
+logger = logging.getLogger(__name__)
+
+
+class ReadYourWrites:
+    """
+    Remembers recent writes so that reads which must observe them go to the primary
+    instead of a possibly lagging replica.
+    
+    Writes are tracked per listing and per writer (Auth0 sub) for `window` seconds,
+    which should cover typical replica lag. Without `url` the record is per process:
+    a write handled by one worker doesn't send the writer's next read, served by
+    another worker, to the primary, so with more than one worker the guarantee only
+    holds when `url` points every worker at the same Redis-compatible server. Reads
+    go to the primary while that server can't be reached.
+    """
+    
+    def __init__(self, window: float, max_size: int = 100000, url: str = "", timeout: float = 0.5):
+        self.window = window
+        self._recent = TTLCache(max_size=max_size, ttl=window)
+        self._client = RespClient.from_url(url, timeout) if url else None
+    
+    @staticmethod
+    def _keys(listing_id: Optional[int], auth0_user_id: Optional[str]) -> List[Tuple[str, str]]:
+        keys = []
+        if listing_id is not None:
+            keys.append(("listing", str(listing_id)))
+        if auth0_user_id:
+            keys.append(("user", auth0_user_id))
+        return keys
+    
+    def record(self, listing_id: Optional[int] = None, auth0_user_id: Optional[str] = None) -> None:
+        keys = self._keys(listing_id, auth0_user_id)
+        for key in keys:
+            self._recent.set(key, True)
+        if self._client is None or self.window <= 0:
+            return
+        try:
+            for kind, value in keys:
+                self._client.execute("SET", f"recent-write:{kind}:{value}", 1, "PX", int(self.window * 1000))
+        except (OSError, RespError) as e:
+            logger.warning("Shared read-your-writes record failed: %s", e)
+    
+    async def record_async(self, listing_id: Optional[int] = None, auth0_user_id: Optional[str] = None) -> None:
+        """
+        record() for the event loop; the shared server is called from a thread
+        """
+        if self._client is None:
+            self.record(listing_id, auth0_user_id)
+        else:
+            await asyncio.to_thread(self.record, listing_id, auth0_user_id)
+    
+    def is_recent(self, listing_id: Optional[int] = None, auth0_user_id: Optional[str] = None) -> bool:
+        keys = self._keys(listing_id, auth0_user_id)
+        if any(self._recent.get(key) for key in keys):
+            return True
+        if self._client is None or not keys:
+            return False
+        try:
+            return any(self._client.execute("MGET", *(f"recent-write:{kind}:{value}" for kind, value in keys)))
+        except (OSError, RespError) as e:
+            logger.warning("Shared read-your-writes lookup failed, reading from the primary: %s", e)
+            return True
+    
+    def clear(self) -> None:
+        # Local record only
+        self._recent.clear()
+
+
+read_your_writes = ReadYourWrites(window=settings.READ_YOUR_WRITES_WINDOW, url=settings.READ_YOUR_WRITES_URL)
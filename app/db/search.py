@@ -0,0 +1,119 @@
+"""
+Full-text search over listing text columns.
+
+SQLite uses an external-content FTS5 table, listings_fts, kept in sync with
+listings by triggers, so Core bulk inserts and raw SQL stay indexed too.
+PostgreSQL uses a GIN index over a weighted tsvector expression; the query
+repeats the same expression so the planner can match the index.
+"""
+from typing import List, Optional, Tuple
+import re
+from sqlalchemy import DDL, Select, Table, event, func, literal_column
+from sqlalchemy.sql import column, table
+from sqlalchemy.sql.elements import ColumnElement
+
+SEARCH_COLUMNS = ("address", "building_name", "utilities_included")
+
+# Matches in the address rank above the building name, which ranks above utilities
+SEARCH_WEIGHTS = {"address": ("A", 10.0), "building_name": ("B", 5.0), "utilities_included": ("C", 1.0)}
+
+listings_fts = table("listings_fts", column("rowid"))
+
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS listings_fts USING fts5("
+    "address, building_name, utilities_included, "
+    "content='listings', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    
+    "CREATE TRIGGER IF NOT EXISTS listings_fts_insert AFTER INSERT ON listings BEGIN "
+    "INSERT INTO listings_fts(rowid, address, building_name, utilities_included) "
+    "VALUES (new.id, new.address, new.building_name, new.utilities_included); END",
+    
+    "CREATE TRIGGER IF NOT EXISTS listings_fts_delete AFTER DELETE ON listings BEGIN "
+    "INSERT INTO listings_fts(listings_fts, rowid, address, building_name, utilities_included) "
+    "VALUES ('delete', old.id, old.address, old.building_name, old.utilities_included); END",
+    
+    "CREATE TRIGGER IF NOT EXISTS listings_fts_update "
+    "AFTER UPDATE OF address, building_name, utilities_included ON listings BEGIN "
+    "INSERT INTO listings_fts(listings_fts, rowid, address, building_name, utilities_included) "
+    "VALUES ('delete', old.id, old.address, old.building_name, old.utilities_included); "
+    "INSERT INTO listings_fts(rowid, address, building_name, utilities_included) "
+    "VALUES (new.id, new.address, new.building_name, new.utilities_included); END",
+]
+
+SQLITE_FTS_REBUILD = "INSERT INTO listings_fts(listings_fts) VALUES ('rebuild')"
+
+SQLITE_FTS_DROP = [
+    "DROP TRIGGER IF EXISTS listings_fts_update",
+    "DROP TRIGGER IF EXISTS listings_fts_delete",
+    "DROP TRIGGER IF EXISTS listings_fts_insert",
+    "DROP TABLE IF EXISTS listings_fts",
+]
+
+
+def attach_sqlite_fts(listings: Table) -> None:
+    """
+    Create and drop the FTS5 table and its triggers alongside the listings table
+    in metadata.create_all() / drop_all() on SQLite
+    """
+    for statement in SQLITE_FTS_DDL:
+        event.listen(listings, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+    for statement in SQLITE_FTS_DROP:
+        event.listen(listings, "before_drop", DDL(statement).execute_if(dialect="sqlite"))
+
+
+def search_vector(listings: Table) -> ColumnElement:
+    """
+    Weighted tsvector over the search columns (PostgreSQL). Constants are inlined
+    so the expression is identical in the index and in queries.
+    """
+    vector = None
+    for name in SEARCH_COLUMNS:
+        weight = SEARCH_WEIGHTS[name][0]
+        part = func.setweight(
+            func.to_tsvector(
+                literal_column("'simple'::regconfig"),
+                func.coalesce(listings.c[name], literal_column("''"))
+            ),
+            literal_column(f"'{weight}'::\"char\"")
+        )
+        vector = part if vector is None else vector.op("||")(part)
+    return vector
+
+
+def search_terms(q: Optional[str]) -> List[str]:
+    """
+    Split free text into lower-case word tokens. Everything else is dropped, so
+    user input can't inject FTS5 / tsquery syntax.
+    """
+    if not q:
+        return []
+    return re.findall(r"\w+", q.lower())
+
+
+def sqlite_match_query(terms: List[str]) -> str:
+    # Every term must match; the last one as a prefix for search-as-you-type
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " AND ".join(quoted)
+
+
+def postgresql_tsquery(terms: List[str]) -> str:
+    return " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+
+
+def apply_search(query: Select, dialect_name: str, listings: Table, terms: List[str]) -> Tuple[Select, ColumnElement]:
+    """
+    Restrict a listings SELECT to rows matching every term. Also returns the
+    relevance ORDER BY expression, best match first.
+    """
+    if dialect_name == "postgresql":
+        vector = search_vector(listings)
+        tsquery = func.to_tsquery(literal_column("'simple'::regconfig"), postgresql_tsquery(terms))
+        return query.filter(vector.op("@@")(tsquery)), func.ts_rank(vector, tsquery).desc()
+    
+    # bm25() is lower for better matches
+    weights = [literal_column(str(SEARCH_WEIGHTS[name][1])) for name in SEARCH_COLUMNS]
+    query = query.join(listings_fts, listings_fts.c.rowid == listings.c.id).filter(
+        literal_column("listings_fts").op("MATCH")(sqlite_match_query(terms))
+    )
+    return query, func.bm25(literal_column("listings_fts"), *weights).asc()
@@ -1,17 +1,159 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from typing import Any, AsyncIterator, Dict, List
+import itertools
 from app.core.config import settings
+from app.db.pool import MeteredQueuePool, MeteredAsyncAdaptedQueuePool
+
+
+def _engine_options(url: str, is_async: bool = False) -> Dict[str, Any]:
+    """
+    Pool settings from Settings. In-memory SQLite keeps SQLAlchemy's default pool,
+    since every new connection would be a separate empty database.
+    """
+    parsed = make_url(url)
+    options: Dict[str, Any] = {}
+    
+    if parsed.get_backend_name() == "sqlite":
+        if not is_async:
+            options["connect_args"] = {"check_same_thread": False}
+        if parsed.database in (None, "", ":memory:"):
+            return options
+    
+    options.update(
+        poolclass=MeteredAsyncAdaptedQueuePool if is_async else MeteredQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING
+    )
+    return options
+
+
+def _is_sqlite(db_engine: Engine) -> bool:
+    return db_engine.dialect.name == "sqlite"
+
+
+def apply_sqlite_profile(db_engine: Engine) -> None:
+    """
+    Tune every new SQLite connection: WAL so readers keep going during writes,
+    relaxed fsync, memory-mapped I/O, a larger page cache and a busy timeout
+    instead of immediate "database is locked" errors.
+    """
+    @event.listens_for(db_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.close()
+
+
+def optimize_sqlite() -> None:
+    """
+    Run PRAGMA optimize so the planner has fresh statistics; called at startup
+    """
+    if settings.SQLITE_PERFORMANCE_PROFILE and _is_sqlite(engine):
+        with engine.connect() as connection:
+            connection.exec_driver_sql("PRAGMA optimize")
+
 
 # Create database engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
-)
+engine = create_engine(settings.DATABASE_URL, **_engine_options(settings.DATABASE_URL))
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+def get_async_database_url(url: str) -> str:
+    """
+    Map a sync DATABASE_URL onto its async driver (aiosqlite / psycopg async)
+    """
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+psycopg://", 1)
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql+psycopg://", 1)
+    return url
+
+
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or get_async_database_url(settings.DATABASE_URL)
+
+# Async engine for endpoints, so queries don't block the event loop
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL, is_async=True))
+
+if settings.SQLITE_PERFORMANCE_PROFILE:
+    for db_engine in (engine, async_engine.sync_engine):
+        if _is_sqlite(db_engine):
+            apply_sqlite_profile(db_engine)
+
+# Objects stay loaded after commit; lazy loads aren't possible on an AsyncSession
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+
+# Async engines for read replicas, used round-robin for read-only queries
+replica_async_engines = [
+    create_async_engine(
+        get_async_database_url(url),
+        **_engine_options(get_async_database_url(url), is_async=True)
+    )
+    for url in settings.DATABASE_REPLICA_URLS
+]
+
+if settings.SQLITE_PERFORMANCE_PROFILE:
+    for db_engine in replica_async_engines:
+        if _is_sqlite(db_engine.sync_engine):
+            apply_sqlite_profile(db_engine.sync_engine)
+
+ReplicaSessionLocals: List[async_sessionmaker] = [
+    async_sessionmaker(
+        bind=replica_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False
+    )
+    for replica_engine in replica_async_engines
+]
+_replica_cycle = itertools.cycle(ReplicaSessionLocals) if ReplicaSessionLocals else None
+
+
+def get_read_sessionmaker(use_primary: bool = False) -> async_sessionmaker:
+    """
+    Session factory for read-only queries: the next replica, or the primary when
+    there are no replicas or the caller needs to see its own recent writes
+    """
+    if use_primary or _replica_cycle is None:
+        return AsyncSessionLocal
+    return next(_replica_cycle)
+
+
+def get_pool_status() -> Dict[str, Any]:
+    """
+    Connection pool metrics for each engine that has a metered pool
+    """
+    engines: Dict[str, Engine] = {"primary": engine, "primary_async": async_engine.sync_engine}
+    for index, replica_engine in enumerate(replica_async_engines):
+        engines[f"replica_{index}_async"] = replica_engine.sync_engine
+    status = {}
+    for name, db_engine in engines.items():
+        pool = db_engine.pool
+        if isinstance(pool, MeteredQueuePool):
+            status[name] = pool.metrics.snapshot(pool)
+    return status
+
+
 # Dependency to get database session
 def get_db():
     """
@@ -23,3 +165,10 @@ def get_db():
     finally:
         db.close()
 
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """
+    AsyncSession dependency for FastAPI endpoints
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
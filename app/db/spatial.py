@@ -0,0 +1,107 @@
+"""
+Spatial index over listing coordinates.
+
+SQLite uses an R*Tree virtual table, listings_geo, kept in sync with listings by
+triggers. PostgreSQL uses a GiST index over point(longitude, latitude) with the
+<@ box operator, so no PostGIS is needed.
+
+Radius search narrows to the circle's bounding box through the index, then
+applies an equirectangular distance check, which is accurate to well under 1%
+at city scale and needs no trigonometry in SQL.
+"""
+from sqlalchemy import DDL, Select, Table, event, func, select
+from sqlalchemy.sql import column, table
+from app.core.geo import BoundingBox, KM_PER_DEGREE, longitude_scale, radius_bbox
+
+listings_geo = table(
+    "listings_geo",
+    column("id"),
+    column("min_lat"),
+    column("max_lat"),
+    column("min_lon"),
+    column("max_lon")
+)
+
+SQLITE_RTREE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS listings_geo USING rtree(id, min_lat, max_lat, min_lon, max_lon)",
+    
+    "CREATE TRIGGER IF NOT EXISTS listings_geo_insert AFTER INSERT ON listings "
+    "WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN "
+    "INSERT INTO listings_geo VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude); END",
+    
+    "CREATE TRIGGER IF NOT EXISTS listings_geo_delete AFTER DELETE ON listings BEGIN "
+    "DELETE FROM listings_geo WHERE id = old.id; END",
+    
+    "CREATE TRIGGER IF NOT EXISTS listings_geo_update AFTER UPDATE OF latitude, longitude ON listings BEGIN "
+    "DELETE FROM listings_geo WHERE id = old.id; "
+    "INSERT INTO listings_geo SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude "
+    "WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL; END",
+]
+
+SQLITE_RTREE_REBUILD = (
+    "INSERT OR REPLACE INTO listings_geo "
+    "SELECT id, latitude, latitude, longitude, longitude FROM listings "
+    "WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+)
+
+SQLITE_RTREE_DROP = [
+    "DROP TRIGGER IF EXISTS listings_geo_update",
+    "DROP TRIGGER IF EXISTS listings_geo_delete",
+    "DROP TRIGGER IF EXISTS listings_geo_insert",
+    "DROP TABLE IF EXISTS listings_geo",
+]
+
+
+def attach_sqlite_rtree(listings: Table) -> None:
+    """
+    Create and drop the R*Tree table and its triggers alongside the listings table
+    in metadata.create_all() / drop_all() on SQLite
+    """
+    for statement in SQLITE_RTREE_DDL:
+        event.listen(listings, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+    for statement in SQLITE_RTREE_DROP:
+        event.listen(listings, "before_drop", DDL(statement).execute_if(dialect="sqlite"))
+
+
+def location_point(listings: Table):
+    """
+    point(longitude, latitude), the expression behind the PostgreSQL GiST index
+    """
+    return func.point(listings.c.longitude, listings.c.latitude)
+
+
+def apply_bbox(query: Select, dialect_name: str, listings: Table, box: BoundingBox) -> Select:
+    """
+    Restrict a listings SELECT to rows located inside the box
+    """
+    if dialect_name == "postgresql":
+        area = func.box(func.point(box.west, box.south), func.point(box.east, box.north))
+        return query.filter(location_point(listings).op("<@")(area))
+    
+    # The R*Tree stores 32-bit floats rounded outwards, so it only narrows the
+    # candidates; the exact comparison runs on the listing's own columns
+    candidates = select(listings_geo.c.id).where(
+        listings_geo.c.max_lat >= box.south,
+        listings_geo.c.min_lat <= box.north,
+        listings_geo.c.max_lon >= box.west,
+        listings_geo.c.min_lon <= box.east
+    )
+    return query.filter(
+        listings.c.id.in_(candidates),
+        listings.c.latitude.between(box.south, box.north),
+        listings.c.longitude.between(box.west, box.east)
+    )
+
+
+def apply_radius(query: Select, dialect_name: str, listings: Table, lat: float, lon: float, radius_km: float) -> Select:
+    """
+    Restrict a listings SELECT to rows within radius_km of (lat, lon)
+    """
+    query = apply_bbox(query, dialect_name, listings, radius_bbox(lat, lon, radius_km))
+    
+    # Degrees scaled to kilometres, with the longitude scale fixed at the centre
+    dy = listings.c.latitude - lat
+    dx = (listings.c.longitude - lon) * longitude_scale(lat)
+    limit = (radius_km / KM_PER_DEGREE) ** 2
+    return query.filter(dx * dx + dy * dy <= limit)
+
@@ -1,11 +1,95 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
+import logging
 from app.core.config import settings
+from app.core.search_index import listing_index
+from app.core.security import access_token_cache, close_http_client, get_http_client, id_token_cache
+from app.core.swap_chains import swap_graph
+from app.crud import listing_crud, match_crud
+from app.db.session import SessionLocal, optimize_sqlite
 from app.api.v1.api import api_router
 
+logger = logging.getLogger(__name__)
+
+
+def _rebuild_search_index() -> None:
+    db = SessionLocal()
+    try:
+        listing_crud.rebuild_search_index(db)
+    finally:
+        db.close()
+
+
+async def _refresh_search_index(interval: int) -> None:
+    # Picks up writes made by other workers or outside the API
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(_rebuild_search_index)
+        except Exception:
+            logger.exception("Search index refresh failed")
+
+
+def _rebuild_swap_graph() -> None:
+    db = SessionLocal()
+    try:
+        match_crud.rebuild_swap_graph(db)
+    finally:
+        db.close()
+
+
+async def _refresh_swap_graph(interval: int, rebuild_interval: int) -> None:
+    # Applies queued listing writes, and rebuilds now and then for writes made
+    # elsewhere and listings that have ended
+    loop = asyncio.get_running_loop()
+    rebuilt = loop.time()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if rebuild_interval > 0 and loop.time() - rebuilt >= rebuild_interval:
+                await asyncio.to_thread(_rebuild_swap_graph)
+                rebuilt = loop.time()
+            await asyncio.to_thread(swap_graph.refresh)
+        except Exception:
+            logger.exception("Swap graph refresh failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    optimize_sqlite()
+    # Built here rather than by the first request's JWKS fetch: creating its SSL context
+    # takes tens of milliseconds on the event loop
+    get_http_client()
+    
+    refresh_task = None
+    if settings.SEARCH_INDEX_ENABLED:
+        await asyncio.to_thread(_rebuild_search_index)
+        if settings.SEARCH_INDEX_REFRESH_INTERVAL > 0:
+            refresh_task = asyncio.create_task(_refresh_search_index(settings.SEARCH_INDEX_REFRESH_INTERVAL))
+    
+    chain_task = None
+    if settings.SWAP_CHAINS_ENABLED:
+        await asyncio.to_thread(_rebuild_swap_graph)
+        if settings.SWAP_CHAIN_REFRESH_INTERVAL > 0:
+            chain_task = asyncio.create_task(
+                _refresh_swap_graph(settings.SWAP_CHAIN_REFRESH_INTERVAL, settings.SWAP_CHAIN_REBUILD_INTERVAL)
+            )
+    
+    yield
+    
+    if refresh_task is not None:
+        refresh_task.cancel()
+    if chain_task is not None:
+        chain_task.cancel()
+    await close_http_client()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # Set up CORS
@@ -16,6 +100,7 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "X-Total-Count", "X-Total-Count-Exact", "X-Chains-Complete", "X-Cache"],
     )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
@@ -32,6 +117,17 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    health = {
+        "status": "healthy",
+        "access_token_cache": access_token_cache.stats(),
+        "id_token_cache": id_token_cache.stats()
+    }
+    if settings.SEARCH_INDEX_ENABLED:
+        health["search_index"] = listing_index.stats()
+    if settings.SWAP_CHAINS_ENABLED:
+        health["swap_graph"] = swap_graph.stats()
+    if settings.LISTING_CACHE_ENABLED:
+        health["listing_cache"] = listing_crud.listing_page_cache.stats()
+    return health
 
 
@@ -1,5 +1,6 @@
 from app.models.user import User
 from app.models.listing import Listing
+from app.models.match import ListingMatch, ListingMatchQueue
 
-__all__ = ["User", "Listing"]
+__all__ = ["User", "Listing", "ListingMatch", "ListingMatchQueue"]
 
@@ -1,12 +1,14 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, Float, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, Float, ForeignKey, JSON, Index, event, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base import Base
+from app.db.search import attach_sqlite_fts, search_vector
+from app.db.spatial import attach_sqlite_rtree
 
 
 class Listing(Base):
     __tablename__ = "listings"
-
+    
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     listing_type = Column(String, nullable=False, index=True)
@@ -23,6 +25,8 @@ class Listing(Base):
     end_date = Column(Date, nullable=False)
     
     distance_to_university = Column(Integer, nullable=True)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
     gym_in_building = Column(Boolean, nullable=True)
     laundry_in_unit = Column(Boolean, nullable=True)
     laundry_in_building = Column(Boolean, nullable=True)
@@ -38,9 +42,59 @@ class Listing(Base):
     how_many_ensuite_rooms = Column(Integer, nullable=True)
     how_many_shared_bathrooms_in_apartment = Column(Integer, nullable=True)
     
+    # unit_price for unit listings, price_per_room for room listings; kept in sync on every flush
+    effective_price = Column(Float, nullable=True)
+    
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    # Composite indexes for the search filters in listing_crud.get_listings; see migrations/versions
+    __table_args__ = (
+        # (column, id) indexes back the sort orders in listing_crud.LISTING_SORTS
+        Index("ix_listings_type_price_id", "listing_type", "effective_price", "id"),
+        Index("ix_listings_price_id", "effective_price", "id"),
+        Index("ix_listings_distance_id", "distance_to_university", "id"),
+        Index("ix_listings_start_date_id", "start_date", "id"),
+        Index("ix_listings_furnished_rooms", "furnished", "num_rooms_available"),
+        Index("ix_listings_rooms_bathrooms", "num_rooms_available", "num_bathrooms"),
+        Index("ix_listings_amenities", "gym_in_building", "laundry_in_unit", "laundry_in_building"),
+        Index("ix_listings_availability", "start_date", "end_date"),
+        # Range operators in app.db.expressions use this on PostgreSQL
+        Index(
+            "ix_listings_availability_range",
+            text("daterange(start_date, end_date, '[]')"),
+            postgresql_using="gist"
+        ).ddl_if(dialect="postgresql"),
+        # Spatial index for bbox / radius search on PostgreSQL; SQLite uses an R*Tree
+        Index(
+            "ix_listings_location",
+            text("point(longitude, latitude)"),
+            postgresql_using="gist"
+        ).ddl_if(dialect="postgresql"),
+    )
+    
     def __repr__(self):
         return f"<Listing(id={self.id}, type={self.listing_type}, address={self.address})>"
+    
+    def compute_effective_price(self):
+        return self.unit_price if self.listing_type == "unit" else self.price_per_room
+
+
+# Full-text search: GIN over the weighted tsvector on PostgreSQL, FTS5 on SQLite
+Listing.__table__.append_constraint(
+    Index(
+        "ix_listings_search",
+        search_vector(Listing.__table__),
+        postgresql_using="gin"
+    ).ddl_if(dialect="postgresql")
+)
+
+# SQLite keeps the FTS5 (text) and R*Tree (location) side tables in sync with triggers
+attach_sqlite_fts(Listing.__table__)
+attach_sqlite_rtree(Listing.__table__)
+
 
+@event.listens_for(Listing, "before_insert")
+@event.listens_for(Listing, "before_update")
+def sync_effective_price(mapper, connection, target):
+    target.effective_price = target.compute_effective_price()
@@ -0,0 +1,42 @@
+from sqlalchemy import Column, Integer, Float, Date, DateTime, ForeignKey, event, insert
+from sqlalchemy.sql import func
+from app.core.config import settings
+from app.db.base import Base
+from app.models.listing import Listing
+
+
+class ListingMatch(Base):
+    """
+    Materialized top swap matches of a listing, written by the match job
+    (match_crud.run_match_job); rank 0 is the best
+    """
+    __tablename__ = "listing_matches"
+    
+    listing_id = Column(Integer, ForeignKey("listings.id", ondelete="CASCADE"), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    # Finds the listings to recompute when this one changes, so no cascading
+    # foreign key: a deleted match stays until the job replaces it (reads join listings)
+    match_id = Column(Integer, nullable=False, index=True)
+    score = Column(Float, nullable=False)
+    overlap_start = Column(Date, nullable=False)
+    overlap_end = Column(Date, nullable=False)
+
+
+class ListingMatchQueue(Base):
+    """
+    Listings created, updated or deleted since the match job last ran
+    """
+    __tablename__ = "listing_match_queue"
+    
+    id = Column(Integer, primary_key=True)
+    listing_id = Column(Integer, nullable=False)
+    queued_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+@event.listens_for(Listing, "after_insert")
+@event.listens_for(Listing, "after_update")
+@event.listens_for(Listing, "after_delete")
+def queue_match_refresh(mapper, connection, target):
+    # Same transaction as the write, so a change is never lost or queued without happening
+    if settings.MATCHES_MATERIALIZED:
+        connection.execute(insert(ListingMatchQueue).values(listing_id=target.id))
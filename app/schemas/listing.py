@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict, Field, computed_field
-from typing import Optional, List, Literal
+from typing import Optional, List, Literal, Union
 from datetime import date, datetime
 
 
@@ -14,6 +14,8 @@ class ListingBase(BaseModel):
     end_date: date
     
     distance_to_university: Optional[int] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
     gym_in_building: Optional[bool] = None
     laundry_in_unit: Optional[bool] = None
     laundry_in_building: Optional[bool] = None
@@ -46,6 +48,8 @@ class UnitListingUpdate(BaseModel):
     start_date: Optional[date] = None
     end_date: Optional[date] = None
     distance_to_university: Optional[int] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
     gym_in_building: Optional[bool] = None
     laundry_in_unit: Optional[bool] = None
     laundry_in_building: Optional[bool] = None
@@ -67,6 +71,8 @@ class RoomListingUpdate(BaseModel):
     start_date: Optional[date] = None
     end_date: Optional[date] = None
     distance_to_university: Optional[int] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
     gym_in_building: Optional[bool] = None
     laundry_in_unit: Optional[bool] = None
     laundry_in_building: Optional[bool] = None
@@ -126,6 +132,70 @@ class RoomListing(ListingBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class ListingCard(BaseModel):
+    id: int
+    listing_type: Literal["unit", "room"]
+    address: str
+    building_name: Optional[str] = None
+    # unit_price for unit listings, price_per_room for room listings
+    price: Optional[float] = None
+    num_rooms_available: int
+    num_bathrooms: int
+    furnished: bool
+    start_date: date
+    end_date: date
+    distance_to_university: Optional[int] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    # First image URL
+    thumbnail: Optional[str] = None
+    user_id: int
+    user: Optional[ListingUserInfo] = None
+
+
+class FacetValueCount(BaseModel):
+    value: Union[int, str]
+    count: int
+
+
+class BooleanFacetCount(BaseModel):
+    true: int
+    false: int
+
+
+class PriceBucketCount(BaseModel):
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    count: int
+
+
+class ListingFacets(BaseModel):
+    total: int
+    listing_type: List[FacetValueCount]
+    num_rooms_available: List[FacetValueCount]
+    furnished: BooleanFacetCount
+    gym_in_building: BooleanFacetCount
+    laundry_in_unit: BooleanFacetCount
+    laundry_in_building: BooleanFacetCount
+    price: List[PriceBucketCount]
+
+
+class ListingMatch(BaseModel):
+    # 0 to 1; see app.core.matching
+    score: float
+    # Dates both listings are available, i.e. when the swap can happen
+    overlap_start: date
+    overlap_end: date
+    listing: ListingCard
+
+
+class ListingChain(BaseModel):
+    # Mean score of the chain's steps, 0 to 1
+    score: float
+    # Each listing's owner stays at the next listing, the last one's at the first
+    listings: List[ListingCard]
+
+
 ListingCreate = UnitListingCreate | RoomListingCreate
 Listing = UnitListing | RoomListing
 
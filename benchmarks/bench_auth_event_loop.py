@@ -0,0 +1,100 @@
+"""
+Benchmark: event-loop stalls caused by the auth path
+
+Serves a JWKS from a local stub server (with artificial latency standing in for
+a slow Auth0) and verifies a burst of distinct tokens concurrently, first with the
+blocking verify_auth0_token and then with verify_auth0_token_async. A ticker task
+records the worst event-loop lag seen during each burst.
+
+The async path's pooled HTTP client is created up front, as the app's lifespan
+does; creating it inside the burst adds its SSL setup (~30ms) to the stall. What
+remains is starting the burst's coroutines and GIL contention with the
+TOKEN_VERIFY_WORKERS threads, which hold the GIL for the Python parts of each
+verification. On a single CPU the workers can't add throughput, so the async
+total is the blocking total plus the executor hand-offs; the gain is that the
+loop keeps serving while the JWKS fetch and the verifications run, and its worst
+stall doesn't grow with the burst as the blocking path's does.
+
+Run from the project root:
+    python -m benchmarks.bench_auth_event_loop
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.core import security
+from app.core.config import settings
+from benchmarks.bench_token_verification import make_signing_material, make_token
+
+CONCURRENT_TOKENS = 200
+JWKS_LATENCY = 0.2
+TICK = 0.005
+
+
+def start_jwks_stub(jwks) -> ThreadingHTTPServer:
+    body = json.dumps(jwks).encode("utf-8")
+    
+    class JWKSHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(JWKS_LATENCY)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), JWKSHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def measure(verify, tokens) -> tuple[float, float]:
+    security.jwks_cache.clear()
+    security.access_token_cache.clear()
+    
+    max_lag = 0.0
+    done = asyncio.Event()
+    
+    async def ticker():
+        nonlocal max_lag
+        while not done.is_set():
+            expected = time.perf_counter() + TICK
+            await asyncio.sleep(TICK)
+            max_lag = max(max_lag, time.perf_counter() - expected)
+    
+    tick_task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await asyncio.gather(*(verify(token) for token in tokens))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await tick_task
+    return elapsed, max_lag
+
+
+async def main():
+    private_pem, jwks = make_signing_material()
+    server = start_jwks_stub(jwks)
+    settings.AUTH0_JWKS_URL = f"http://127.0.0.1:{server.server_port}/.well-known/jwks.json"
+    
+    tokens = [make_token(private_pem, sub=f"auth0|bench-{i}") for i in range(CONCURRENT_TOKENS)]
+    security.get_http_client()
+    
+    async def blocking_verify(token):
+        return security.verify_auth0_token(token)
+    
+    print(f"{CONCURRENT_TOKENS} concurrent tokens, JWKS stub latency {JWKS_LATENCY * 1000:.0f}ms")
+    for label, verify in (("blocking", blocking_verify), ("async + executor", security.verify_auth0_token_async)):
+        elapsed, max_lag = await measure(verify, tokens)
+        print(f"{label:<18} total {elapsed * 1000:8.1f}ms   worst loop stall {max_lag * 1000:8.1f}ms")
+    
+    await security.close_http_client()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+"""
+Benchmark: listing search throughput at high concurrency, sync Session vs AsyncSession
+
+Each simulated request runs listing_crud.get_listings from inside the event loop
+(what the endpoints did with the sync engine) or awaits get_listings_async.
+
+Uses a throwaway SQLite file unless DATABASE_URL is set. On a local SQLite file
+queries take microseconds, so aiosqlite's thread hop usually makes the async path
+slower; point DATABASE_URL at a scratch PostgreSQL database to see the effect of
+real network round trips, where blocking calls serialize the whole worker.
+
+Run from the project root:
+    python -m benchmarks.bench_db_concurrency
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+_tmp_db = None
+if "DATABASE_URL" not in os.environ:
+    _tmp_db = tempfile.mktemp(suffix=".db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_db}"
+
+from app.crud import listing_crud
+from app.db.session import SessionLocal, AsyncSessionLocal, engine, async_engine
+from benchmarks.data import seed
+
+LISTINGS = 20000
+REQUESTS = 2000
+CONCURRENCY = 100
+FILTERS = {"listing_type": "room", "max_price": 900.0, "furnished": True, "limit": 20}
+
+
+async def sync_request():
+    db = SessionLocal()
+    try:
+        listing_crud.get_listings(db, **FILTERS)
+    finally:
+        db.close()
+
+
+async def async_request():
+    async with AsyncSessionLocal() as db:
+        await listing_crud.get_listings_async(db, **FILTERS)
+
+
+async def run(request) -> float:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    
+    async def limited():
+        async with semaphore:
+            await request()
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(limited() for _ in range(REQUESTS)))
+    return REQUESTS / (time.perf_counter() - start)
+
+
+async def main():
+    if _tmp_db:
+        seed(engine, LISTINGS)
+    
+    print(f"{REQUESTS} searches, {CONCURRENCY} concurrent, {engine.url.drivername}")
+    for label, request in (("sync Session", sync_request), ("AsyncSession", async_request)):
+        await run(request)
+        print(f"{label:<14} {await run(request):8.0f} req/s")
+    
+    await async_engine.dispose()
+    engine.dispose()
+    if _tmp_db:
+        os.remove(_tmp_db)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,139 @@
+"""
+Benchmark: GET /listings throughput with and without the page cache
+
+Sends a repetitive mix of public searches - a few filter combinations, most of
+them first pages - through the ASGI app at fixed concurrency, with the cache off,
+with the per-process backend, and with the shared backend on a cache_server.py
+started for the run. Every Nth request is preceded by a listing write, which
+invalidates the cache.
+
+Run from the project root:
+    python -m benchmarks.bench_listing_cache [listings]
+"""
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+_tmp_db = tempfile.mktemp(suffix=".db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_db}"
+
+import httpx
+from app.core.config import settings
+from app.core.result_cache import LocalBackend, RespBackend
+from app.crud import listing_crud
+from app.db.session import SessionLocal, engine, optimize_sqlite
+from app.main import app
+from app.models.listing import Listing
+from benchmarks.data import seed
+
+LISTINGS = 100_000
+REQUESTS = 3000
+CONCURRENCY = 50
+WRITE_EVERY = 500
+CACHE_PORT = 16379
+QUERIES = [
+    {},
+    {"listing_type": "room", "max_price": 900},
+    {"listing_type": "unit", "sort": "price_asc"},
+    {"furnished": True, "max_distance": 5},
+    {"available_from": "2026-09-01", "available_to": "2026-12-31"},
+    {"min_rooms": 2, "sort": "soonest"},
+    {"q": "Oak"},
+    {"listing_type": "room", "skip": 20},
+]
+
+
+def touch_listing() -> None:
+    # A write through listing_crud's hooks, without going through auth
+    db = SessionLocal()
+    try:
+        listing = db.get(Listing, 1)
+        listing.address = f"{random.randint(1, 999)} Main St"
+        db.commit()
+        listing_crud._index_upsert(listing)
+    finally:
+        db.close()
+
+
+async def run(label: str) -> None:
+    rng = random.Random(7)
+    requests = [dict(rng.choice(QUERIES), limit=20) for _ in range(REQUESTS)]
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    cached = 0
+    
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def request(index: int, params) -> None:
+            nonlocal cached
+            if index % WRITE_EVERY == 0:
+                touch_listing()
+            async with semaphore:
+                response = await client.get("/api/v1/listings", params=params)
+            response.raise_for_status()
+            cached += response.headers.get("X-Cache") == "hit"
+        
+        start = time.perf_counter()
+        await asyncio.gather(*(request(index, params) for index, params in enumerate(requests)))
+        elapsed = time.perf_counter() - start
+    
+    stats = listing_crud.listing_page_cache.stats()
+    print(
+        f"{label:24} {REQUESTS / elapsed:7.0f} req/s  {elapsed / REQUESTS * 1000:6.2f}ms mean"
+        f"  hits {cached / REQUESTS:4.0%}, coalesced {stats['coalesced']}"
+    )
+
+
+def start_cache_server() -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "cache_server.py", "--port", str(CACHE_PORT)],
+        stdout=subprocess.DEVNULL
+    )
+    for _ in range(50):
+        try:
+            socket.create_connection(("127.0.0.1", CACHE_PORT)).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("cache_server.py did not start")
+
+
+async def compare() -> None:
+    cache = listing_crud.listing_page_cache
+    settings.LISTING_CACHE_ENABLED = False
+    await run("no cache")
+    
+    settings.LISTING_CACHE_ENABLED = True
+    cache.backend = LocalBackend(settings.LISTING_CACHE_MAX_SIZE, settings.LISTING_CACHE_TTL)
+    cache.coalesced = 0
+    await run("per-process cache")
+    
+    server = start_cache_server()
+    try:
+        cache.backend = RespBackend(f"redis://127.0.0.1:{CACHE_PORT}/0")
+        cache.coalesced = 0
+        await run("shared cache_server.py")
+    finally:
+        server.terminate()
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else LISTINGS
+    try:
+        seed(engine, size)
+        optimize_sqlite()
+        print(f"{size:,} listings, {REQUESTS} requests over {len(QUERIES)} searches, concurrency {CONCURRENCY}")
+        # One event loop: the async engine's connections belong to it
+        asyncio.run(compare())
+    finally:
+        settings.LISTING_CACHE_ENABLED = False
+        engine.dispose()
+        if os.path.exists(_tmp_db):
+            os.remove(_tmp_db)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: the materialized match job (materialize_matches.py)
+
+Seeds a throwaway SQLite file per catalogue size, runs a full match job and then
+an incremental one after a batch of listing writes, and reports wall time per
+100k recomputed listings for each worker count.
+
+Run from the project root:
+    python -m benchmarks.bench_match_job [sizes...]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+_tmp_db = tempfile.mktemp(suffix=".db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_db}"
+
+from sqlalchemy import select
+from app.core.config import settings
+from app.crud import match_crud
+from app.db.session import SessionLocal, engine, optimize_sqlite
+from app.models.listing import Listing
+from benchmarks.data import seed
+
+SIZES = [100_000]
+WRITES = 1000
+
+
+def report(label: str, result) -> None:
+    print(
+        f"{label:24} {result.recomputed:>9,} listings  {result.seconds:7.1f}s"
+        f"  ({result.seconds_per_100k:6.1f}s per 100k, load {result.load_seconds:.1f}s)"
+    )
+
+
+def run(size: int) -> None:
+    if os.path.exists(_tmp_db):
+        engine.dispose()
+        os.remove(_tmp_db)
+    
+    start = time.perf_counter()
+    seed(engine, size)
+    optimize_sqlite()
+    print(f"\n{size:,} listings (seeded in {time.perf_counter() - start:.0f}s, {os.cpu_count()} CPUs)")
+    
+    settings.MATCHES_MATERIALIZED = True
+    db = SessionLocal()
+    try:
+        for workers in sorted({1, os.cpu_count() or 1}):
+            report(f"full, {workers} worker(s)", match_crud.run_match_job(db, full=True, workers=workers))
+        
+        rng = random.Random(7)
+        ids = db.scalars(select(Listing.id).where(Listing.end_date >= date.today())).all()
+        for listing_id in rng.sample(ids, WRITES):
+            listing = db.get(Listing, listing_id)
+            if listing.effective_price:
+                listing.effective_price = round(listing.effective_price * rng.uniform(0.9, 1.1), 2)
+        db.commit()
+        report(f"incremental ({WRITES} writes)", match_crud.run_match_job(db))
+    finally:
+        settings.MATCHES_MATERIALIZED = False
+        db.close()
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or SIZES
+    try:
+        for size in sizes:
+            run(size)
+    finally:
+        engine.dispose()
+        if os.path.exists(_tmp_db):
+            os.remove(_tmp_db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark: swap match lookups (GET /listings/{id}/matches)
+
+Seeds a throwaway SQLite file per catalogue size and times match_crud.get_matches
+for random listings, against a brute-force scan that scores the listing against
+every other active listing - what matching costs without index-backed candidate
+generation.
+
+Seeding 1M listings takes a few minutes. Run from the project root:
+    python -m benchmarks.bench_matching [sizes...]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+_tmp_db = tempfile.mktemp(suffix=".db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_db}"
+
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.matching import MatchRow, score_match
+from app.crud import match_crud
+from app.crud.match import MATCH_COLUMNS
+from app.db.session import SessionLocal, engine, optimize_sqlite
+from app.models.listing import Listing
+from benchmarks.data import seed
+
+SIZES = [100_000, 1_000_000]
+LOOKUPS = 200
+BRUTE_FORCE_LOOKUPS = 3
+TOP_K = 20
+
+
+def percentile(times, fraction: float) -> float:
+    return sorted(times)[int(len(times) * fraction)] * 1000
+
+
+def brute_force(db, listing_id: int) -> int:
+    target = MatchRow._make(db.execute(select(*MATCH_COLUMNS).where(Listing.id == listing_id)).first())
+    rows = map(MatchRow._make, db.execute(select(*MATCH_COLUMNS).where(Listing.end_date >= date.today())))
+    scored = [
+        match for match in (
+            score_match(target, row, settings.MATCH_PRICE_BAND, settings.MATCH_ROOM_TOLERANCE) for row in rows
+        )
+        if match is not None
+    ]
+    return len(scored)
+
+
+def run(size: int) -> None:
+    if os.path.exists(_tmp_db):
+        engine.dispose()
+        os.remove(_tmp_db)
+    
+    start = time.perf_counter()
+    seed(engine, size)
+    optimize_sqlite()
+    print(f"\n{size:,} listings (seeded in {time.perf_counter() - start:.0f}s)")
+    
+    db = SessionLocal()
+    try:
+        ids = [
+            listing_id for listing_id, in
+            db.execute(select(Listing.id).where(Listing.end_date >= date.today())).all()
+        ]
+        sample = random.Random(7).sample(ids, LOOKUPS)
+        
+        match_crud.get_matches(db, sample[0], TOP_K)
+        times, found = [], 0
+        for listing_id in sample:
+            start = time.perf_counter()
+            found += len(match_crud.get_matches(db, listing_id, TOP_K))
+            times.append(time.perf_counter() - start)
+        print(
+            f"get_matches   p50 {percentile(times, 0.5):7.2f}ms  p95 {percentile(times, 0.95):7.2f}ms"
+            f"  ({found / LOOKUPS:.1f} matches per listing)"
+        )
+        
+        times = []
+        for listing_id in sample[:BRUTE_FORCE_LOOKUPS]:
+            start = time.perf_counter()
+            brute_force(db, listing_id)
+            times.append(time.perf_counter() - start)
+        print(f"brute force   p50 {percentile(times, 0.5):7.2f}ms")
+    finally:
+        db.close()
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or SIZES
+    try:
+        for size in sizes:
+            run(size)
+    finally:
+        engine.dispose()
+        if os.path.exists(_tmp_db):
+            os.remove(_tmp_db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: listing search through SQL vs the in-memory search index
+
+For each catalogue size, seeds a throwaway SQLite file, builds listing_index and
+times get_listings_page and count_listings for a few typical searches with
+SEARCH_INDEX_ENABLED off (indexed SQL) and on (NumPy masks, then a primary key
+lookup for the page). Also reports the index build time and memory.
+
+Seeding 1M listings takes a few minutes. Run from the project root:
+    python -m benchmarks.bench_search_index [sizes...]
+"""
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+_tmp_db = tempfile.mktemp(suffix=".db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_db}"
+
+from app.core.config import settings
+from app.core.geo import BoundingBox
+from app.core.search_index import listing_index
+from app.crud import listing_crud
+from app.db.session import SessionLocal, engine, optimize_sqlite
+from benchmarks.data import CAMPUS, seed
+
+SIZES = [100_000, 1_000_000]
+REPEAT = 20
+SEARCHES = {
+    "newest": {},
+    "type+price": {"listing_type": "room", "max_price": 900.0},
+    "many filters": {
+        "listing_type": "unit",
+        "min_price": 1200.0,
+        "max_price": 2000.0,
+        "min_rooms": 2,
+        "furnished": True,
+        "max_distance": 5,
+    },
+    "dates": {"available_from": datetime.date(2026, 9, 1), "available_to": datetime.date(2027, 5, 31), "availability_match": "contains"},
+    "radius 2km": {"near": CAMPUS, "radius": 2.0},
+    "bbox+price": {"bbox": BoundingBox(-6.30, 53.32, -6.22, 53.36), "max_price": 1000.0},
+}
+
+
+def timed(function, *args, **kwargs) -> float:
+    """
+    Median milliseconds over REPEAT calls, after one warm-up call
+    """
+    function(*args, **kwargs)
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        function(*args, **kwargs)
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2] * 1000
+
+
+def run(size: int) -> None:
+    if os.path.exists(_tmp_db):
+        engine.dispose()
+        os.remove(_tmp_db)
+    
+    start = time.perf_counter()
+    seed(engine, size)
+    optimize_sqlite()
+    print(f"\n{size:,} listings (seeded in {time.perf_counter() - start:.0f}s)")
+    
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        listing_crud.rebuild_search_index(db)
+        stats = listing_index.stats()
+        print(f"index build {time.perf_counter() - start:.2f}s, {stats['memory_bytes'] / 2 ** 20:.1f} MiB")
+        
+        print(f"{'search':<14} {'matches':>9} {'page sql':>10} {'page index':>11} {'count sql':>10} {'count index':>12}")
+        for label, filters in SEARCHES.items():
+            results = []
+            for enabled in (False, True):
+                settings.SEARCH_INDEX_ENABLED = enabled
+                results.append((
+                    timed(listing_crud.get_listings_page, db, limit=20, **filters),
+                    timed(listing_crud.count_listings, db, size + 1, **filters)
+                ))
+            matches = listing_index.count(**filters)
+            (page_sql, count_sql), (page_index, count_index) = results
+            print(f"{label:<14} {matches:>9,} {page_sql:>8.2f}ms {page_index:>9.2f}ms {count_sql:>8.2f}ms {count_index:>10.2f}ms")
+    finally:
+        settings.SEARCH_INDEX_ENABLED = False
+        listing_index.clear()
+        db.close()
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or SIZES
+    try:
+        for size in sizes:
+            run(size)
+    finally:
+        engine.dispose()
+        if os.path.exists(_tmp_db):
+            os.remove(_tmp_db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark: swap chain graph and search (GET /listings/{id}/chains)
+
+Builds the in-memory swap graph from synthetic listings - every one active, so a
+size is also the node count - then times an incremental refresh after a batch of
+listing writes and chain searches from random listings under the default time
+budget. No database is involved.
+
+Run from the project root:
+    python -m benchmarks.bench_swap_chains [sizes...]
+"""
+import random
+import sys
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from app.core.config import settings
+from app.core.matching import AMENITIES, MatchRow
+from app.core.swap_chains import SwapChainGraph
+from benchmarks.data import make_listing_rows
+
+SIZES = [100_000, 250_000]
+WRITES = 1000
+SEARCHES = 200
+
+
+def percentile(times, fraction: float) -> float:
+    return sorted(times)[int(len(times) * fraction)] * 1000
+
+
+def active_rows(count: int):
+    # Moved forward so none has ended
+    shift = timedelta(days=(date.today() - date(2026, 1, 1)).days + 1)
+    for listing_id, row in enumerate(make_listing_rows(count), start=1):
+        yield MatchRow(
+            listing_id,
+            row["user_id"],
+            row["listing_type"],
+            row["effective_price"],
+            row["num_rooms_available"],
+            row["start_date"] + shift,
+            row["end_date"] + shift,
+            *(row[name] for name in AMENITIES)
+        )
+
+
+def run(size: int) -> None:
+    rows = list(active_rows(size))
+    graph = SwapChainGraph()
+    
+    start = time.perf_counter()
+    graph.rebuild(
+        rows,
+        settings.MATCH_PRICE_BAND,
+        settings.MATCH_ROOM_TOLERANCE,
+        settings.SWAP_CHAIN_COVERAGE,
+        settings.SWAP_CHAIN_MAX_DEGREE
+    )
+    stats = graph.stats()
+    print(f"\n{stats['listings']:,} nodes, {stats['edges']:,} edges: built in {time.perf_counter() - start:.1f}s")
+    
+    rng = random.Random(7)
+    for row in rng.sample(rows, WRITES):
+        # Listing-like, as listing_crud passes them
+        graph.upsert(SimpleNamespace(**row._asdict(), effective_price=row.price * rng.uniform(0.9, 1.1)))
+    start = time.perf_counter()
+    recomputed = graph.refresh()
+    print(f"refresh after {WRITES} writes: {time.perf_counter() - start:.2f}s ({recomputed:,} listings recomputed)")
+    
+    budget = settings.SWAP_CHAIN_TIME_BUDGET_MS / 1000
+    sample = rng.sample(rows, SEARCHES)
+    for max_length in range(3, settings.SWAP_CHAIN_MAX_LENGTH + 1):
+        times, found, cut_short = [], 0, 0
+        for row in sample:
+            start = time.perf_counter()
+            chains, complete = graph.chains(row.id, max_length, 10, budget)
+            times.append(time.perf_counter() - start)
+            found += bool(chains)
+            cut_short += not complete
+        print(
+            f"chains up to {max_length}: p50 {percentile(times, 0.5):7.2f}ms  p95 {percentile(times, 0.95):7.2f}ms"
+            f"  {found / SEARCHES:4.0%} with a chain, {cut_short} of {SEARCHES} hit the {settings.SWAP_CHAIN_TIME_BUDGET_MS}ms budget"
+        )
+
+
+def main():
+    for size in [int(size) for size in sys.argv[1:]] or SIZES:
+        run(size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Micro-benchmark: per-token RS256 verification cost
+
+Compares the old path (decode n/e and rebuild a PEM for every request, then let
+jwt.decode parse it again) with the per-kid key registry in app.core.security,
+and with a hit in the verified-token cache.
+
+Run from the project root:
+    python -m benchmarks.bench_token_verification
+"""
+import base64
+import time
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.backends import default_backend
+from jose import jwt, jwk
+
+from app.core import security
+from app.core.config import settings
+
+ITERATIONS = 2000
+KID = "bench-key"
+
+
+def make_signing_material():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    )
+    public_jwk = jwk.construct(private_key.public_key(), "RS256").to_dict()
+    public_jwk.update({"kid": KID, "use": "sig"})
+    return private_pem, {"keys": [public_jwk]}
+
+
+def make_token(private_pem: bytes, sub: str = "auth0|bench") -> str:
+    now = int(time.time())
+    claims = {
+        "sub": sub,
+        "aud": settings.AUTH0_API_AUDIENCE,
+        "iss": f"https://{settings.AUTH0_DOMAIN}/",
+        "iat": now,
+        "exp": now + 3600,
+    }
+    return jwt.encode(claims, private_pem, algorithm="RS256", headers={"kid": KID})
+
+
+def legacy_pem_key(token: str, jwks):
+    """The per-request key construction used before the key registry"""
+    unverified_header = jwt.get_unverified_header(token)
+    jwk_data = next(k for k in jwks["keys"] if k["kid"] == unverified_header["kid"])
+    
+    def base64url_decode(value: str) -> bytes:
+        padding = 4 - len(value) % 4
+        if padding != 4:
+            value += "=" * padding
+        return base64.urlsafe_b64decode(value)
+    
+    n_int = int.from_bytes(base64url_decode(jwk_data["n"]), byteorder="big")
+    e_int = int.from_bytes(base64url_decode(jwk_data["e"]), byteorder="big")
+    public_key = rsa.RSAPublicNumbers(e_int, n_int).public_key(default_backend())
+    return public_key.public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+
+
+def legacy_verify(token: str, jwks):
+    return jwt.decode(
+        token,
+        legacy_pem_key(token, jwks),
+        algorithms=settings.AUTH0_ALGORITHMS,
+        audience=settings.AUTH0_API_AUDIENCE,
+        issuer=f"https://{settings.AUTH0_DOMAIN}/"
+    )
+
+
+def verify_uncached(token: str):
+    security.access_token_cache.clear()
+    return security.verify_auth0_token(token)
+
+
+def timed(label: str, fn, token: str) -> float:
+    fn(token)
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        fn(token)
+    per_call_us = (time.perf_counter() - start) / ITERATIONS * 1e6
+    print(f"{label:<28} {per_call_us:9.1f} us/token")
+    return per_call_us
+
+
+def main():
+    private_pem, jwks = make_signing_material()
+    token = make_token(private_pem)
+    
+    security.jwks_cache = security.JWKSCache(
+        fetch=lambda: jwks,
+        async_fetch=None,
+        ttl=settings.JWKS_CACHE_TTL,
+        min_refresh_interval=settings.JWKS_MIN_REFRESH_INTERVAL,
+        stale_if_error=settings.JWKS_STALE_IF_ERROR
+    )
+    
+    print(f"RS256 verification, {ITERATIONS} iterations")
+    before = timed("PEM rebuilt per request", lambda t: legacy_verify(t, jwks), token)
+    after = timed("cached key registry", verify_uncached, token)
+    cached = timed("verified-token cache hit", security.verify_auth0_token, token)
+    print(f"key registry speedup: {before / after:.2f}x")
+    print(f"token cache speedup: {before / cached:.2f}x")
+    print(f"token cache stats: {security.access_token_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
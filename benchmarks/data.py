@@ -0,0 +1,82 @@
+"""
+Synthetic listings for benchmarks
+"""
+import random
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+
+from app.db.base import Base
+from app.models.user import User
+from app.models.listing import Listing
+
+STREETS = ["Main St", "Oak Ave", "College Rd", "King St", "Queen St", "Park Lane", "River Rd", "Hill St"]
+BUILDINGS = [None, "Oak Tower", "The Residences", "Campus View", "Riverside Lofts", "Parkside"]
+
+# Listings are scattered within roughly 15 km of this point
+CAMPUS = (53.3438, -6.2546)
+
+
+def make_listing_rows(count: int, num_users: int = 1000, seed: int = 42) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(seed)
+    season_start = date(2026, 1, 1)
+    
+    for i in range(count):
+        listing_type = "unit" if rng.random() < 0.4 else "room"
+        total_rooms = rng.randint(1, 6)
+        start_date = season_start + timedelta(days=rng.randint(0, 300))
+        row = {
+            "user_id": rng.randint(1, num_users),
+            "listing_type": listing_type,
+            "address": f"{rng.randint(1, 999)} {rng.choice(STREETS)}",
+            "num_rooms_available": rng.randint(1, total_rooms),
+            "total_rooms": total_rooms,
+            "num_bathrooms": rng.randint(1, 3),
+            "furnished": rng.random() < 0.5,
+            "ensuite": rng.randint(0, 2),
+            "start_date": start_date,
+            "end_date": start_date + timedelta(days=rng.randint(30, 240)),
+            "distance_to_university": rng.randint(0, 30),
+            "gym_in_building": rng.random() < 0.3,
+            "laundry_in_unit": rng.random() < 0.4,
+            "laundry_in_building": rng.random() < 0.6,
+            "utilities_included": rng.choice([None, "water", "water, heat", "all"]),
+            "building_name": rng.choice(BUILDINGS),
+            "latitude": CAMPUS[0] + rng.uniform(-0.13, 0.13),
+            "longitude": CAMPUS[1] + rng.uniform(-0.22, 0.22),
+            "images": [f"https://images.example.com/listings/{i}/{n}.jpg" for n in range(rng.randint(1, 8))],
+            "unit_price": None,
+            "total_ensuite": None,
+            "total_shared_bathrooms": None,
+            "price_per_room": None,
+            "how_many_ensuite_rooms": None,
+            "how_many_shared_bathrooms_in_apartment": None,
+        }
+        if listing_type == "unit":
+            row.update(unit_price=float(rng.randint(800, 4000)), total_ensuite=rng.randint(0, 2), total_shared_bathrooms=rng.randint(1, 2))
+        else:
+            row.update(price_per_room=float(rng.randint(400, 1500)), how_many_ensuite_rooms=rng.randint(0, 1), how_many_shared_bathrooms_in_apartment=rng.randint(1, 2))
+        row["effective_price"] = row["unit_price"] if listing_type == "unit" else row["price_per_room"]
+        yield row
+
+
+def seed(engine: Engine, listings: int, num_users: int = 1000, batch_size: int = 5000) -> None:
+    """
+    Create tables and bulk insert synthetic users and listings
+    """
+    Base.metadata.create_all(bind=engine)
+    
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"auth0_user_id": f"auth0|bench-{i}", "email": f"bench{i}@example.com", "first_name": "Bench", "last_name": str(i)}
+            for i in range(1, num_users + 1)
+        ])
+        batch: List[Dict[str, Any]] = []
+        for row in make_listing_rows(listings, num_users=num_users):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                conn.execute(insert(Listing), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Listing), batch)
@@ -0,0 +1,143 @@
+"""
+Script to run a local Redis-compatible cache server
+Lets several API workers share the listing page cache without installing Redis:
+start it, then set LISTING_CACHE_URL=redis://127.0.0.1:6379/0. It speaks RESP2
+and implements the commands the cache needs (GET, MGET, SET with EX/PX/NX, INCR,
+DEL, FLUSHDB, SELECT, DBSIZE, PING), keeping at most --max-keys keys per
+database and evicting the least recently used.
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import time
+
+Entry = Tuple[Optional[float], bytes]
+
+
+class Database:
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self.entries: "OrderedDict[bytes, Entry]" = OrderedDict()
+    
+    def get(self, key: bytes) -> Optional[bytes]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+    
+    def set(self, key: bytes, value: bytes, ttl: Optional[float] = None) -> None:
+        self.entries[key] = (time.monotonic() + ttl if ttl is not None else None, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_keys:
+            self.entries.popitem(last=False)
+
+
+def bulk(value: Optional[bytes]) -> bytes:
+    return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def error(message: str) -> bytes:
+    return f"-ERR {message}\r\n".encode()
+
+
+def execute(databases: Dict[int, Database], db: Database, args: List[bytes]) -> Tuple[bytes, Database]:
+    """
+    Reply to a command, and the database the connection uses afterwards
+    """
+    command = args[0].upper()
+    if command == b"PING":
+        return b"+PONG\r\n", db
+    if command == b"SELECT" and len(args) == 2:
+        return b"+OK\r\n", databases.setdefault(int(args[1]), Database(db.max_keys))
+    if command == b"GET" and len(args) == 2:
+        return bulk(db.get(args[1])), db
+    if command == b"MGET" and len(args) >= 2:
+        return b"*%d\r\n" % (len(args) - 1) + b"".join(bulk(db.get(key)) for key in args[1:]), db
+    if command == b"SET" and len(args) >= 3:
+        ttl, only_new = None, False
+        options = [arg.upper() for arg in args[3:]]
+        while options:
+            option = options.pop(0)
+            if option == b"NX":
+                only_new = True
+            elif option in (b"EX", b"PX") and options and options[0].isdigit():
+                ttl = int(options.pop(0)) / (1 if option == b"EX" else 1000)
+            else:
+                return error("syntax error"), db
+        if only_new and db.get(args[1]) is not None:
+            return bulk(None), db
+        db.set(args[1], args[2], ttl)
+        return b"+OK\r\n", db
+    if command == b"INCR" and len(args) == 2:
+        current = db.get(args[1]) or b"0"
+        if not current.lstrip(b"-").isdigit():
+            return error("value is not an integer or out of range"), db
+        value = int(current) + 1
+        db.set(args[1], str(value).encode())
+        return b":%d\r\n" % value, db
+    if command == b"DEL" and len(args) >= 2:
+        return b":%d\r\n" % sum(db.entries.pop(key, None) is not None for key in args[1:]), db
+    if command == b"FLUSHDB":
+        db.entries.clear()
+        return b"+OK\r\n", db
+    if command == b"DBSIZE":
+        return b":%d\r\n" % len(db.entries), db
+    return error(f"unknown command or wrong number of arguments for '{command.decode(errors='replace')}'"), db
+
+
+async def read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        # Inline command, as typed into telnet
+        return line.split()
+    args = []
+    for _ in range(int(line[1:])):
+        length = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+def serve(host: str, port: int, max_keys: int) -> None:
+    databases = {0: Database(max_keys)}
+    
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        db = databases[0]
+        try:
+            while (args := await read_command(reader)) is not None:
+                if not args:
+                    continue
+                if args[0].upper() == b"QUIT":
+                    writer.write(b"+OK\r\n")
+                    break
+                reply, db = execute(databases, db, args)
+                writer.write(reply)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+    
+    async def main() -> None:
+        server = await asyncio.start_server(handle, host, port)
+        print(f"Cache server listening on {host}:{port}")
+        async with server:
+            await server.serve_forever()
+    
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--max-keys", type=int, default=100_000, help="per database; least recently used keys are evicted")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.max_keys)
@@ -1,14 +1,20 @@
 """
 Script to create database tables
 Run this once to initialize your database
+
+The new database is stamped with the latest migration, so later schema changes
+are applied with `alembic upgrade head`.
 """
+from pathlib import Path
+from alembic import command
+from alembic.config import Config
 from app.db.base import Base
 from app.db.session import engine
 from app.models.user import User
 from app.models.listing import Listing
+from app.models.match import ListingMatch, ListingMatchQueue
 
 print("Creating database tables")
 Base.metadata.create_all(bind=engine)
+command.stamp(Config(str(Path(__file__).parent / "alembic.ini")), "head")
 print("tables created")
-
-
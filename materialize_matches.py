@@ -0,0 +1,32 @@
+"""
+Script to materialize swap matches for MATCHES_MATERIALIZED
+Run it periodically (e.g. from cron); each run recomputes the listings written
+since the last one. Use --full for the first run and after changing the
+MATCH_* settings.
+"""
+import argparse
+from app.db.session import SessionLocal
+from app.crud import match_crud
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--full", action="store_true", help="recompute every active listing")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default MATCH_JOB_WORKERS)")
+    args = parser.parse_args()
+    
+    db = SessionLocal()
+    try:
+        report = match_crud.run_match_job(db, full=args.full, workers=args.workers)
+    finally:
+        db.close()
+    
+    print(
+        f"{report.recomputed:,} of {report.active_listings:,} listings recomputed, "
+        f"{report.matches_written:,} matches written in {report.seconds:.1f}s "
+        f"(loading {report.load_seconds:.1f}s, {report.seconds_per_100k:.1f}s per 100k listings)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+Shared helpers for migrations
+"""
+from typing import Sequence, Tuple
+from alembic import op
+
+IndexSpec = Tuple[str, str, Sequence[str]]
+
+
+def is_postgresql() -> bool:
+    return op.get_context().dialect.name == "postgresql"
+
+
+def create_indexes_online(indexes: Sequence[IndexSpec]) -> None:
+    """
+    Create indexes without blocking writes: CREATE INDEX CONCURRENTLY on PostgreSQL,
+    which must run outside a transaction. SQLite builds them normally.
+    """
+    with op.get_context().autocommit_block():
+        for name, table, columns in indexes:
+            op.create_index(name, table, list(columns), postgresql_concurrently=True, if_not_exists=True)
+
+
+def drop_indexes_online(indexes: Sequence[IndexSpec]) -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in indexes:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,75 @@
+"""Initial schema: users and listings as created by create_tables.py
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+
+Databases created with create_tables.py before migrations existed already have
+this schema; mark them with `alembic stamp 0001` and then run `alembic upgrade head`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("auth0_user_id", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=True),
+        sa.Column("first_name", sa.String(), nullable=True),
+        sa.Column("last_name", sa.String(), nullable=True),
+        sa.Column("profile_picture_url", sa.String(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_superuser", sa.Boolean(), nullable=True),
+        sa.Column("profile_complete", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_auth0_user_id", "users", ["auth0_user_id"], unique=True)
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    
+    op.create_table(
+        "listings",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("listing_type", sa.String(), nullable=False),
+        sa.Column("address", sa.String(), nullable=False),
+        sa.Column("num_rooms_available", sa.Integer(), nullable=False),
+        sa.Column("total_rooms", sa.Integer(), nullable=False),
+        sa.Column("num_bathrooms", sa.Integer(), nullable=False),
+        sa.Column("furnished", sa.Boolean(), nullable=False),
+        sa.Column("ensuite", sa.Integer(), nullable=False),
+        sa.Column("start_date", sa.Date(), nullable=False),
+        sa.Column("end_date", sa.Date(), nullable=False),
+        sa.Column("distance_to_university", sa.Integer(), nullable=True),
+        sa.Column("gym_in_building", sa.Boolean(), nullable=True),
+        sa.Column("laundry_in_unit", sa.Boolean(), nullable=True),
+        sa.Column("laundry_in_building", sa.Boolean(), nullable=True),
+        sa.Column("utilities_included", sa.String(), nullable=True),
+        sa.Column("building_name", sa.String(), nullable=True),
+        sa.Column("images", sa.JSON(), nullable=True),
+        sa.Column("unit_price", sa.Float(), nullable=True),
+        sa.Column("total_ensuite", sa.Integer(), nullable=True),
+        sa.Column("total_shared_bathrooms", sa.Integer(), nullable=True),
+        sa.Column("price_per_room", sa.Float(), nullable=True),
+        sa.Column("how_many_ensuite_rooms", sa.Integer(), nullable=True),
+        sa.Column("how_many_shared_bathrooms_in_apartment", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_listings_id", "listings", ["id"])
+    op.create_index("ix_listings_user_id", "listings", ["user_id"])
+    op.create_index("ix_listings_listing_type", "listings", ["listing_type"])
+
+
+def downgrade() -> None:
+    op.drop_table("listings")
+    op.drop_table("users")
@@ -0,0 +1,33 @@
+"""Composite indexes for the listing search filters
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+
+Matches the predicates built by listing_crud.get_listings. Built concurrently on
+PostgreSQL so the listings table stays writable during the migration.
+"""
+from migrations.helpers import create_indexes_online, drop_indexes_online
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_listings_type_unit_price_created", "listings", ["listing_type", "unit_price", "created_at"]),
+    ("ix_listings_type_room_price_created", "listings", ["listing_type", "price_per_room", "created_at"]),
+    ("ix_listings_furnished_rooms", "listings", ["furnished", "num_rooms_available"]),
+    ("ix_listings_rooms_bathrooms", "listings", ["num_rooms_available", "num_bathrooms"]),
+    ("ix_listings_distance", "listings", ["distance_to_university"]),
+    ("ix_listings_amenities", "listings", ["gym_in_building", "laundry_in_unit", "laundry_in_building"]),
+]
+
+
+def upgrade() -> None:
+    create_indexes_online(INDEXES)
+
+
+def downgrade() -> None:
+    drop_indexes_online(INDEXES)
@@ -0,0 +1,47 @@
+"""Indexed effective_price for listing price filters
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+
+Price filters used (unit_price >= x) OR (price_per_room >= x), which no single
+index can serve. effective_price holds whichever of the two applies to the
+listing type, so price ranges become index range scans. The per-type price
+indexes from 0002 are replaced.
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import create_indexes_online, drop_indexes_online
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_listings_type_effective_price", "listings", ["listing_type", "effective_price", "created_at"]),
+    ("ix_listings_effective_price", "listings", ["effective_price"]),
+]
+
+REPLACED_INDEXES = [
+    ("ix_listings_type_unit_price_created", "listings", ["listing_type", "unit_price", "created_at"]),
+    ("ix_listings_type_room_price_created", "listings", ["listing_type", "price_per_room", "created_at"]),
+]
+
+
+def upgrade() -> None:
+    op.add_column("listings", sa.Column("effective_price", sa.Float(), nullable=True))
+    op.execute(
+        "UPDATE listings SET effective_price = "
+        "CASE WHEN listing_type = 'unit' THEN unit_price ELSE price_per_room END"
+    )
+    create_indexes_online(INDEXES)
+    drop_indexes_online(REPLACED_INDEXES)
+
+
+def downgrade() -> None:
+    create_indexes_online(REPLACED_INDEXES)
+    drop_indexes_online(INDEXES)
+    with op.batch_alter_table("listings") as batch_op:
+        batch_op.drop_column("effective_price")
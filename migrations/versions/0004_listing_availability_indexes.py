@@ -0,0 +1,41 @@
+"""Indexes for availability date-range search
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+
+A (start_date, end_date) B-tree serves the overlap and containment comparisons
+on every backend. PostgreSQL also gets a GiST index over
+daterange(start_date, end_date, '[]'), which the && and @> range operators use.
+"""
+from alembic import op
+from migrations.helpers import create_indexes_online, drop_indexes_online, is_postgresql
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_listings_availability", "listings", ["start_date", "end_date"]),
+]
+
+RANGE_INDEX = "ix_listings_availability_range"
+
+
+def upgrade() -> None:
+    create_indexes_online(INDEXES)
+    if is_postgresql():
+        with op.get_context().autocommit_block():
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {RANGE_INDEX} "
+                "ON listings USING gist (daterange(start_date, end_date, '[]'))"
+            )
+
+
+def downgrade() -> None:
+    if is_postgresql():
+        with op.get_context().autocommit_block():
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {RANGE_INDEX}")
+    drop_indexes_online(INDEXES)
@@ -0,0 +1,84 @@
+"""Full-text search index over listing text
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+
+SQLite: an external-content FTS5 table, listings_fts, maintained by triggers
+on listings and backfilled with a rebuild. PostgreSQL: a GIN index over the
+weighted tsvector expression in app.db.search.search_vector. Both match the
+definitions in app.db.search at the time of this revision.
+
+Note: batch operations that recreate the listings table on SQLite drop its
+triggers; re-run the DDL in app.db.search after such a migration.
+"""
+from alembic import op
+from migrations.helpers import is_postgresql
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+SEARCH_INDEX = "ix_listings_search"
+
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS listings_fts USING fts5("
+    "address, building_name, utilities_included, "
+    "content='listings', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    
+    "CREATE TRIGGER IF NOT EXISTS listings_fts_insert AFTER INSERT ON listings BEGIN "
+    "INSERT INTO listings_fts(rowid, address, building_name, utilities_included) "
+    "VALUES (new.id, new.address, new.building_name, new.utilities_included); END",
+    
+    "CREATE TRIGGER IF NOT EXISTS listings_fts_delete AFTER DELETE ON listings BEGIN "
+    "INSERT INTO listings_fts(listings_fts, rowid, address, building_name, utilities_included) "
+    "VALUES ('delete', old.id, old.address, old.building_name, old.utilities_included); END",
+    
+    "CREATE TRIGGER IF NOT EXISTS listings_fts_update "
+    "AFTER UPDATE OF address, building_name, utilities_included ON listings BEGIN "
+    "INSERT INTO listings_fts(listings_fts, rowid, address, building_name, utilities_included) "
+    "VALUES ('delete', old.id, old.address, old.building_name, old.utilities_included); "
+    "INSERT INTO listings_fts(rowid, address, building_name, utilities_included) "
+    "VALUES (new.id, new.address, new.building_name, new.utilities_included); END",
+]
+
+SQLITE_FTS_REBUILD = "INSERT INTO listings_fts(listings_fts) VALUES ('rebuild')"
+
+SQLITE_FTS_DROP = [
+    "DROP TRIGGER IF EXISTS listings_fts_update",
+    "DROP TRIGGER IF EXISTS listings_fts_delete",
+    "DROP TRIGGER IF EXISTS listings_fts_insert",
+    "DROP TABLE IF EXISTS listings_fts",
+]
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(address, '')), 'A'::\"char\") || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(building_name, '')), 'B'::\"char\") || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(utilities_included, '')), 'C'::\"char\")"
+)
+
+
+def upgrade() -> None:
+    if is_postgresql():
+        with op.get_context().autocommit_block():
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {SEARCH_INDEX} "
+                f"ON listings USING gin (({SEARCH_VECTOR}))"
+            )
+        return
+    
+    for statement in SQLITE_FTS_DDL:
+        op.execute(statement)
+    op.execute(SQLITE_FTS_REBUILD)
+
+
+def downgrade() -> None:
+    if is_postgresql():
+        with op.get_context().autocommit_block():
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {SEARCH_INDEX}")
+        return
+    
+    for statement in SQLITE_FTS_DROP:
+        op.execute(statement)
@@ -0,0 +1,74 @@
+"""Listing coordinates with a spatial index
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+
+Adds latitude/longitude. SQLite: an R*Tree virtual table, listings_geo,
+maintained by triggers on listings. PostgreSQL: a GiST index over
+point(longitude, latitude). Both match app.db.spatial at the time of this
+revision.
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import is_postgresql
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+LOCATION_INDEX = "ix_listings_location"
+
+SQLITE_RTREE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS listings_geo USING rtree(id, min_lat, max_lat, min_lon, max_lon)",
+    
+    "CREATE TRIGGER IF NOT EXISTS listings_geo_insert AFTER INSERT ON listings "
+    "WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN "
+    "INSERT INTO listings_geo VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude); END",
+    
+    "CREATE TRIGGER IF NOT EXISTS listings_geo_delete AFTER DELETE ON listings BEGIN "
+    "DELETE FROM listings_geo WHERE id = old.id; END",
+    
+    "CREATE TRIGGER IF NOT EXISTS listings_geo_update AFTER UPDATE OF latitude, longitude ON listings BEGIN "
+    "DELETE FROM listings_geo WHERE id = old.id; "
+    "INSERT INTO listings_geo SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude "
+    "WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL; END",
+]
+
+SQLITE_RTREE_DROP = [
+    "DROP TRIGGER IF EXISTS listings_geo_update",
+    "DROP TRIGGER IF EXISTS listings_geo_delete",
+    "DROP TRIGGER IF EXISTS listings_geo_insert",
+    "DROP TABLE IF EXISTS listings_geo",
+]
+
+
+def upgrade() -> None:
+    op.add_column("listings", sa.Column("latitude", sa.Float(), nullable=True))
+    op.add_column("listings", sa.Column("longitude", sa.Float(), nullable=True))
+    
+    if is_postgresql():
+        with op.get_context().autocommit_block():
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {LOCATION_INDEX} "
+                "ON listings USING gist (point(longitude, latitude))"
+            )
+        return
+    
+    for statement in SQLITE_RTREE_DDL:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    if is_postgresql():
+        with op.get_context().autocommit_block():
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {LOCATION_INDEX}")
+    else:
+        for statement in SQLITE_RTREE_DROP:
+            op.execute(statement)
+    
+    # Plain ALTER TABLE on SQLite too; a batch table rebuild would drop the FTS triggers
+    op.drop_column("listings", "longitude")
+    op.drop_column("listings", "latitude")
@@ -0,0 +1,42 @@
+"""Indexes for listing sort orders
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+
+Each sort on GET /listings walks a (column, id) B-tree, so a sorted, limited
+query reads one page of index entries instead of sorting every match;
+(listing_type, effective_price, id) serves price sorts within one listing type.
+These replace the price, distance and type/price indexes they extend, which
+nothing else needs.
+"""
+from migrations.helpers import create_indexes_online, drop_indexes_online
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_listings_type_price_id", "listings", ["listing_type", "effective_price", "id"]),
+    ("ix_listings_price_id", "listings", ["effective_price", "id"]),
+    ("ix_listings_distance_id", "listings", ["distance_to_university", "id"]),
+    ("ix_listings_start_date_id", "listings", ["start_date", "id"]),
+]
+
+SUPERSEDED = [
+    ("ix_listings_type_effective_price", "listings", ["listing_type", "effective_price", "created_at"]),
+    ("ix_listings_effective_price", "listings", ["effective_price"]),
+    ("ix_listings_distance", "listings", ["distance_to_university"]),
+]
+
+
+def upgrade() -> None:
+    create_indexes_online(INDEXES)
+    drop_indexes_online(SUPERSEDED)
+
+
+def downgrade() -> None:
+    create_indexes_online(SUPERSEDED)
+    drop_indexes_online(INDEXES)
@@ -0,0 +1,44 @@
+"""Materialized swap matches
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+
+listing_matches holds each active listing's top MATCH_TOP_K matches as written
+by materialize_matches.py; listing_match_queue records the listings written
+since it last ran so an incremental run recomputes only what changed. Run
+`python materialize_matches.py --full` once before enabling MATCHES_MATERIALIZED.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "listing_matches",
+        sa.Column("listing_id", sa.Integer(), sa.ForeignKey("listings.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("rank", sa.Integer(), primary_key=True),
+        sa.Column("match_id", sa.Integer(), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.Column("overlap_start", sa.Date(), nullable=False),
+        sa.Column("overlap_end", sa.Date(), nullable=False),
+    )
+    op.create_index("ix_listing_matches_match_id", "listing_matches", ["match_id"])
+    
+    op.create_table(
+        "listing_match_queue",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("listing_id", sa.Integer(), nullable=False),
+        sa.Column("queued_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("listing_match_queue")
+    op.drop_table("listing_matches")
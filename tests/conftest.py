@@ -0,0 +1,270 @@
+"""
+Shared fixtures. Settings are read when app modules are imported, so the test
+database is configured here before anything from app is imported.
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+_db_dir = tempfile.mkdtemp(prefix="flat-swap-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/test.db"
+os.environ["DATABASE_REPLICA_URLS"] = "[]"
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+from sqlalchemy import delete, insert
+
+from app.core import security
+from app.core.config import settings
+from app.db.base import Base
+from app.db.routing import read_your_writes
+from app.crud.user import identity_cache
+from app.db.session import engine
+from app.models.listing import Listing
+from app.models.match import ListingMatch, ListingMatchQueue
+from app.models.user import User
+from benchmarks.data import make_listing_rows
+
+
+class JWKSStub:
+    """
+    Local JWKS endpoint: serves `jwks`, or 503 while `fail` is set, after `delay` seconds
+    """
+    
+    def __init__(self):
+        self.jwks: Dict[str, Any] = {"keys": []}
+        self.fail = False
+        self.delay = 0.0
+        self.requests = 0
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                time.sleep(stub.delay)
+                if stub.fail:
+                    self.send_response(503)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = json.dumps(stub.jwks).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/.well-known/jwks.json"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    
+    def serve(self, *keys: "SigningKey") -> None:
+        self.jwks = {"keys": [key.public_jwk for key in keys]}
+
+
+class CacheServer:
+    """
+    cache_server.py in a subprocess on `port`; stop() and start() again to restart it
+    """
+    
+    def __init__(self, port: int, max_keys: int = 3):
+        self.port = port
+        self.max_keys = max_keys
+        self.url = f"redis://127.0.0.1:{port}/0"
+        self.process: Optional[subprocess.Popen] = None
+    
+    def start(self) -> None:
+        self.process = subprocess.Popen(
+            [sys.executable, "cache_server.py", "--port", str(self.port), "--max-keys", str(self.max_keys)],
+            cwd=Path(__file__).resolve().parent.parent,
+            stdout=subprocess.DEVNULL
+        )
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=0.1).close()
+                return
+            except OSError:
+                if time.monotonic() > deadline:
+                    self.stop()
+                    raise
+                time.sleep(0.05)
+    
+    def stop(self) -> None:
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+            self.process = None
+
+
+class SigningKey:
+    """
+    RSA key pair that signs tokens with its kid
+    """
+    
+    def __init__(self, kid: str):
+        self.kid = kid
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.private_pem = private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()
+        )
+        self.public_jwk = jwk.construct(private_key.public_key(), "RS256").to_dict()
+        self.public_jwk.update({"kid": kid, "use": "sig"})
+    
+    def token(self, sub: str = "auth0|test", expires_in: int = 3600, audience: Optional[str] = None, **claims) -> str:
+        now = int(time.time())
+        payload = {
+            "sub": sub,
+            "aud": audience or settings.AUTH0_API_AUDIENCE,
+            "iss": f"https://{settings.AUTH0_DOMAIN}/",
+            "iat": now,
+            "exp": now + expires_in,
+            **claims
+        }
+        return jwt.encode(payload, self.private_pem, algorithm="RS256", headers={"kid": self.kid})
+
+
+@pytest.fixture(scope="session")
+def signing_keys() -> List[SigningKey]:
+    return [SigningKey(f"key-{n}") for n in range(3)]
+
+
+@pytest.fixture(scope="session")
+def _jwks_server() -> JWKSStub:
+    stub = JWKSStub()
+    yield stub
+    stub.server.shutdown()
+
+
+@pytest.fixture
+def jwks_stub(_jwks_server, signing_keys, monkeypatch) -> JWKSStub:
+    """
+    The JWKS stub serving the first signing key, with empty JWKS and token caches
+    """
+    _jwks_server.serve(signing_keys[0])
+    _jwks_server.fail = False
+    _jwks_server.delay = 0.0
+    _jwks_server.requests = 0
+    monkeypatch.setattr(settings, "AUTH0_JWKS_URL", _jwks_server.url)
+    security.jwks_cache.clear()
+    security.access_token_cache.clear()
+    security.id_token_cache.clear()
+    yield _jwks_server
+    security.jwks_cache.clear()
+    security.access_token_cache.clear()
+    security.id_token_cache.clear()
+
+
+@pytest.fixture
+def auth_headers(jwks_stub, signing_keys):
+    """
+    Headers authenticating as an Auth0 user, registering them on first use
+    """
+    key = signing_keys[0]
+    
+    def make(sub: str = "auth0|test") -> Dict[str, str]:
+        name = sub.split("|")[-1]
+        id_token = key.token(sub, audience="client", email=f"{name}@example.com", name=f"{name.title()} Test")
+        return {"Authorization": f"Bearer {key.token(sub)}", "X-ID-Token": id_token}
+    
+    return make
+
+
+@pytest.fixture
+def unused_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def cache_server(unused_port) -> CacheServer:
+    """
+    A running cache_server.py that keeps at most 3 keys
+    """
+    server = CacheServer(unused_port)
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def db_tables():
+    """
+    Empty tables in the test database
+    """
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    with engine.begin() as connection:
+        for model in (ListingMatchQueue, ListingMatch, Listing, User):
+            connection.execute(delete(model))
+    identity_cache.clear()
+    read_your_writes.clear()
+
+
+def _seed_listings(count: int, num_users: int = 50, seed: int = 42) -> None:
+    """
+    Synthetic users and listings, with dates shifted so that most are still available
+    """
+    shift = date.today() - timedelta(days=150) - date(2026, 1, 1)
+    rows = list(make_listing_rows(count, num_users=num_users, seed=seed))
+    for row in rows:
+        row["start_date"] += shift
+        row["end_date"] += shift
+    with engine.begin() as connection:
+        connection.execute(insert(User), [
+            {"auth0_user_id": f"auth0|seed-{n}", "email": f"seed{n}@example.com", "first_name": "Seed", "last_name": str(n)}
+            for n in range(1, num_users + 1)
+        ])
+        connection.execute(insert(Listing), rows)
+
+
+@pytest.fixture
+def seed_listings(db_tables):
+    return _seed_listings
+
+
+@pytest.fixture(params=[False, True], ids=["sql", "index"])
+def search_index(request, monkeypatch):
+    """
+    Searches answered by SQL, then by the in-memory index built from the listings
+    written so far; request it after the fixtures that write them
+    """
+    from app.core.search_index import listing_index
+    from app.crud import listing_crud
+    from app.db.session import SessionLocal
+    
+    monkeypatch.setattr(settings, "SEARCH_INDEX_ENABLED", request.param)
+    if request.param:
+        db = SessionLocal()
+        try:
+            listing_crud.rebuild_search_index(db)
+        finally:
+            db.close()
+    yield request.param
+    listing_index.clear()
+
+
+@pytest.fixture
+def client(db_tables):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    
+    with TestClient(app) as test_client:
+        yield test_client
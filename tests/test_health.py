@@ -0,0 +1,23 @@
+"""
+Health and pool metrics endpoints
+"""
+
+
+def test_db_pool_metrics_require_authentication(client, auth_headers):
+    response = client.get("/api/v1/health/db-pool")
+    assert response.status_code in (401, 403)
+    
+    response = client.get("/api/v1/health/db-pool", headers=auth_headers("auth0|ops"))
+    assert response.status_code == 200
+    assert "primary" in response.json()
+
+
+def test_health_reports_token_cache_stats(client, auth_headers):
+    headers = auth_headers("auth0|ops")
+    client.get("/api/v1/health/db-pool", headers=headers)
+    client.get("/api/v1/health/db-pool", headers=headers)
+    
+    stats = client.get("/health").json()["access_token_cache"]
+    assert stats["size"] == 1
+    assert stats["hits"] >= 1 and stats["misses"] >= 1
+    assert "evictions" in client.get("/health").json()["id_token_cache"]
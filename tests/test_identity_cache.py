@@ -0,0 +1,100 @@
+"""
+Identity cache: user writes drop the caller's cached User row
+"""
+import asyncio
+
+from app.crud import user_crud
+from app.crud.user import identity_cache
+from app.db.session import AsyncSessionLocal, SessionLocal
+from app.schemas.user import UserUpdate
+
+
+def id_token_payload(sub: str, name: str):
+    return {"sub": sub, "email": f"{sub.split('|')[-1]}@example.com", "name": name}
+
+
+def cached(auth0_user_id: str):
+    return identity_cache.get(auth0_user_id)
+
+
+def signed_in(client, auth_headers, sub: str):
+    # The first request provisions the user, the second caches them
+    headers = auth_headers(sub)
+    client.get("/api/v1/auth/me", headers=headers)
+    user = client.get("/api/v1/auth/me", headers=headers).json()
+    assert cached(sub) is not None
+    return headers, user
+
+
+def test_profile_update_evicts_the_cached_user(client, auth_headers):
+    headers, user = signed_in(client, auth_headers, "auth0|alice")
+    
+    response = client.put(f"/api/v1/users/{user['id']}", json={"first_name": "Alicia"}, headers=headers)
+    assert response.status_code == 200
+    assert cached("auth0|alice") is None
+    assert client.get("/api/v1/auth/me", headers=headers).json()["first_name"] == "Alicia"
+
+
+def test_deleted_user_is_not_served_from_the_cache(client, auth_headers):
+    headers, user = signed_in(client, auth_headers, "auth0|alice")
+    
+    assert client.delete(f"/api/v1/users/{user['id']}", headers=headers).status_code == 204
+    assert cached("auth0|alice") is None
+    # Without an ID token the deleted user can't be provisioned again
+    response = client.get("/api/v1/auth/me", headers={"Authorization": headers["Authorization"]})
+    assert response.status_code == 401
+    assert "ID token required" in response.json()["detail"]
+
+
+def test_deactivation_refuses_the_next_request(client, auth_headers):
+    headers, user = signed_in(client, auth_headers, "auth0|alice")
+    
+    db = SessionLocal()
+    try:
+        user_crud.set_user_active(db, user["id"], False)
+    finally:
+        db.close()
+    
+    response = client.get("/api/v1/auth/me", headers=headers)
+    assert (response.status_code, response.json()["detail"]) == (400, "Inactive user")
+    
+    async def reactivate():
+        async with AsyncSessionLocal() as async_db:
+            await user_crud.set_user_active_async(async_db, user["id"], True)
+    
+    asyncio.run(reactivate())
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 200
+
+
+def test_sync_writes_and_reprovisioning_evict_the_cached_user(db_tables):
+    db = SessionLocal()
+    try:
+        user = user_crud.get_or_create_user_from_auth0(db, id_token_payload("auth0|bob", "Bob Test"))
+        assert user_crud.get_user_by_auth0_id_cached(db, "auth0|bob").first_name == "Bob"
+        
+        # A login with changed claims rewrites the profile
+        user_crud.get_or_create_user_from_auth0(db, id_token_payload("auth0|bob", "Robert Test"))
+        assert cached("auth0|bob") is None
+        assert user_crud.get_user_by_auth0_id_cached(db, "auth0|bob").first_name == "Robert"
+        
+        user_crud.update_user(db, user.id, UserUpdate(last_name="Tester"))
+        assert cached("auth0|bob") is None
+        assert user_crud.get_user_by_auth0_id_cached(db, "auth0|bob").last_name == "Tester"
+        
+        user_crud.delete_user(db, user.id)
+        assert cached("auth0|bob") is None
+        assert user_crud.get_user_by_auth0_id_cached(db, "auth0|bob") is None
+    finally:
+        db.close()
+
+
+def test_async_reprovisioning_evicts_the_cached_user(db_tables):
+    async def provision_twice():
+        async with AsyncSessionLocal() as db:
+            await user_crud.get_or_create_user_from_auth0_async(db, id_token_payload("auth0|carol", "Carol Test"))
+            assert (await user_crud.get_user_by_auth0_id_cached_async(db, "auth0|carol")).first_name == "Carol"
+            await user_crud.get_or_create_user_from_auth0_async(db, id_token_payload("auth0|carol", "Caroline Test"))
+            assert cached("auth0|carol") is None
+            return await user_crud.get_user_by_auth0_id_cached_async(db, "auth0|carol")
+    
+    assert asyncio.run(provision_twice()).first_name == "Caroline"
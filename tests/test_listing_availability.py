@@ -0,0 +1,87 @@
+"""
+Availability filters of GET /listings over fixed date ranges, through SQL and the
+in-memory search index, and their PostgreSQL range operators
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.core.search_index import listing_index
+from app.db.expressions import period_contains, period_overlaps
+from app.models.listing import Listing
+
+LISTING = {
+    "listing_type": "room",
+    "address": "1 Oak Ave",
+    "num_rooms_available": 1,
+    "total_rooms": 3,
+    "num_bathrooms": 1,
+    "furnished": True,
+    "ensuite": 0,
+    "price_per_room": 700,
+    "how_many_ensuite_rooms": 0,
+    "how_many_shared_bathrooms_in_apartment": 1,
+}
+
+PERIODS = {
+    "winter": ("2030-01-01", "2030-03-31"),
+    "spring": ("2030-03-01", "2030-06-30"),
+    "autumn": ("2030-07-01", "2030-12-31"),
+}
+
+
+@pytest.fixture
+def listings(client, auth_headers):
+    owner = auth_headers("auth0|owner")
+    ids = {}
+    for name, (start, end) in PERIODS.items():
+        response = client.post("/api/v1/listings", json={**LISTING, "start_date": start, "end_date": end}, headers=owner)
+        ids[response.json()["id"]] = name
+    return ids
+
+
+@pytest.mark.parametrize("params, expected", [
+    # Part of the stay
+    ({"available_from": "2030-03-15", "available_to": "2030-04-15"}, {"winter", "spring"}),
+    ({"available_from": "2030-06-30", "available_to": "2030-07-01"}, {"spring", "autumn"}),
+    ({"available_from": "2031-01-01", "available_to": "2031-02-01"}, set()),
+    # Open-ended: available on or after from, on or before to
+    ({"available_from": "2030-06-30"}, {"spring", "autumn"}),
+    ({"available_to": "2030-03-01"}, {"winter", "spring"}),
+    ({"available_to": "2029-12-31"}, set()),
+    # All of the stay
+    ({"availability_match": "contains", "available_from": "2030-03-15", "available_to": "2030-03-20"}, {"winter", "spring"}),
+    ({"availability_match": "contains", "available_from": "2030-03-15", "available_to": "2030-04-15"}, {"spring"}),
+    ({"availability_match": "contains", "available_from": "2030-03-01", "available_to": "2030-06-30"}, {"spring"}),
+    ({"availability_match": "contains", "available_from": "2030-06-15", "available_to": "2030-07-15"}, set()),
+    # Open-ended: available on the given day
+    ({"availability_match": "contains", "available_from": "2030-06-15"}, {"spring"}),
+    ({"availability_match": "contains", "available_to": "2030-03-10"}, {"winter", "spring"}),
+    ({"availability_match": "contains", "available_from": "2031-01-01"}, set()),
+])
+def test_availability_filters(client, listings, search_index, params, expected):
+    assert listing_index.supports({"availability_match": "overlap", **params}) == search_index
+    response = client.get("/api/v1/listings", params=params)
+    assert response.status_code == 200
+    assert {listings[row["id"]] for row in response.json()} == expected
+
+
+def test_from_after_to_is_rejected(client):
+    response = client.get("/api/v1/listings", params={"available_from": "2030-02-01", "available_to": "2030-01-01"})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("predicate, lower, upper, expected", [
+    (period_overlaps, date(2030, 1, 1), date(2030, 2, 1), "&& daterange('2030-01-01', '2030-02-01', '[]')"),
+    (period_overlaps, date(2030, 1, 1), None, "&& daterange('2030-01-01', NULL, '[]')"),
+    (period_overlaps, None, date(2030, 2, 1), "&& daterange(NULL, '2030-02-01', '[]')"),
+    (period_contains, date(2030, 1, 1), date(2030, 2, 1), "@> daterange('2030-01-01', '2030-02-01', '[]')"),
+    (period_contains, date(2030, 1, 1), None, "@> CAST('2030-01-01' AS DATE)"),
+    (period_contains, None, date(2030, 2, 1), "@> CAST('2030-02-01' AS DATE)"),
+])
+def test_postgresql_range_operators(predicate, lower, upper, expected):
+    stmt = select(Listing.id).where(predicate(Listing.start_date, Listing.end_date, lower, upper))
+    sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    assert f"(daterange(listings.start_date, listings.end_date, '[]') {expected})" in sql
@@ -0,0 +1,178 @@
+"""
+Page cache for GET /listings: invalidation on writes, read-your-writes and
+replica reads, and the cache's behaviour when its backend misbehaves
+"""
+import asyncio
+import itertools
+import threading
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.core.result_cache import LocalBackend, RespBackend, ResultCache
+from app.crud import listing as listing_crud
+from app.db import session as db_session
+from app.db.base import Base
+
+LISTING = {
+    "listing_type": "room",
+    "address": "1 Oak Ave",
+    "num_rooms_available": 1,
+    "total_rooms": 3,
+    "num_bathrooms": 1,
+    "furnished": True,
+    "ensuite": 0,
+    "start_date": "2030-01-01",
+    "end_date": "2030-06-30",
+    "distance_to_university": 2,
+    "price_per_room": 700,
+    "how_many_ensuite_rooms": 0,
+    "how_many_shared_bathrooms_in_apartment": 1,
+}
+
+
+def new_cache(backend=None) -> ResultCache:
+    return ResultCache(backend or LocalBackend(100, 30), namespace="listings", ttl=30, max_entry_bytes=1_000_000)
+
+
+@pytest.fixture
+def page_cache(monkeypatch):
+    monkeypatch.setattr(settings, "LISTING_CACHE_ENABLED", True)
+    cache = new_cache()
+    monkeypatch.setattr(listing_crud, "listing_page_cache", cache)
+    return cache
+
+
+def listing_ids(response):
+    return [listing["id"] for listing in response.json()]
+
+
+def test_writes_invalidate_cached_pages(client, auth_headers, page_cache):
+    owner = auth_headers("auth0|owner")
+    first = client.post("/api/v1/listings", json=LISTING, headers=owner).json()["id"]
+    
+    response = client.get("/api/v1/listings")
+    assert (response.headers["X-Cache"], listing_ids(response)) == ("miss", [first])
+    response = client.get("/api/v1/listings")
+    assert (response.headers["X-Cache"], listing_ids(response)) == ("hit", [first])
+    
+    second = client.post("/api/v1/listings", json={**LISTING, "address": "2 Oak Ave"}, headers=owner).json()["id"]
+    response = client.get("/api/v1/listings")
+    assert (response.headers["X-Cache"], listing_ids(response)) == ("miss", [second, first])
+    
+    client.put(f"/api/v1/listings/{first}", json={"price_per_room": 650}, headers=owner)
+    response = client.get("/api/v1/listings", params={"max_price": 680})
+    assert (response.headers["X-Cache"], listing_ids(response)) == ("miss", [first])
+    
+    client.delete(f"/api/v1/listings/{second}", headers=owner)
+    response = client.get("/api/v1/listings")
+    assert (response.headers["X-Cache"], listing_ids(response)) == ("miss", [first])
+    assert page_cache.stats()["errors"] == 0
+
+
+def test_recent_writer_bypasses_the_cache(client, auth_headers, page_cache):
+    owner = auth_headers("auth0|owner")
+    listing_id = client.post("/api/v1/listings", json=LISTING, headers=owner).json()["id"]
+    
+    response = client.get("/api/v1/listings", headers={"Authorization": owner["Authorization"]})
+    assert "X-Cache" not in response.headers
+    assert listing_ids(response) == [listing_id]
+    assert page_cache.stats()["misses"] == 0
+    
+    assert client.get("/api/v1/listings").headers["X-Cache"] == "miss"
+
+
+def test_pages_are_cached_from_the_primary(client, auth_headers, page_cache, tmp_path, monkeypatch):
+    # A replica that hasn't caught up with any write
+    replica_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/replica.db")
+    
+    async def create_replica_tables():
+        async with replica_engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+    
+    asyncio.run(create_replica_tables())
+    replica = async_sessionmaker(bind=replica_engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(db_session, "_replica_cycle", itertools.cycle([replica]))
+    
+    listing_id = client.post("/api/v1/listings", json=LISTING, headers=auth_headers("auth0|owner")).json()["id"]
+    
+    # Uncached reads go to the replica
+    monkeypatch.setattr(settings, "LISTING_CACHE_ENABLED", False)
+    assert listing_ids(client.get("/api/v1/listings")) == []
+    
+    # The cached page is the primary's, and stays so for everyone
+    monkeypatch.setattr(settings, "LISTING_CACHE_ENABLED", True)
+    response = client.get("/api/v1/listings")
+    assert (response.headers["X-Cache"], listing_ids(response)) == ("miss", [listing_id])
+    response = client.get("/api/v1/listings")
+    assert (response.headers["X-Cache"], listing_ids(response)) == ("hit", [listing_id])
+    
+    asyncio.run(replica_engine.dispose())
+
+
+class BlockingBackend(LocalBackend):
+    blocking = True
+    
+    def __init__(self):
+        super().__init__(100, 30)
+        self.threads = []
+    
+    def put(self, key, value, only_new=False):
+        self.threads.append(threading.current_thread())
+        return super().put(key, value, only_new)
+
+
+def test_invalidate_async_keeps_blocking_backends_off_the_event_loop():
+    backend = BlockingBackend()
+    cache = new_cache(backend)
+    
+    async def load():
+        return b"[]", None
+    
+    async def invalidate_between_loads():
+        await cache.get_or_load("listings:page", load)
+        await cache.invalidate_async()
+        return await cache.get_or_load("listings:page", load)
+    
+    _, _, cached = asyncio.run(invalidate_between_loads())
+    
+    assert not cached
+    assert backend.threads and threading.main_thread() not in backend.threads
+
+
+def test_concurrent_misses_share_one_load():
+    cache = new_cache()
+    loads = 0
+    
+    async def load():
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(0.05)
+        return b"[1]", "next"
+    
+    async def get_many():
+        return await asyncio.gather(*(cache.get_or_load("listings:page", load) for _ in range(20)))
+    
+    results = asyncio.run(get_many())
+    
+    assert loads == 1
+    assert all(result[:2] == (b"[1]", "next") for result in results)
+    assert cache.stats()["coalesced"] == 19
+
+
+def test_unreachable_backend_is_treated_as_a_miss(unused_port):
+    cache = new_cache(RespBackend(f"redis://127.0.0.1:{unused_port}/0", timeout=0.2))
+    
+    async def load():
+        return b"[]", None
+    
+    async def use_cache():
+        first = await cache.get_or_load("listings:page", load)
+        await cache.invalidate_async()
+        return first, await cache.get_or_load("listings:page", load)
+    
+    first, second = asyncio.run(use_cache())
+    
+    assert first == second == (b"[]", None, False)
+    assert cache.stats()["errors"] >= 3
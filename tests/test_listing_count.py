@@ -0,0 +1,37 @@
+"""
+Search totals past TOTAL_COUNT_EXACT_LIMIT
+"""
+import time
+
+from app.core.cache import TTLCache
+from app.crud import listing as listing_crud
+
+
+def test_pending_count_refresh_expires_when_it_never_runs(monkeypatch):
+    monkeypatch.setattr(listing_crud, "_pending_counts", TTLCache(max_size=10, ttl=0.5))
+    monkeypatch.setattr(listing_crud, "listing_count_cache", TTLCache(max_size=10, ttl=60))
+    filters = {"listing_type": "room", "min_price": 500.0}
+    
+    assert listing_crud._broad_count("sqlite", 10, filters).needs_refresh
+    # Already scheduled
+    count = listing_crud._broad_count("sqlite", 10, filters)
+    assert (count.total, count.exact, count.needs_refresh) == (11, False, False)
+    
+    # The refresh was lost: once the marker expires another one is scheduled
+    time.sleep(0.6)
+    assert listing_crud._broad_count("sqlite", 10, filters).needs_refresh
+
+
+def test_broad_search_total_is_refreshed_in_the_background(client, seed_listings, monkeypatch):
+    seed_listings(300)
+    monkeypatch.setattr(listing_crud.settings, "TOTAL_COUNT_EXACT_LIMIT", 50)
+    listing_crud.listing_count_cache.clear()
+    listing_crud._pending_counts.clear()
+    
+    response = client.get("/api/v1/listings", params={"limit": 5, "include_total": True})
+    assert (response.headers["X-Total-Count"], response.headers["X-Total-Count-Exact"]) == ("51", "false")
+    
+    # The background task ran after the response and cached the full count
+    response = client.get("/api/v1/listings", params={"limit": 5, "include_total": True})
+    assert (response.headers["X-Total-Count"], response.headers["X-Total-Count-Exact"]) == ("300", "false")
+    assert len(listing_crud._pending_counts) == 0
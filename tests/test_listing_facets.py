@@ -0,0 +1,114 @@
+"""
+GET /listings/facets: counts per filter option, and price buckets over effective_price
+"""
+import pytest
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.db.session import engine
+from app.models.listing import Listing
+
+ROOM = {
+    "listing_type": "room",
+    "address": "1 Oak Ave",
+    "num_rooms_available": 1,
+    "total_rooms": 3,
+    "num_bathrooms": 1,
+    "furnished": True,
+    "ensuite": 0,
+    "start_date": "2030-01-01",
+    "end_date": "2030-06-30",
+    "price_per_room": 700,
+    "how_many_ensuite_rooms": 0,
+    "how_many_shared_bathrooms_in_apartment": 1,
+}
+UNIT = {
+    **{key: value for key, value in ROOM.items() if key not in ("price_per_room", "how_many_ensuite_rooms", "how_many_shared_bathrooms_in_apartment")},
+    "listing_type": "unit",
+    "unit_price": 2000,
+    "total_ensuite": 1,
+    "total_shared_bathrooms": 1,
+}
+
+# Each side of every FACET_PRICE_BUCKETS bound
+LISTINGS = [
+    {**ROOM, "price_per_room": 100},
+    {**ROOM, "price_per_room": 499.99, "furnished": False},
+    {**ROOM, "price_per_room": 500, "num_rooms_available": 2},
+    {**ROOM, "price_per_room": 749.99, "num_rooms_available": 2, "furnished": False},
+    {**ROOM, "price_per_room": 1500},
+    {**UNIT, "unit_price": 1999.99},
+    {**UNIT},
+    {**UNIT, "unit_price": 9000, "furnished": False},
+]
+
+
+@pytest.fixture(autouse=True)
+def price_buckets(monkeypatch):
+    monkeypatch.setattr(settings, "FACET_PRICE_BUCKETS", [500.0, 750.0, 1000.0, 1500.0, 2000.0])
+
+
+@pytest.fixture
+def listing_ids(client, auth_headers):
+    owner = auth_headers("auth0|owner")
+    return [client.post("/api/v1/listings", json=listing, headers=owner).json()["id"] for listing in LISTINGS]
+
+
+def facets(client, **params):
+    response = client.get("/api/v1/listings/facets", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def price_counts(body):
+    return [(bucket["min_price"], bucket["max_price"], bucket["count"]) for bucket in body["price"]]
+
+
+def test_facets(client, listing_ids):
+    body = facets(client)
+    
+    assert body["total"] == 8
+    assert body["listing_type"] == [{"value": "room", "count": 5}, {"value": "unit", "count": 3}]
+    assert body["num_rooms_available"] == [{"value": 1, "count": 6}, {"value": 2, "count": 2}]
+    assert body["furnished"] == {"true": 5, "false": 3}
+    # Open below the first bound and above the last; lower bounds are inclusive
+    assert price_counts(body) == [
+        (None, 500.0, 2),
+        (500.0, 750.0, 2),
+        (750.0, 1000.0, 0),
+        (1000.0, 1500.0, 0),
+        (1500.0, 2000.0, 2),
+        (2000.0, None, 2),
+    ]
+
+
+def test_facets_count_only_matching_listings(client, listing_ids):
+    body = facets(client, furnished=False)
+    
+    assert body["total"] == 3
+    assert body["listing_type"] == [{"value": "room", "count": 2}, {"value": "unit", "count": 1}]
+    assert body["num_rooms_available"] == [{"value": 1, "count": 2}, {"value": 2, "count": 1}]
+    assert body["furnished"] == {"true": 0, "false": 3}
+    assert [count for _, _, count in price_counts(body)] == [1, 1, 0, 0, 0, 1]
+    
+    # The max_price filter is inclusive, unlike a bucket's upper bound
+    body = facets(client, listing_type="room", min_price=500, max_price=1500)
+    assert body["total"] == 3
+    assert body["furnished"] == {"true": 2, "false": 1}
+    assert [count for _, _, count in price_counts(body)] == [0, 2, 0, 0, 1, 0]
+
+
+def test_unpriced_listings_are_left_out_of_price_buckets_only(client, listing_ids):
+    with engine.begin() as connection:
+        connection.execute(
+            update(Listing)
+            .where(Listing.id.in_(listing_ids[:2]))
+            .values(price_per_room=None, effective_price=None)
+        )
+    
+    body = facets(client)
+    assert body["total"] == 8
+    assert body["listing_type"] == [{"value": "room", "count": 5}, {"value": "unit", "count": 3}]
+    assert body["furnished"] == {"true": 5, "false": 3}
+    assert [count for _, _, count in price_counts(body)] == [0, 2, 0, 0, 2, 2]
+    assert sum(count for _, _, count in price_counts(body)) == 6
@@ -0,0 +1,125 @@
+"""
+Location filters of GET /listings: bbox, near/radius and the R*Tree side table
+"""
+import math
+
+import pytest
+from sqlalchemy import text
+
+from app.core.geo import KM_PER_DEGREE
+from app.core.search_index import listing_index
+from app.db.session import engine
+
+LISTING = {
+    "listing_type": "room",
+    "address": "1 Oak Ave",
+    "num_rooms_available": 1,
+    "total_rooms": 3,
+    "num_bathrooms": 1,
+    "furnished": True,
+    "ensuite": 0,
+    "start_date": "2030-01-01",
+    "end_date": "2030-06-30",
+    "price_per_room": 700,
+    "how_many_ensuite_rooms": 0,
+    "how_many_shared_bathrooms_in_apartment": 1,
+}
+
+CENTRE = (51.5, -0.1)
+# Degrees per kilometre north and east of CENTRE
+LAT_KM = 1 / KM_PER_DEGREE
+LON_KM = LAT_KM / math.cos(math.radians(CENTRE[0]))
+
+PLACES = {
+    "centre": CENTRE,
+    "north_1km": (CENTRE[0] + LAT_KM, CENTRE[1]),
+    "east_2km": (CENTRE[0], CENTRE[1] + 2 * LON_KM),
+    # In the 2 km circle's bounding box but 2.12 km away
+    "northeast_corner": (CENTRE[0] + 1.5 * LAT_KM, CENTRE[1] + 1.5 * LON_KM),
+    "box_edge": (51.52, -0.1),
+    "outside_box": (51.5201, -0.1),
+    "unlocated": (None, None),
+}
+
+BBOX = "-0.2,51.4,0.0,51.52"
+
+
+@pytest.fixture
+def owner(auth_headers):
+    return auth_headers("auth0|owner")
+
+
+@pytest.fixture
+def places(client, owner):
+    ids = {}
+    for name, (lat, lon) in PLACES.items():
+        response = client.post("/api/v1/listings", json={**LISTING, "latitude": lat, "longitude": lon}, headers=owner)
+        ids[response.json()["id"]] = name
+    return ids
+
+
+def found(client, places, **params):
+    response = client.get("/api/v1/listings", params=params)
+    assert response.status_code == 200, response.text
+    return {places[row["id"]] for row in response.json()}
+
+
+def test_bbox(client, places, search_index):
+    assert listing_index.supports({"bbox": BBOX}) == search_index
+    # Edges are inside; listings without coordinates never match
+    assert found(client, places, bbox=BBOX) == {"centre", "north_1km", "east_2km", "northeast_corner", "box_edge"}
+    assert found(client, places, bbox="-0.2,51.4,0.0,51.49") == set()
+
+
+@pytest.mark.parametrize("radius, expected", [
+    (0.5, {"centre"}),
+    (0.99, {"centre"}),
+    (1.01, {"centre", "north_1km"}),
+    (1.99, {"centre", "north_1km"}),
+    (2.01, {"centre", "north_1km", "east_2km"}),
+    (2.2, {"centre", "north_1km", "east_2km", "northeast_corner"}),
+    # 0.02 degrees north: 2.226 km
+    (2.23, {"centre", "north_1km", "east_2km", "northeast_corner", "box_edge"}),
+])
+def test_radius(client, places, search_index, radius, expected):
+    assert found(client, places, near=f"{CENTRE[0]},{CENTRE[1]}", radius=radius) == expected
+
+
+def test_bbox_and_radius_together(client, places):
+    assert found(client, places, bbox="-0.2,51.4,0.0,51.505", near=f"{CENTRE[0]},{CENTRE[1]}", radius=2.5) == {"centre", "east_2km"}
+
+
+def rtree_ids():
+    with engine.connect() as connection:
+        return set(connection.execute(text("SELECT id FROM listings_geo")).scalars())
+
+
+def test_rtree_follows_writes(client, places, owner):
+    ids = {name: listing_id for listing_id, name in places.items()}
+    assert rtree_ids() == {listing_id for name, listing_id in ids.items() if name != "unlocated"}
+    
+    client.delete(f"/api/v1/listings/{ids['centre']}", headers=owner)
+    client.put(f"/api/v1/listings/{ids['north_1km']}", json={"latitude": None, "longitude": None}, headers=owner)
+    client.put(f"/api/v1/listings/{ids['unlocated']}", json={"latitude": CENTRE[0], "longitude": CENTRE[1]}, headers=owner)
+    client.put(f"/api/v1/listings/{ids['outside_box']}", json={"latitude": 51.45}, headers=owner)
+    
+    assert rtree_ids() == {ids[name] for name in ("east_2km", "northeast_corner", "box_edge", "outside_box", "unlocated")}
+    assert found(client, places, bbox=BBOX) == {"east_2km", "northeast_corner", "box_edge", "outside_box", "unlocated"}
+
+
+@pytest.mark.parametrize("params", [
+    {"bbox": "-0.2,51.4,0.0"},
+    {"bbox": "-0.2,51.4,0.0,51.5,1"},
+    {"bbox": "west,51.4,0.0,51.52"},
+    {"bbox": "-0.2,51.4,0.0,nan"},
+    {"bbox": "0.0,51.4,-0.2,51.52"},
+    {"bbox": "-0.2,51.52,0.0,51.4"},
+    {"bbox": "-0.2,-91,0.0,51.52"},
+    {"near": "51.5,-0.1"},
+    {"radius": 2},
+    {"near": "51.5", "radius": 2},
+    {"near": "51.5,-0.1", "radius": 0},
+    {"near": "91,-0.1", "radius": 2},
+])
+def test_malformed_location_filters_are_rejected(client, params):
+    assert client.get("/api/v1/listings", params=params).status_code == 400
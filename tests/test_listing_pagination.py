@@ -0,0 +1,85 @@
+"""
+Cursor pagination of GET /listings and GET /listings/cards over every sort,
+through SQL and through the in-memory search index
+"""
+import pytest
+from sqlalchemy import select, update
+
+from app.core.search_index import listing_index
+from app.crud.listing import LISTING_SORTS
+from app.db.session import engine
+from app.models.listing import Listing
+
+FILTERS = [
+    {},
+    {"listing_type": "room", "max_distance": 20},
+]
+
+
+@pytest.fixture
+def listings(seed_listings):
+    seed_listings(400)
+    # Some listings without a distance, for the NULL tail of that sort
+    with engine.begin() as connection:
+        connection.execute(update(Listing).where(Listing.id % 5 == 0).values(distance_to_university=None))
+        return connection.execute(
+            select(Listing.id, Listing.listing_type, Listing.effective_price, Listing.distance_to_university, Listing.start_date)
+        ).all()
+
+
+def expected_ids(rows, sort, filters):
+    spec = LISTING_SORTS[sort]
+    rows = [
+        row for row in rows
+        if ("listing_type" not in filters or row.listing_type == filters["listing_type"])
+        and ("max_distance" not in filters or (row.distance_to_university is not None and row.distance_to_university <= filters["max_distance"]))
+    ]
+    if spec.attribute is None:
+        return sorted((row.id for row in rows), reverse=spec.descending)
+    # Rows without a sort value come last, in id order in the sort's direction
+    valued = sorted(
+        ((getattr(row, spec.attribute), row.id) for row in rows if getattr(row, spec.attribute) is not None),
+        reverse=spec.descending
+    )
+    missing = sorted((row.id for row in rows if getattr(row, spec.attribute) is None), reverse=spec.descending)
+    return [listing_id for _, listing_id in valued] + missing
+
+
+def page_through(client, path, params):
+    ids, cursor, pages = [], None, 0
+    while True:
+        response = client.get(path, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        ids.extend(row["id"] for row in response.json())
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return ids, pages
+
+
+@pytest.mark.parametrize("filters", FILTERS, ids=["all", "filtered"])
+@pytest.mark.parametrize("sort", list(LISTING_SORTS))
+def test_cursor_pages_cover_every_listing_in_sort_order(client, listings, search_index, sort, filters):
+    expected = expected_ids(listings, sort, filters)
+    assert listing_index.supports({"availability_match": "overlap", **filters}) == search_index
+    
+    ids, pages = page_through(client, "/api/v1/listings", {"sort": sort, "limit": 37, **filters})
+    assert ids == expected
+    assert pages == max(1, -(-len(expected) // 37))
+    
+    card_ids, _ = page_through(client, "/api/v1/listings/cards", {"sort": sort, "limit": 37, **filters})
+    assert card_ids == expected
+
+
+def test_skip_matches_cursor_order(client, listings, search_index):
+    expected = expected_ids(listings, "price_asc", {})
+    response = client.get("/api/v1/listings", params={"sort": "price_asc", "skip": 350, "limit": 100})
+    assert [row["id"] for row in response.json()] == expected[350:]
+
+
+def test_cursor_from_another_sort_is_rejected(client, listings):
+    response = client.get("/api/v1/listings", params={"sort": "price_asc", "limit": 10})
+    cursor = response.headers["X-Next-Cursor"]
+    
+    response = client.get("/api/v1/listings", params={"sort": "distance", "cursor": cursor})
+    assert response.status_code == 400
@@ -0,0 +1,95 @@
+"""
+effective_price: derived from unit_price or price_per_room on every write, sync and async
+"""
+import asyncio
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+
+from app.crud import listing_crud
+from app.db.session import AsyncSessionLocal, SessionLocal
+from app.models.listing import Listing
+from app.models.user import User
+from app.schemas.listing import RoomListingCreate, RoomListingUpdate, UnitListingCreate, UnitListingUpdate
+
+COMMON = {
+    "address": "1 Oak Ave",
+    "num_rooms_available": 2,
+    "total_rooms": 3,
+    "num_bathrooms": 1,
+    "furnished": True,
+    "ensuite": 0,
+    "start_date": date(2030, 1, 1),
+    "end_date": date(2030, 6, 30),
+}
+UNIT = UnitListingCreate(**COMMON, unit_price=2000, total_ensuite=1, total_shared_bathrooms=1)
+ROOM = RoomListingCreate(**COMMON, price_per_room=700, how_many_ensuite_rooms=0, how_many_shared_bathrooms_in_apartment=1)
+
+
+@pytest.fixture
+def owner_id(db_tables):
+    db = SessionLocal()
+    try:
+        user = User(auth0_user_id="auth0|owner", email="owner@example.com")
+        db.add(user)
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def stored_price(listing_id: int):
+    db = SessionLocal()
+    try:
+        return db.scalar(select(Listing.effective_price).where(Listing.id == listing_id))
+    finally:
+        db.close()
+
+
+def write_sync(owner_id, create, updates):
+    db = SessionLocal()
+    try:
+        listing_id = listing_crud.create_listing(db, create, owner_id).id
+        prices = [stored_price(listing_id)]
+        for update in updates:
+            listing_crud.update_listing(db, listing_id, update)
+            prices.append(stored_price(listing_id))
+        return prices
+    finally:
+        db.close()
+
+
+def write_async(owner_id, create, updates):
+    async def write():
+        async with AsyncSessionLocal() as db:
+            listing_id = (await listing_crud.create_listing_async(db, create, owner_id)).id
+            prices = [stored_price(listing_id)]
+            for update in updates:
+                await listing_crud.update_listing_async(db, listing_id, update)
+                prices.append(stored_price(listing_id))
+            return prices
+    
+    return asyncio.run(write())
+
+
+@pytest.mark.parametrize("write", [write_sync, write_async], ids=["sync", "async"])
+@pytest.mark.parametrize("create, updates, expected", [
+    (UNIT, [UnitListingUpdate(unit_price=1800), UnitListingUpdate(address="2 Oak Ave")], [2000, 1800, 1800]),
+    (ROOM, [RoomListingUpdate(price_per_room=650), RoomListingUpdate(furnished=False)], [700, 650, 650]),
+], ids=["unit", "room"])
+def test_effective_price_follows_price_updates(owner_id, write, create, updates, expected):
+    assert write(owner_id, create, updates) == expected
+
+
+def test_price_filters_see_updated_prices(client, auth_headers):
+    owner = auth_headers("auth0|owner")
+    listing_id = client.post("/api/v1/listings", json=ROOM.model_dump(mode="json"), headers=owner).json()["id"]
+    
+    def found(**params):
+        return [row["id"] for row in client.get("/api/v1/listings", params=params).json()] == [listing_id]
+    
+    assert found(min_price=700, max_price=700)
+    client.put(f"/api/v1/listings/{listing_id}", json={"price_per_room": 900}, headers=owner)
+    assert not found(max_price=800)
+    assert found(min_price=850, max_price=950)
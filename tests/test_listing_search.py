@@ -0,0 +1,128 @@
+"""
+Full-text search (q) on GET /listings: the FTS5 side table, relevance order and paging
+"""
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+from app.crud.listing import _filter_listings
+from app.db.search import postgresql_tsquery, search_terms, sqlite_match_query
+from app.db.session import engine
+from app.models.listing import Listing
+
+LISTING = {
+    "listing_type": "room",
+    "address": "1 Oak Ave",
+    "num_rooms_available": 1,
+    "total_rooms": 3,
+    "num_bathrooms": 1,
+    "furnished": True,
+    "ensuite": 0,
+    "start_date": "2030-01-01",
+    "end_date": "2030-06-30",
+    "price_per_room": 700,
+    "how_many_ensuite_rooms": 0,
+    "how_many_shared_bathrooms_in_apartment": 1,
+}
+
+
+@pytest.fixture
+def owner(auth_headers):
+    return auth_headers("auth0|owner")
+
+
+def create(client, owner, **fields) -> int:
+    response = client.post("/api/v1/listings", json={**LISTING, **fields}, headers=owner)
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+
+def search(client, q, **params):
+    response = client.get("/api/v1/listings", params={"q": q, **params})
+    assert response.status_code == 200, response.text
+    return [row["id"] for row in response.json()]
+
+
+def fts_rowids(term: str):
+    with engine.connect() as connection:
+        return connection.execute(
+            text("SELECT rowid FROM listings_fts WHERE listings_fts MATCH :query ORDER BY rowid"),
+            {"query": sqlite_match_query([term])}
+        ).scalars().all()
+
+
+def test_index_follows_create_update_and_delete(client, owner):
+    listing_id = create(client, owner, address="12 Harbour Street", building_name="Maple Court", utilities_included="Wifi")
+    other_id = create(client, owner, address="3 Mill Lane")
+    
+    assert search(client, "harbour") == [listing_id]
+    # The last term is a prefix; case and accents don't matter
+    assert search(client, "MAPLE co") == [listing_id]
+    assert search(client, "wífi") == [listing_id]
+    assert fts_rowids("harbour") == [listing_id]
+    
+    client.put(f"/api/v1/listings/{listing_id}", json={"address": "40 Quay Road"}, headers=owner)
+    assert search(client, "harbour") == []
+    assert search(client, "quay") == [listing_id]
+    # Columns the update didn't touch are still indexed
+    assert search(client, "maple") == [listing_id]
+    
+    client.delete(f"/api/v1/listings/{listing_id}", headers=owner)
+    assert search(client, "quay") == []
+    assert fts_rowids("quay") == fts_rowids("maple") == []
+    assert search(client, "mill") == [other_id]
+    
+    with engine.connect() as connection:
+        connection.execute(text("INSERT INTO listings_fts(listings_fts) VALUES ('integrity-check')"))
+
+
+def test_address_ranks_above_building_name_above_utilities(client, owner):
+    in_utilities = create(client, owner, address="5 Elm Road", building_name="Elm House", utilities_included="Garden view")
+    in_address = create(client, owner, address="5 Garden Road", building_name="Elm House", utilities_included="Heating")
+    in_building = create(client, owner, address="5 Elm Road", building_name="Garden House", utilities_included="Heating")
+    create(client, owner, address="5 Elm Road", building_name="Elm House", utilities_included="Heating")
+    
+    assert search(client, "garden") == [in_address, in_building, in_utilities]
+
+
+def test_every_term_must_match(client, owner):
+    both = create(client, owner, address="7 River Walk", building_name="Cedar Hall")
+    create(client, owner, address="8 River Walk", building_name="Birch Hall")
+    
+    assert search(client, "river cedar") == [both]
+    # FTS5 syntax in the input is treated as words
+    assert search(client, 'river" OR cedar*') == []
+    assert search(client, "!!!") == search(client, "") != []
+
+
+def test_cursor_needs_a_sort_with_q(client, owner):
+    for n in range(3):
+        create(client, owner, address=f"{n} Harbour Street")
+    
+    response = client.get("/api/v1/listings", params={"q": "harbour", "cursor": "anything"})
+    assert response.status_code == 400
+    assert "Cursors can't be combined with q" in response.json()["detail"]
+    
+    # Relevance order has no cursor; a sort does
+    response = client.get("/api/v1/listings", params={"q": "harbour", "limit": 2})
+    assert "X-Next-Cursor" not in response.headers
+    response = client.get("/api/v1/listings", params={"q": "harbour", "limit": 2, "sort": "newest"})
+    first_page = [row["id"] for row in response.json()]
+    rest = search(client, "harbour", sort="newest", cursor=response.headers["X-Next-Cursor"])
+    assert sorted(first_page + rest, reverse=True) == first_page + rest and len(first_page + rest) == 3
+
+
+def test_postgresql_query_matches_the_index_expression():
+    assert search_terms("Harbour St.") == ["harbour", "st"]
+    assert postgresql_tsquery(["harbour", "st"]) == "harbour & st:*"
+    
+    query, relevance = _filter_listings(select(Listing.id), "postgresql", q="harbour st")
+    sql = str(query.order_by(relevance).compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    index = next(index for index in Listing.__table__.indexes if index.name == "ix_listings_search")
+    ddl = str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+    # The GIN index's expression, as the planner has to see it in the query
+    vector = ddl[ddl.index("gin (") + 5:-1]
+    tsquery = "to_tsquery('simple'::regconfig, 'harbour & st:*')"
+    assert f"WHERE {vector} @@ {tsquery}" in sql.replace("listings.", "")
+    assert f"{tsquery}) DESC" in sql and "ORDER BY ts_rank(" in sql
@@ -0,0 +1,163 @@
+"""
+Swap matches computed on demand and materialized by the match job
+"""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.crud import match_crud
+from app.db.session import SessionLocal
+from app.models.listing import Listing
+
+
+@pytest.fixture
+def db(seed_listings, monkeypatch):
+    monkeypatch.setattr(settings, "MATCHES_MATERIALIZED", True)
+    # Past the number of listings, so incremental runs can't miss a displaced candidate
+    monkeypatch.setattr(settings, "MATCH_CANDIDATE_LIMIT", 1000)
+    seed_listings(300, num_users=40)
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def active_ids(db):
+    return list(db.scalars(select(Listing.id).where(Listing.end_date >= date.today()).order_by(Listing.id)))
+
+
+def assert_stored_matches_equal_on_demand(db):
+    ids = active_ids(db)
+    assert len(ids) > 100
+    with_matches = 0
+    for listing_id in ids:
+        on_demand = match_crud.get_matches(db, listing_id, settings.MATCH_TOP_K)
+        stored = match_crud.get_stored_matches(db, listing_id, settings.MATCH_TOP_K)
+        assert stored == on_demand, listing_id
+        with_matches += bool(stored)
+    assert with_matches > len(ids) // 2
+
+
+def test_full_job_stores_on_demand_matches(db):
+    report = match_crud.run_match_job(db, full=True, workers=1)
+    assert report.recomputed == len(active_ids(db))
+    assert_stored_matches_equal_on_demand(db)
+
+
+def test_incremental_job_follows_listing_writes(db):
+    match_crud.run_match_job(db, full=True, workers=1)
+    listings = db.scalars(select(Listing).where(Listing.end_date >= date.today()).order_by(Listing.id)).all()
+    
+    for listing in listings[:20]:
+        if listing.listing_type == "unit":
+            listing.unit_price = listing.unit_price * 1.2
+        else:
+            listing.price_per_room = listing.price_per_room * 0.8
+        listing.end_date += timedelta(days=30)
+    for listing in listings[20:25]:
+        db.delete(listing)
+    db.commit()
+    
+    report = match_crud.run_match_job(db, workers=1)
+    assert 0 < report.recomputed < len(active_ids(db))
+    assert_stored_matches_equal_on_demand(db)
+    
+    # Nothing queued since
+    assert match_crud.run_match_job(db, workers=1).recomputed == 0
+
+
+def test_matches_endpoint_reads_stored_matches(client, db, monkeypatch):
+    match_crud.run_match_job(db, full=True, workers=1)
+    listing_id = active_ids(db)[0]
+    
+    stored = client.get(f"/api/v1/listings/{listing_id}/matches").json()
+    monkeypatch.setattr(settings, "MATCHES_MATERIALIZED", False)
+    on_demand = client.get(f"/api/v1/listings/{listing_id}/matches").json()
+    
+    assert stored and stored == on_demand
+    assert client.get("/api/v1/listings/999999/matches").status_code == 404
+
+
+ROOM = {
+    "listing_type": "room",
+    "address": "1 Oak Ave",
+    "num_rooms_available": 2,
+    "total_rooms": 4,
+    "num_bathrooms": 1,
+    "furnished": True,
+    "ensuite": 0,
+    "start_date": "2030-01-01",
+    "end_date": "2030-06-30",
+    "price_per_room": 1000,
+    "how_many_ensuite_rooms": 0,
+    "how_many_shared_bathrooms_in_apartment": 1,
+}
+
+# Other owners' listings against ROOM at MATCH_PRICE_BAND 0.25 (800 to 1250) and MATCH_ROOM_TOLERANCE 1
+CANDIDATES = {
+    "same": {},
+    "cheapest": {"price_per_room": 800},
+    "too_cheap": {"price_per_room": 799.99},
+    "dearest": {"price_per_room": 1250},
+    "too_dear": {"price_per_room": 1250.01},
+    "one_room_fewer": {"num_rooms_available": 1},
+    "one_room_more": {"num_rooms_available": 3},
+    "two_rooms_more": {"num_rooms_available": 4},
+    "last_day_shared": {"start_date": "2029-07-01", "end_date": "2030-01-01"},
+    "ends_the_day_before": {"start_date": "2029-07-01", "end_date": "2029-12-31"},
+    "starts_the_day_after": {"start_date": "2030-07-01", "end_date": "2030-12-31"},
+}
+
+
+@pytest.fixture
+def on_demand(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "MATCHES_MATERIALIZED", False)
+    monkeypatch.setattr(settings, "MATCH_PRICE_BAND", 0.25)
+    monkeypatch.setattr(settings, "MATCH_ROOM_TOLERANCE", 1)
+    owner, other = auth_headers("auth0|owner"), auth_headers("auth0|other")
+    
+    target = client.post("/api/v1/listings", json=ROOM, headers=owner).json()["id"]
+    names = {client.post("/api/v1/listings", json=ROOM, headers=owner).json()["id"]: "owners_other_listing"}
+    for name, changes in CANDIDATES.items():
+        names[client.post("/api/v1/listings", json={**ROOM, **changes}, headers=other).json()["id"]] = name
+    return target, names
+
+
+def matched(client, listing_id, names):
+    response = client.get(f"/api/v1/listings/{listing_id}/matches", params={"limit": 50})
+    assert response.status_code == 200, response.text
+    return {names[match["listing"]["id"]] for match in response.json()}
+
+
+def test_on_demand_matches(client, on_demand):
+    target, names = on_demand
+    # Price band and room tolerance edges are inside; a single shared day is an overlap
+    assert matched(client, target, names) == {
+        "same", "cheapest", "dearest", "one_room_fewer", "one_room_more", "last_day_shared"
+    }
+
+
+def test_on_demand_match_settings(client, on_demand, monkeypatch):
+    target, names = on_demand
+    monkeypatch.setattr(settings, "MATCH_ROOM_TOLERANCE", 2)
+    monkeypatch.setattr(settings, "MATCH_PRICE_BAND", 0.1)
+    # 1000 / 1.1 = 909.09 to 1100
+    assert matched(client, target, names) == {
+        "same", "one_room_fewer", "one_room_more", "two_rooms_more", "last_day_shared"
+    }
+
+
+def test_on_demand_matches_are_symmetric(client, on_demand):
+    target, names = on_demand
+    names[target] = "target"
+    for listing_id, name in names.items():
+        if name in ("target", "owners_other_listing"):
+            continue
+        assert ("target" in matched(client, listing_id, names)) == (name in {
+            "same", "cheapest", "dearest", "one_room_fewer", "one_room_more", "last_day_shared"
+        }), name
+
+
+def test_on_demand_matches_of_an_unknown_listing(client, on_demand):
+    assert client.get("/api/v1/listings/999999/matches").status_code == 404
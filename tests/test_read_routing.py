@@ -0,0 +1,89 @@
+"""
+Read replica routing: public reads go to a replica, a recent writer's reads to the primary
+"""
+import asyncio
+import itertools
+import time
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.cache import TTLCache
+from app.db import routing
+from app.db import session as db_session
+from app.db.base import Base
+from app.db.routing import ReadYourWrites
+
+LISTING = {
+    "listing_type": "room",
+    "address": "1 Oak Ave",
+    "num_rooms_available": 1,
+    "total_rooms": 3,
+    "num_bathrooms": 1,
+    "furnished": True,
+    "ensuite": 0,
+    "start_date": "2030-01-01",
+    "end_date": "2030-06-30",
+    "distance_to_university": 2,
+    "price_per_room": 700,
+    "how_many_ensuite_rooms": 0,
+    "how_many_shared_bathrooms_in_apartment": 1,
+}
+
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch):
+    """
+    An empty replica, standing in for one that hasn't caught up with any write
+    """
+    replica_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/replica.db")
+    
+    async def create_tables():
+        async with replica_engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+    
+    asyncio.run(create_tables())
+    monkeypatch.setattr(
+        db_session,
+        "_replica_cycle",
+        itertools.cycle([async_sessionmaker(bind=replica_engine, class_=AsyncSession, expire_on_commit=False)])
+    )
+    yield replica_engine
+    asyncio.run(replica_engine.dispose())
+
+
+def listing_ids(response):
+    return [listing["id"] for listing in response.json()]
+
+
+def test_recent_writer_reads_from_the_primary(client, auth_headers, replica, monkeypatch):
+    monkeypatch.setattr(routing.read_your_writes, "window", 0.5)
+    monkeypatch.setattr(routing.read_your_writes, "_recent", TTLCache(max_size=100, ttl=0.5))
+    owner = auth_headers("auth0|owner")
+    listing_id = client.post("/api/v1/listings", json=LISTING, headers=owner).json()["id"]
+    
+    # Public reads of other listings go to the replica
+    assert listing_ids(client.get("/api/v1/listings")) == []
+    # The writer's, and reads of the written listing, go to the primary
+    assert listing_ids(client.get("/api/v1/listings", headers={"Authorization": owner["Authorization"]})) == [listing_id]
+    assert client.get(f"/api/v1/listings/{listing_id}").status_code == 200
+    
+    # Back to the replica once the window has passed
+    time.sleep(0.6)
+    assert listing_ids(client.get("/api/v1/listings", headers={"Authorization": owner["Authorization"]})) == []
+    assert client.get(f"/api/v1/listings/{listing_id}").status_code == 404
+
+
+def test_workers_share_recent_writes_through_the_cache_server(cache_server):
+    # Two workers' records on the same server
+    first, second = (ReadYourWrites(window=10, url=cache_server.url) for _ in range(2))
+    
+    first.record(listing_id=7, auth0_user_id="auth0|owner")
+    assert second.is_recent(listing_id=7)
+    assert second.is_recent(auth0_user_id="auth0|owner")
+    assert not second.is_recent(listing_id=8, auth0_user_id="auth0|other")
+    
+    # Unreachable: reads go to the primary
+    cache_server.stop()
+    assert second.is_recent(listing_id=8)
+    assert not ReadYourWrites(window=10).is_recent(listing_id=8)
@@ -0,0 +1,164 @@
+"""
+RESP2 client (app.core.resp) against the stand-in server in cache_server.py
+"""
+import asyncio
+import io
+import socket
+import time
+
+import pytest
+
+from app.core.resp import RespClient, RespError, encode_command, read_reply
+from app.core.result_cache import RespBackend, ResultCache
+
+
+def test_encode_command():
+    assert encode_command("SET", "key", b"a\r\nb", 5) == b"*4\r\n$3\r\nSET\r\n$3\r\nkey\r\n$4\r\na\r\nb\r\n$1\r\n5\r\n"
+
+
+@pytest.mark.parametrize("raw, expected", [
+    (b"+OK\r\n", "OK"),
+    (b":42\r\n", 42),
+    (b"$5\r\nhello\r\n", b"hello"),
+    (b"$4\r\na\r\nb\r\n", b"a\r\nb"),
+    (b"$0\r\n\r\n", b""),
+    (b"$-1\r\n", None),
+    (b"*-1\r\n", None),
+    (b"*0\r\n", []),
+    (b"*3\r\n$1\r\na\r\n$-1\r\n:7\r\n", [b"a", None, 7]),
+])
+def test_read_reply(raw, expected):
+    assert read_reply(io.BytesIO(raw)) == expected
+
+
+def test_error_reply():
+    with pytest.raises(RespError, match="ERR wrong"):
+        read_reply(io.BytesIO(b"-ERR wrong\r\n"))
+
+
+@pytest.mark.parametrize("raw", [b"", b"+OK", b"$5\r\nhel", b"*2\r\n$1\r\na\r\n", b"?\r\n"])
+def test_truncated_or_unknown_reply(raw):
+    with pytest.raises(ConnectionError):
+        read_reply(io.BytesIO(raw))
+
+
+def test_commands_round_trip(cache_server):
+    client = RespClient("127.0.0.1", cache_server.port)
+    
+    assert client.execute("PING") == "PONG"
+    assert client.execute("SET", "page", b"\x00binary\r\nbody") == "OK"
+    assert client.execute("GET", "page") == b"\x00binary\r\nbody"
+    assert client.execute("SET", "page", "other", "NX") is None
+    assert client.execute("SET", "new", "value", "NX", "PX", 1000) == "OK"
+    assert client.execute("GET", "page") == b"\x00binary\r\nbody"
+    assert client.execute("GET", "missing") is None
+    assert client.execute("MGET", "page", "missing") == [b"\x00binary\r\nbody", None]
+    assert client.execute("INCR", "generation") == 1
+    assert client.execute("INCR", "generation") == 2
+    with pytest.raises(RespError):
+        client.execute("INCR", "page")
+    with pytest.raises(RespError):
+        client.execute("NOSUCHCOMMAND")
+    # The connection is still in step after error replies
+    assert client.execute("GET", "generation") == b"2"
+
+
+def test_expiry_databases_and_eviction(cache_server):
+    client = RespClient.from_url(cache_server.url)
+    other = RespClient.from_url(f"redis://127.0.0.1:{cache_server.port}/1")
+    
+    client.execute("SET", "short", "value", "PX", 100)
+    other.execute("SET", "short", "other")
+    time.sleep(0.2)
+    assert client.execute("GET", "short") is None
+    assert other.execute("GET", "short") == b"other"
+    
+    # --max-keys 3, least recently used first
+    for key in ("a", "b", "c"):
+        client.execute("SET", key, key)
+    client.execute("GET", "a")
+    client.execute("SET", "d", "d")
+    assert client.execute("MGET", "a", "b", "c", "d") == [b"a", None, b"c", b"d"]
+
+
+def test_reconnects_after_a_server_restart(cache_server):
+    client = RespClient("127.0.0.1", cache_server.port)
+    client.execute("SET", "key", "value")
+    
+    cache_server.stop()
+    with pytest.raises(OSError):
+        client.execute("GET", "key")
+    
+    cache_server.start()
+    # Data is gone, but the client uses a new connection without being told to
+    assert client.execute("GET", "key") is None
+    assert client.execute("PING") == "PONG"
+
+
+def test_unresponsive_server_times_out():
+    # Accepts connections but never replies
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+        client = RespClient("127.0.0.1", listener.getsockname()[1], timeout=0.2)
+        
+        started = time.monotonic()
+        with pytest.raises(OSError):
+            client.execute("PING")
+        # One retry on a new connection
+        assert time.monotonic() - started < 1
+
+
+def test_workers_share_pages_and_invalidation(cache_server):
+    # Two workers' caches on the same server
+    first, second = (ResultCache(RespBackend(cache_server.url), namespace="listings", ttl=30, max_entry_bytes=1000) for _ in range(2))
+    loads = 0
+    
+    async def load():
+        nonlocal loads
+        loads += 1
+        return b"[%d]" % loads, None
+    
+    async def run():
+        results = [await first.get_or_load("listings:page", load), await second.get_or_load("listings:page", load)]
+        await second.invalidate_async()
+        results.append(await first.get_or_load("listings:page", load))
+        return results
+    
+    assert asyncio.run(run()) == [(b"[1]", None, False), (b"[1]", None, True), (b"[2]", None, False)]
+
+
+def test_evicted_generation_does_not_revive_stale_pages(cache_server):
+    # --max-keys 3: the generation key can be evicted like any page
+    client = RespClient.from_url(cache_server.url)
+    cache = ResultCache(RespBackend(cache_server.url), namespace="listings", ttl=30, max_entry_bytes=1000)
+    loads = 0
+    
+    async def load():
+        nonlocal loads
+        loads += 1
+        return b"[%d]" % loads, None
+    
+    def evict_generation():
+        # The stale page stays, the generation goes
+        client.execute("GET", "listings:page")
+        client.execute("SET", "a", "a")
+        client.execute("SET", "b", "b")
+        assert client.execute("MGET", "listings:generation", "listings:page")[0] is None
+    
+    async def run():
+        results = []
+        for _ in range(3):
+            await cache.invalidate_async()
+            results.append(await cache.get_or_load("listings:page", load))
+            await cache.invalidate_async()
+            evict_generation()
+            # A counter would start again here and reach the stale page's generation
+            await cache.invalidate_async()
+            results.append(await cache.get_or_load("listings:page", load))
+            await cache.invalidate_async()
+            evict_generation()
+            results.append(await cache.get_or_load("listings:page", load))
+        return results
+    
+    assert asyncio.run(run()) == [(b"[%d]" % count, None, False) for count in range(1, 10)]
@@ -0,0 +1,183 @@
+"""
+JWKS cache and token verification against the local JWKS stub
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+from jose import JWTError
+
+from app.core import security
+from app.core.cache import TTLCache
+
+
+def test_verifies_token_and_caches_claims(jwks_stub, signing_keys):
+    token = signing_keys[0].token("auth0|alice")
+    hits = security.access_token_cache.stats()["hits"]
+    
+    assert security.verify_auth0_token(token)["sub"] == "auth0|alice"
+    assert security.verify_auth0_token(token)["sub"] == "auth0|alice"
+    assert jwks_stub.requests == 1
+    assert security.access_token_cache.stats()["hits"] == hits + 1
+
+
+def test_key_rotation_refreshes_on_unknown_kid(jwks_stub, signing_keys, monkeypatch):
+    old_key, new_key, unknown_key = signing_keys
+    monkeypatch.setattr(security.jwks_cache, "min_refresh_interval", 0.5)
+    
+    security.verify_auth0_token(old_key.token())
+    jwks_stub.serve(old_key, new_key)
+    time.sleep(0.6)
+    
+    # The cached set doesn't have the new kid yet: one forced refresh picks it up
+    assert security.verify_auth0_token(new_key.token("auth0|rotated"))["sub"] == "auth0|rotated"
+    assert jwks_stub.requests == 2
+    
+    # Another unknown kid within JWKS_MIN_REFRESH_INTERVAL doesn't fetch again
+    with pytest.raises(JWTError):
+        security.verify_auth0_token(unknown_key.token())
+    assert jwks_stub.requests == 2
+    
+    time.sleep(0.6)
+    with pytest.raises(JWTError):
+        security.verify_auth0_token(unknown_key.token("auth0|later"))
+    assert jwks_stub.requests == 3
+
+
+def test_cold_start_fetches_once_for_concurrent_threads(jwks_stub, signing_keys):
+    jwks_stub.delay = 0.2
+    kid = signing_keys[0].kid
+    keys = []
+    
+    threads = [threading.Thread(target=lambda: keys.append(security.jwks_cache.get_key(kid))) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(keys) == 20
+    assert jwks_stub.requests == 1
+
+
+def test_cold_start_fetches_once_for_concurrent_coroutines(jwks_stub, signing_keys):
+    jwks_stub.delay = 0.2
+    tokens = [signing_keys[0].token(f"auth0|user-{n}") for n in range(20)]
+    
+    async def verify_all():
+        try:
+            return await asyncio.gather(*(security.verify_auth0_token_async(token) for token in tokens))
+        finally:
+            await security.close_http_client()
+    
+    payloads = asyncio.run(verify_all())
+    
+    assert [payload["sub"] for payload in payloads] == [f"auth0|user-{n}" for n in range(20)]
+    assert jwks_stub.requests == 1
+
+
+@pytest.mark.parametrize("first", ["thread", "coroutine"])
+def test_cold_start_fetches_once_for_threads_and_coroutines_together(jwks_stub, signing_keys, first):
+    jwks_stub.delay = 0.3
+    kid = signing_keys[0].kid
+    keys = []
+    threads = [threading.Thread(target=lambda: keys.append(security.jwks_cache.get_key(kid))) for _ in range(5)]
+    
+    async def get_keys():
+        try:
+            if first == "thread":
+                for thread in threads:
+                    thread.start()
+                await asyncio.sleep(0.1)
+            else:
+                # Once the first coroutine is fetching
+                asyncio.get_running_loop().call_later(0.1, lambda: [thread.start() for thread in threads])
+            return await asyncio.gather(*(security.jwks_cache.aget_key(kid) for _ in range(5)))
+        finally:
+            await security.close_http_client()
+    
+    keys.extend(asyncio.run(get_keys()))
+    for thread in threads:
+        thread.join()
+    
+    assert len(keys) == 10
+    assert jwks_stub.requests == 1
+
+
+def test_serves_stale_jwks_while_fetches_fail(jwks_stub, signing_keys, monkeypatch):
+    monkeypatch.setattr(security.jwks_cache, "ttl", 0.2)
+    monkeypatch.setattr(security.jwks_cache, "min_refresh_interval", 0)
+    monkeypatch.setattr(security.jwks_cache, "stale_if_error", 0.6)
+    jwks = security.jwks_cache.get()
+    
+    jwks_stub.fail = True
+    time.sleep(0.3)
+    assert security.jwks_cache.get() is jwks
+    assert jwks_stub.requests == 2
+    
+    time.sleep(0.6)
+    with pytest.raises(Exception):
+        security.jwks_cache.get()
+
+
+def test_failed_cold_fetch_is_not_retried_within_min_refresh_interval(jwks_stub, monkeypatch):
+    monkeypatch.setattr(security.jwks_cache, "min_refresh_interval", 0.5)
+    jwks_stub.fail = True
+    
+    for _ in range(10):
+        with pytest.raises(Exception):
+            security.jwks_cache.get()
+    assert jwks_stub.requests == 1
+    
+    jwks_stub.fail = False
+    time.sleep(0.6)
+    assert security.jwks_cache.get() == jwks_stub.jwks
+    assert jwks_stub.requests == 2
+
+
+def test_failed_cold_fetch_is_not_retried_by_waiting_coroutines(jwks_stub, monkeypatch):
+    jwks_stub.fail = True
+    jwks_stub.delay = 0.1
+    
+    async def get_all():
+        try:
+            return await asyncio.gather(*(security.jwks_cache.aget() for _ in range(10)), return_exceptions=True)
+        finally:
+            await security.close_http_client()
+    
+    results = asyncio.run(get_all())
+    
+    assert all(isinstance(result, Exception) for result in results)
+    assert jwks_stub.requests == 1
+
+
+def test_cached_claims_expire_with_the_token(jwks_stub, signing_keys):
+    # exp is in whole seconds, so at least a second away
+    token = signing_keys[0].token(expires_in=2)
+    exp = security.verify_auth0_token(token)["exp"]
+    assert security.peek_verified_claims(token) is not None
+    
+    # jose compares whole seconds
+    time.sleep(exp - time.time() + 1.1)
+    assert security.peek_verified_claims(token) is None
+    with pytest.raises(JWTError, match="expired"):
+        security.verify_auth0_token(token)
+
+
+def test_ttl_cache_expiry_and_lru_eviction():
+    cache = TTLCache(max_size=2, ttl=0.5)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    
+    # "b" was the least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+    
+    cache.set("d", 4, ttl=10)
+    time.sleep(0.6)
+    # A longer ttl than the cache's is capped
+    assert cache.get("d") is None
+    assert cache.get("a") is None
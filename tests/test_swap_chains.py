@@ -0,0 +1,137 @@
+"""
+Swap chain graph: incremental refresh and chain search while it runs
+"""
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.core.swap_chains import SwapChainGraph, _Graph
+from benchmarks.bench_swap_chains import active_rows
+
+
+def build(rows) -> SwapChainGraph:
+    graph = SwapChainGraph()
+    graph.rebuild(
+        rows,
+        settings.MATCH_PRICE_BAND,
+        settings.MATCH_ROOM_TOLERANCE,
+        settings.SWAP_CHAIN_COVERAGE,
+        settings.SWAP_CHAIN_MAX_DEGREE
+    )
+    return graph
+
+
+def snapshot(graph: _Graph):
+    return (
+        dict(graph.nodes),
+        {listing_id: list(edges.items()) for listing_id, edges in graph.out.items()},
+        {listing_id: set(ids) for listing_id, ids in graph.incoming.items() if ids},
+        {
+            key: {name: values.tolist() for name, values in bucket.items()}
+            for key, bucket in graph.buckets.buckets.items()
+        }
+    )
+
+
+def write_some(graph: SwapChainGraph, rows, rng: random.Random):
+    """
+    Queue price changes and deletes for a sample of rows; returns the rows afterwards
+    """
+    rows = {row.id: row for row in rows}
+    for row in rng.sample(list(rows.values()), 60):
+        changed = row._replace(price=row.price * rng.uniform(0.8, 1.2))
+        # Listing-like, as listing_crud passes them
+        graph.upsert(SimpleNamespace(**changed._asdict(), effective_price=changed.price))
+        rows[row.id] = changed
+    # Moves between buckets
+    for row in rng.sample(list(rows.values()), 5):
+        changed = row._replace(price=None)
+        graph.upsert(SimpleNamespace(**changed._asdict(), effective_price=None))
+        rows[row.id] = changed
+    for listing_id in rng.sample(list(rows), 20):
+        graph.remove(listing_id)
+        del rows[listing_id]
+    return list(rows.values())
+
+
+@pytest.fixture(scope="module")
+def rows():
+    return list(active_rows(3000))
+
+
+def test_refresh_matches_a_rebuild_and_leaves_the_searched_graph_alone(rows):
+    graph = build(rows)
+    published = graph._graph
+    before = snapshot(published)
+    
+    after_rows = write_some(graph, rows, random.Random(3))
+    assert graph.refresh() > 0
+    
+    assert snapshot(published) == before
+    assert snapshot(graph._graph) == snapshot(build(after_rows)._graph)
+
+
+def test_chain_search_does_not_wait_for_a_refresh(rows, monkeypatch):
+    graph = build(rows)
+    write_some(graph, rows, random.Random(5))
+    # A listing with chains before the refresh
+    start = next(row.id for row in rows if graph.chains(row.id, 4, 5, 1.0)[0])
+    expected = graph.chains(start, 4, 5, 1.0)
+    
+    applying, release = threading.Event(), threading.Event()
+    apply = _Graph.apply
+    
+    def slow_apply(self, *args, **kwargs):
+        applying.set()
+        release.wait(10)
+        return apply(self, *args, **kwargs)
+    
+    monkeypatch.setattr(_Graph, "apply", slow_apply)
+    refresh = threading.Thread(target=graph.refresh)
+    refresh.start()
+    try:
+        assert applying.wait(5)
+        started = time.perf_counter()
+        # Searches, writes and stats go ahead on the published graph
+        assert graph.chains(start, 4, 5, 0.1) == expected
+        graph.upsert(SimpleNamespace(**rows[0]._asdict(), effective_price=rows[0].price))
+        assert graph.stats()["queued"] == 1
+        assert time.perf_counter() - started < 1
+        assert refresh.is_alive()
+    finally:
+        release.set()
+        refresh.join()
+    
+    # The write made during the refresh waits for the next one
+    assert graph.stats()["queued"] == 1
+
+
+def test_failed_refresh_keeps_the_writes_queued(rows, monkeypatch):
+    graph = build(rows[:500])
+    graph.remove(rows[0].id)
+    graph.remove(rows[1].id)
+    
+    def failing_apply(self, *args, **kwargs):
+        graph.upsert(SimpleNamespace(**rows[1]._asdict(), effective_price=rows[1].price))
+        raise RuntimeError("boom")
+    
+    monkeypatch.setattr(_Graph, "apply", failing_apply)
+    with pytest.raises(RuntimeError):
+        graph.refresh()
+    
+    assert graph._queued[rows[0].id] is None
+    # The later write wins
+    assert graph._queued[rows[1].id] is not None
+
+
+def test_chain_search_budget_covers_the_distance_search(rows):
+    graph = build(rows)._graph
+    start = max(graph.nodes, key=lambda listing_id: len(graph._distances_to(listing_id, 6, float("inf"))))
+    assert len(graph._distances_to(start, 6, float("inf"))) > 256
+    
+    assert graph._distances_to(start, 6, time.perf_counter() - 1) is None
+    assert graph.chains(start, 6, 5, time.perf_counter() - 1) == ([], False)
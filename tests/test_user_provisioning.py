@@ -0,0 +1,95 @@
+"""
+First-login provisioning: one upsert per login, safe under concurrent first logins
+"""
+import asyncio
+import threading
+
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects import postgresql
+
+from app.crud import user_crud
+from app.crud.user import _provisioning_statement
+from app.db.session import AsyncSessionLocal, SessionLocal, engine
+from app.models.user import User
+
+PAYLOAD = {"sub": "auth0|dana", "email": "dana@example.com", "name": "Dana Test", "picture": "https://example.com/dana.png"}
+
+
+def captured_statements():
+    statements = []
+    
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(engine, "before_cursor_execute", capture)
+    return statements, lambda: event.remove(engine, "before_cursor_execute", capture)
+
+
+def test_unchanged_claims_do_not_update_the_row(db_tables):
+    db = SessionLocal()
+    try:
+        user = user_crud.get_or_create_user_from_auth0(db, PAYLOAD)
+        assert user.updated_at is None
+        
+        statements, stop = captured_statements()
+        try:
+            again = user_crud.get_or_create_user_from_auth0(db, PAYLOAD)
+        finally:
+            stop()
+        assert (again.id, again.updated_at) == (user.id, None)
+        # The upsert, whose update didn't fire, then reading the row back (SQLite only)
+        assert len(statements) == 2 and statements[0].startswith("INSERT INTO users")
+        assert db.scalar(select(User.updated_at).where(User.id == user.id)) is None
+        
+        changed = user_crud.get_or_create_user_from_auth0(db, {**PAYLOAD, "name": "Dana Other"})
+        assert (changed.id, changed.last_name) == (user.id, "Other")
+        assert changed.updated_at is not None
+    finally:
+        db.close()
+
+
+def test_concurrent_first_logins_create_one_user(db_tables):
+    barrier = threading.Barrier(8)
+    ids, errors = [], []
+    
+    def log_in():
+        db = SessionLocal()
+        try:
+            barrier.wait()
+            ids.append(user_crud.get_or_create_user_from_auth0(db, PAYLOAD).id)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            db.close()
+    
+    threads = [threading.Thread(target=log_in) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert errors == []
+    assert len(ids) == 8 and len(set(ids)) == 1
+    with SessionLocal() as db:
+        assert db.scalar(select(func.count()).select_from(User)) == 1
+
+
+def test_concurrent_async_first_logins_create_one_user(db_tables):
+    async def log_in():
+        async with AsyncSessionLocal() as db:
+            return (await user_crud.get_or_create_user_from_auth0_async(db, PAYLOAD)).id
+    
+    async def log_in_together():
+        return await asyncio.gather(*(log_in() for _ in range(8)))
+    
+    ids = asyncio.run(log_in_together())
+    assert len(set(ids)) == 1
+
+
+def test_postgresql_returns_the_existing_row_from_the_same_statement():
+    _, stmt = _provisioning_statement("postgresql", PAYLOAD)
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    
+    assert sql.startswith("WITH upserted AS \n(INSERT INTO users")
+    assert "ON CONFLICT (auth0_user_id) DO UPDATE" in sql
+    assert "UNION ALL SELECT" in sql and "NOT (EXISTS (SELECT upserted.id" in sql